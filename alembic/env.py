@@ -31,6 +31,9 @@ from app.db.models.base import Base
 import app.db.models.user
 import app.db.models.video
 import app.db.models.job
+import app.db.models.render_cache
+import app.db.models.llm_cache
+import app.db.models.rendition
 
 # Load environment variables
 load_dotenv()
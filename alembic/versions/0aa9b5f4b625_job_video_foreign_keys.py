@@ -0,0 +1,40 @@
+"""Job/video foreign keys and indexes
+
+Revision ID: 0aa9b5f4b625
+Revises: 62ffa4b965aa
+Create Date: 2026-10-17 13:40:12.018344
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0aa9b5f4b625'
+down_revision: Union[str, None] = '62ffa4b965aa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Jobs completed before jobs.video_id existed only had videos.job_id
+    op.execute(
+        "UPDATE jobs SET video_id = (SELECT videos.id FROM videos WHERE videos.job_id = jobs.job_uuid) "
+        "WHERE video_id IS NULL"
+    )
+    # The foreign key below can't be created while orphaned references exist
+    op.execute(
+        "UPDATE videos SET job_id = NULL "
+        "WHERE job_id IS NOT NULL AND job_id NOT IN (SELECT job_uuid FROM jobs WHERE job_uuid IS NOT NULL)"
+    )
+    op.create_foreign_key('fk_videos_job_id_jobs', 'videos', 'jobs', ['job_id'], ['job_uuid'])
+    op.create_index(op.f('ix_jobs_video_id'), 'jobs', ['video_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_jobs_video_id'), table_name='jobs')
+    op.drop_constraint('fk_videos_job_id_jobs', 'videos', type_='foreignkey')
@@ -0,0 +1,28 @@
+"""Add jobs.stage_timings
+
+Revision ID: 522f65581771
+Revises: 0aa9b5f4b625
+Create Date: 2026-10-17 14:05:37.402918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '522f65581771'
+down_revision: Union[str, None] = '0aa9b5f4b625'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('stage_timings', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('jobs', 'stage_timings')
@@ -0,0 +1,49 @@
+"""Add video renditions and jobs.quality
+
+Revision ID: 62dcb40343c8
+Revises: cfcfed074167
+Create Date: 2026-10-17 15:31:08.954127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '62dcb40343c8'
+down_revision: Union[str, None] = 'cfcfed074167'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'video_renditions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('video_id', sa.Integer(), nullable=False),
+        sa.Column('quality', sa.String(length=16), nullable=False),
+        sa.Column('video_url', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['video_id'], ['videos.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('video_id', 'quality', name='uq_video_renditions_video_quality')
+    )
+    op.create_index(op.f('ix_video_renditions_id'), 'video_renditions', ['id'], unique=False)
+    op.create_index(op.f('ix_video_renditions_video_id'), 'video_renditions', ['video_id'], unique=False)
+    # Every video rendered so far is a -ql render
+    op.execute(
+        "INSERT INTO video_renditions (video_id, quality, video_url, created_at) "
+        "SELECT id, 'low', video_url, created_at FROM videos WHERE video_url IS NOT NULL"
+    )
+    op.add_column('jobs', sa.Column('quality', sa.String(length=16), nullable=False, server_default='low'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('jobs', 'quality')
+    op.drop_index(op.f('ix_video_renditions_video_id'), table_name='video_renditions')
+    op.drop_index(op.f('ix_video_renditions_id'), table_name='video_renditions')
+    op.drop_table('video_renditions')
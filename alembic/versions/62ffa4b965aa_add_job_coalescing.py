@@ -0,0 +1,34 @@
+"""Add job coalescing
+
+Revision ID: 62ffa4b965aa
+Revises: 93e605fb6bba
+Create Date: 2026-10-17 11:26:05.583907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '62ffa4b965aa'
+down_revision: Union[str, None] = '93e605fb6bba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('prompt_fingerprint', sa.String(length=64), nullable=True))
+    op.add_column('jobs', sa.Column('leader_job_uuid', sa.String(), nullable=True))
+    op.create_index(op.f('ix_jobs_prompt_fingerprint'), 'jobs', ['prompt_fingerprint'], unique=False)
+    op.create_index(op.f('ix_jobs_leader_job_uuid'), 'jobs', ['leader_job_uuid'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_jobs_leader_job_uuid'), table_name='jobs')
+    op.drop_index(op.f('ix_jobs_prompt_fingerprint'), table_name='jobs')
+    op.drop_column('jobs', 'leader_job_uuid')
+    op.drop_column('jobs', 'prompt_fingerprint')
@@ -0,0 +1,36 @@
+"""Add job lease columns for the DB-backed queue
+
+Revision ID: 92a02f9c684d
+Revises: 62dcb40343c8
+Create Date: 2026-10-17 17:12:44.318206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '92a02f9c684d'
+down_revision: Union[str, None] = '62dcb40343c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('lease_owner', sa.String(length=64), nullable=True))
+    op.add_column('jobs', sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+    op.add_column('jobs', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index(op.f('ix_jobs_lease_expires_at'), 'jobs', ['lease_expires_at'], unique=False)
+    op.create_index('ix_jobs_status_created_at', 'jobs', ['status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_status_created_at', table_name='jobs')
+    op.drop_index(op.f('ix_jobs_lease_expires_at'), table_name='jobs')
+    op.drop_column('jobs', 'attempts')
+    op.drop_column('jobs', 'lease_expires_at')
+    op.drop_column('jobs', 'lease_owner')
@@ -0,0 +1,47 @@
+"""Add llm cache
+
+Revision ID: 93e605fb6bba
+Revises: bc52d0018ff1
+Create Date: 2026-10-17 10:03:47.221530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '93e605fb6bba'
+down_revision: Union[str, None] = 'bc52d0018ff1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'llm_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(), nullable=True),
+        sa.Column('system_prompt_hash', sa.String(length=64), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('response', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_llm_cache_id'), 'llm_cache', ['id'], unique=False)
+    op.create_index(op.f('ix_llm_cache_cache_key'), 'llm_cache', ['cache_key'], unique=True)
+    op.create_index(op.f('ix_llm_cache_system_prompt_hash'), 'llm_cache', ['system_prompt_hash'], unique=False)
+    op.create_index(op.f('ix_llm_cache_expires_at'), 'llm_cache', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_llm_cache_expires_at'), table_name='llm_cache')
+    op.drop_index(op.f('ix_llm_cache_system_prompt_hash'), table_name='llm_cache')
+    op.drop_index(op.f('ix_llm_cache_cache_key'), table_name='llm_cache')
+    op.drop_index(op.f('ix_llm_cache_id'), table_name='llm_cache')
+    op.drop_table('llm_cache')
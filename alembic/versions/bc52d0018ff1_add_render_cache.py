@@ -0,0 +1,49 @@
+"""Add render cache
+
+Revision ID: bc52d0018ff1
+Revises: f5ba482e6677
+Create Date: 2026-10-17 09:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bc52d0018ff1'
+down_revision: Union[str, None] = 'f5ba482e6677'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'render_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('render_flags', sa.String(), nullable=True),
+        sa.Column('video_id', sa.Integer(), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_hit_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['video_id'], ['videos.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_render_cache_id'), 'render_cache', ['id'], unique=False)
+    op.create_index(op.f('ix_render_cache_cache_key'), 'render_cache', ['cache_key'], unique=True)
+    op.create_index(op.f('ix_render_cache_created_at'), 'render_cache', ['created_at'], unique=False)
+    op.add_column('jobs', sa.Column('video_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_jobs_video_id_videos', 'jobs', 'videos', ['video_id'], ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('fk_jobs_video_id_videos', 'jobs', type_='foreignkey')
+    op.drop_column('jobs', 'video_id')
+    op.drop_index(op.f('ix_render_cache_created_at'), table_name='render_cache')
+    op.drop_index(op.f('ix_render_cache_cache_key'), table_name='render_cache')
+    op.drop_index(op.f('ix_render_cache_id'), table_name='render_cache')
+    op.drop_table('render_cache')
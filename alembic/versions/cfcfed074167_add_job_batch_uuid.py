@@ -0,0 +1,30 @@
+"""Add jobs.batch_uuid
+
+Revision ID: cfcfed074167
+Revises: 522f65581771
+Create Date: 2026-10-17 14:48:21.730516
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cfcfed074167'
+down_revision: Union[str, None] = '522f65581771'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('batch_uuid', sa.String(), nullable=True))
+    op.create_index(op.f('ix_jobs_batch_uuid'), 'jobs', ['batch_uuid'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_jobs_batch_uuid'), table_name='jobs')
+    op.drop_column('jobs', 'batch_uuid')
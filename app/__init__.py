@@ -4,15 +4,26 @@ from dotenv import load_dotenv
 from flask_cors import CORS
 from flask_restx import Api
 
-from app.db.db import init_db
+from app.db.db import init_db, SessionLocal
 from app.routes import main as main_app
+from app.utils.openai_client import invalidate_stale_llm_cache
+from app.utils.metrics import metrics_view
+from app.sandbox.workspace import workspaces
 
 def create_app():
     load_dotenv()
     init_db()
+    invalidate_stale_llm_cache()
+    # Reclaim workspaces left by crashed processes, then keep them in check
+    workspaces.start()
     app = Flask(__name__)
 
     app.config['ENV'] = os.getenv('FLASK_ENV','production')
+
+    # Give each request's scoped session back to the pool when the request ends
+    @app.teardown_appcontext
+    def remove_session(exception=None):
+        SessionLocal.remove()
     
     CORS(app, origins=["http://localhost:3000","*"])  # adjust as needed
 
@@ -23,5 +34,8 @@ def create_app():
               doc="/docs")
     
     api.add_namespace(main_app, path="/api")
+
+    # Prometheus scrape target, outside /api so the default scrape path works
+    app.add_url_rule("/metrics", "metrics", metrics_view)
     
     return app
\ No newline at end of file
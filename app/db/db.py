@@ -10,11 +10,30 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable not set.")
 
-engine = create_engine(DATABASE_URL)
+# Connection pool sizing, per process. pre_ping drops connections the server
+# closed while idle; recycle retires them before proxies/firewalls do
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
 
-# Use scoped_session to ensure thread safety
-SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+engine_options = {"pool_pre_ping": True}
+if not DATABASE_URL.startswith("sqlite"):
+    engine_options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE
+    )
+
+engine = create_engine(DATABASE_URL, **engine_options)
+
+SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Use scoped_session to ensure thread safety. Each request or job thread
+# gets its own session; call SessionLocal.remove() when the unit of work ends
+SessionLocal = scoped_session(SessionFactory)
 
 def init_db():
-    from app.db.models import user, video, job  # Import to register models
+    from app.db.models import user, video, job, render_cache, llm_cache, rendition  # Import to register models
     Base.metadata.create_all(bind=engine)
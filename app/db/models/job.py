@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Enum, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Enum, DateTime, Text, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -19,6 +19,25 @@ class Job(Base):
     generated_code = Column(Text, nullable=True)
     status = Column(Enum(JobStatus), default=JobStatus.pending)
     error_message = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow())
+    video_id = Column(Integer, ForeignKey("videos.id"), index=True, nullable=True)
+    # Single-flight coalescing: identical prompts share one leader job
+    prompt_fingerprint = Column(String(64), index=True, nullable=True)
+    leader_job_uuid = Column(String, index=True, nullable=True)
+    # Final quality asked for; a low-quality preview is delivered first
+    quality = Column(String(16), default="low", nullable=False)
+    # Jobs submitted together through /generate/batch
+    batch_uuid = Column(String, index=True, nullable=True)
+    # Seconds spent in each pipeline stage (queue_wait, llm, sanitize, render, ...)
+    stage_timings = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # DB-backed queue (JOB_QUEUE_BACKEND=db): the worker holding the job, until
+    # when, and how many times it has been claimed
+    lease_owner = Column(String(64), nullable=True)
+    lease_expires_at = Column(DateTime, index=True, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+
+    # Workers look up pending jobs in order of age
+    __table_args__ = (Index("ix_jobs_status_created_at", "status", "created_at"),)
 
     user = relationship("User", backref="jobs")
+    video = relationship("Video", foreign_keys=[video_id])
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from datetime import datetime
+from app.db.models.base import Base
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache"
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, index=True, nullable=False)
+    model = Column(String)
+    system_prompt_hash = Column(String(64), index=True)
+    status = Column(String)
+    response = Column(Text)  # JSON encoded get_manim_code result
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.db.models.base import Base
+
+class VideoRendition(Base):
+    __tablename__ = "video_renditions"
+    __table_args__ = (UniqueConstraint("video_id", "quality", name="uq_video_renditions_video_quality"),)
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(Integer, ForeignKey("videos.id", ondelete="CASCADE"), index=True, nullable=False)
+    quality = Column(String(16), nullable=False)  # low | medium | high | production
+    video_url = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    video = relationship("Video", backref="renditions")
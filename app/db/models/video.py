@@ -7,10 +7,10 @@ class Video(Base):
     __tablename__ = "videos"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    job_id = Column(String, unique=True)
+    job_id = Column(String, ForeignKey("jobs.job_uuid"), unique=True)
     title = Column(String)
     associated_code = Column(Text)
     video_url = Column(String)  # S3 URL or local path
-    created_at = Column(DateTime, default=datetime.utcnow())
+    created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", backref="videos")
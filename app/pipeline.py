@@ -0,0 +1,712 @@
+import os
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.utils.openai_client import (
+    get_manim_code, repair_manim_code, remember_manim_code, request_manim_code, cached_manim_code,
+)
+from app.utils.ast_sanitizer import sanitize_ast
+from app.utils.symbol_check import check_symbols, format_diagnostics, load_index
+from app.utils.s3_handler import upload_file_to_s3
+from app.utils.job_executor import job_executor, PRIORITY_BACKGROUND
+from app.utils.fair_queue import quality_cost
+from app.utils.job_events import job_events
+from app.utils.render_cache import render_cache_key, lookup_render, store_render
+from app.utils.presign_cache import presign_cache
+from app.utils.llm_client import LLM_MAX_CONCURRENCY
+from app.utils.metrics import stage_timer, record_stage, JOBS_FINISHED
+from app.utils.speculation import speculation, extra_candidates, SPECULATIVE_K, SPECULATIVE_RACE, SPECULATIVE_CANCEL
+
+from app.sandbox.docker_runner import run_code_in_docker, render_args, QUALITY_ORDER
+from app.sandbox.workspace import workspaces
+from app.sandbox.reservation import SandboxReservation
+
+from app.db.db import SessionLocal
+from app.db.models.job import Job, JobStatus
+from app.db.models.video import Video
+from app.db.models.rendition import VideoRendition
+
+TERMINAL_STATUSES = (JobStatus.completed, JobStatus.failed)
+
+# LLM calls a batch keeps in flight; llm_client still enforces the global limits
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))
+
+# Quality used when a request doesn't name one, and the quality of the fast
+# preview rendered first when a job asks for something better
+RENDER_DEFAULT_QUALITY = os.getenv("RENDER_DEFAULT_QUALITY", "low")
+RENDER_PREVIEW_QUALITY = os.getenv("RENDER_PREVIEW_QUALITY", "low")
+
+# LLM rounds that may fix code the symbol check rejects before the job fails
+LLM_REPAIR_ATTEMPTS = int(os.getenv("LLM_REPAIR_ATTEMPTS", "0"))
+
+
+def quality_rank(quality: str):
+    return QUALITY_ORDER.index(quality)
+
+
+def preview_quality(quality: str):
+    if quality_rank(RENDER_PREVIEW_QUALITY) < quality_rank(quality):
+        return RENDER_PREVIEW_QUALITY
+    return quality
+
+
+def publish_stage(job_uuid: str, stage: str, **extra):
+    job_events.publish(job_uuid, dict(extra, type="stage", stage=stage))
+
+
+def render_progress(job_uuid: str, quality: str):
+    # Live progress parsed from manim's output, as more "rendering" stage events
+    def publish(progress, animation):
+        extra = {"animation": animation} if animation is not None else {}
+        publish_stage(job_uuid, "rendering", progress=progress, quality=quality, **extra)
+    return publish
+
+
+def status_event(job):
+    event = {"type": "status", "status": job.status.value}
+    if job.status == JobStatus.completed:
+        event["videoId"] = job.video_id
+    elif job.status == JobStatus.failed:
+        event["error_message"] = job.error_message
+    return event
+
+
+def mark_job_failed(job_uuid: str, message: str):
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.job_uuid == job_uuid).first()
+        if job:
+            job.status = JobStatus.failed
+            job.error_message = message
+            db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+    finally:
+        db.close()
+
+
+def copy_outcome(leader, follower):
+    follower.status = leader.status
+    follower.video_id = leader.video_id
+    follower.error_message = leader.error_message
+    follower.generated_code = leader.generated_code
+
+
+def finish_followers(db, leader):
+    followers = db.query(Job).filter(
+        Job.leader_job_uuid == leader.job_uuid,
+        Job.status.notin_(TERMINAL_STATUSES)
+    ).all()
+    for follower in followers:
+        copy_outcome(leader, follower)
+    if followers:
+        db.commit()
+        print(f"Job {leader.job_uuid}: finished {len(followers)} coalesced job(s)")
+
+
+def save_timings(db, job, timings: dict, total: float):
+    try:
+        job.stage_timings = dict(timings, total=round(total, 4))
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Could not save stage timings for {job.job_uuid}: {e}")
+
+
+def fail_job(db, job, message: str):
+    job.status = JobStatus.failed
+    job.error_message = message
+    db.commit()
+
+
+# Pipeline stages. Each takes the job's session and row, records its timing,
+# and marks the job failed (returning None/False) when the job can't go on.
+
+def start_job(db, job_uuid: str):
+    job = db.query(Job).filter(Job.job_uuid == job_uuid).first()
+    if not job:
+        print(f"Job {job_uuid} not found.")
+        return None
+    job.status = JobStatus.running
+    db.commit()
+    job_events.publish(job_uuid, {"type": "status", "status": "running"})
+    return job
+
+
+def llm_stage(db, job, prompt: str, timings: dict, on_status=None):
+    print(f"PROMPT: {prompt}")
+    publish_stage(job.job_uuid, "llm")
+    with stage_timer("llm", timings) as span:
+        response = get_manim_code(prompt, on_status)
+        if response.get("status") != "accepted":
+            span.fail()
+
+    # Rejections, and API errors once llm_client has given up on retries
+    if response.get("status") != "accepted":
+        fail_job(db, job, response.get("reason"))
+        return None
+
+    code = response.get("code", "")
+    print(code)
+    job.generated_code = code
+    db.commit()
+    return code
+
+
+def sanitize_stage(db, job, code: str, timings: dict):
+    print("AST")
+    publish_stage(job.job_uuid, "sanitize")
+    with stage_timer("sanitize", timings) as span:
+        safe, reason = sanitize_ast(code)
+        if not safe:
+            span.fail()
+    if not safe:
+        print(safe, reason)
+        fail_job(db, job, f"AST Sanitizer: {reason}")
+    return safe
+
+
+def symbol_stage(db, job, code: str, prompt: str, timings: dict):
+    """Resolve the code's manim names before a container is spent on it.
+    Returns the code to render, possibly repaired by the LLM, or None."""
+    publish_stage(job.job_uuid, "symbol_check")
+    for attempt in range(LLM_REPAIR_ATTEMPTS + 1):
+        with stage_timer("symbol_check", timings) as span:
+            problems = check_symbols(code)
+            if problems:
+                span.fail()
+        if not problems:
+            if attempt:
+                remember_manim_code(prompt, {"status": "accepted", "code": code})
+            return code
+        diagnostics = format_diagnostics(problems)
+        print(f"Symbol check: {diagnostics}")
+        if attempt == LLM_REPAIR_ATTEMPTS:
+            break
+
+        publish_stage(job.job_uuid, "repair", attempt=attempt + 1)
+        with stage_timer("llm_repair", timings) as span:
+            response = repair_manim_code(prompt, code, diagnostics, load_index().version)
+            if response.get("status") != "accepted":
+                span.fail()
+        if response.get("status") != "accepted":
+            fail_job(db, job, response.get("reason"))
+            return None
+        code = response.get("code", "")
+        job.generated_code = code
+        db.commit()
+        # Repaired code is new LLM output and goes through the sanitizer again
+        if not sanitize_stage(db, job, code, timings):
+            return None
+
+    fail_job(db, job, f"Unknown manim symbols:\n{diagnostics}")
+    return None
+
+
+def use_cached_render(db, job, code: str, quality: str, video):
+    print(f"Render cache hit: video {video.id}")
+    job.video_id = video.id
+    job.status = JobStatus.completed
+    db.commit()
+    schedule_upgrade(job, code, quality)
+
+
+def render_stage(db, job, code: str, prompt: str, timings: dict, reservation=None):
+    # The job completes with the preview; a better rendition follows in the background
+    quality = preview_quality(job.quality)
+
+    # Reuse an earlier render of the same code if we have one
+    with stage_timer("render_cache", timings):
+        cached_video = lookup_render(db, render_cache_key(code, render_args(quality)))
+    if cached_video:
+        use_cached_render(db, job, code, quality, cached_video)
+        return
+
+    print("DOCKER CODE")
+    publish_stage(job.job_uuid, "rendering", progress=None, quality=quality)
+    result = run_code_in_docker(code, timings, quality, on_progress=render_progress(job.job_uuid, quality),
+                                reservation=reservation)
+    print(result.get("video_path"))
+    if result["status"] != "success":
+        fail_job(db, job, result.get("error", "Unknown error during Docker run"))
+        return
+    save_render(db, job, code, prompt, timings, quality, result)
+
+
+def save_render(db, job, code: str, prompt: str, timings: dict, quality: str, result: dict):
+    """Upload a successful render and complete the job with it."""
+    publish_stage(job.job_uuid, "uploading")
+    try:
+        with stage_timer("upload", timings) as span:
+            s3_result = upload_file_to_s3(result["video_path"])
+            if s3_result["status"] != "success":
+                span.fail()
+    finally:
+        # The local copy is done with whether or not the upload worked
+        workspaces.release(result.get("workspace"))
+    if s3_result["status"] != "success":
+        fail_job(db, job, f"S3 Upload Error: {s3_result['message']}")
+        return
+
+    with stage_timer("persist", timings):
+        video = Video(
+            user_id=job.user_id,
+            job_id=job.job_uuid,
+            title=f"Video for {prompt[:30]}",
+            associated_code=code,
+            video_url=s3_result["url"]
+        )
+        db.add(video)
+        db.flush()
+        db.add(VideoRendition(video_id=video.id, quality=quality, video_url=video.video_url))
+        job.video_id = video.id
+        job.status = JobStatus.completed
+        db.commit()
+
+        flags = render_args(quality)
+        store_render(db, render_cache_key(code, flags), flags, video)
+    schedule_upgrade(job, code, quality)
+
+
+def schedule_upgrade(job, code: str, rendered_quality: str):
+    if job.quality == rendered_quality or not job.video_id:
+        return
+    # Admitted as part of the job, so not bounded by the queue, and behind every new job
+    job_executor.submit(render_rendition, job.job_uuid, job.video_id, code, job.quality,
+                        force=True, priority=PRIORITY_BACKGROUND, user=job.user_id,
+                        cost=quality_cost(job.quality))
+
+
+def render_rendition(job_uuid: str, video_id: int, code: str, quality: str):
+    """Render code at quality and attach it to the video as another rendition."""
+    db = SessionLocal()
+    try:
+        renditions = {r.quality: r for r in db.query(VideoRendition).filter(VideoRendition.video_id == video_id)}
+        if quality in renditions:
+            return
+
+        flags = render_args(quality)
+        cache_key = render_cache_key(code, flags)
+        cached_video = lookup_render(db, cache_key)
+        cached = None
+        if cached_video:
+            cached = db.query(VideoRendition).filter(
+                VideoRendition.video_id == cached_video.id,
+                VideoRendition.quality == quality
+            ).first()
+
+        if cached:
+            print(f"Render cache hit: {quality} rendition of video {cached_video.id}")
+            video_url = cached.video_url
+        else:
+            publish_stage(job_uuid, "rendering", progress=None, quality=quality)
+            result = run_code_in_docker(code, quality=quality, on_progress=render_progress(job_uuid, quality))
+            if result["status"] != "success":
+                print(f"{quality} rendition of video {video_id} failed: {result.get('error')}")
+                job_events.publish(job_uuid, {"type": "rendition", "quality": quality, "status": "failed"})
+                return
+            publish_stage(job_uuid, "uploading", quality=quality)
+            try:
+                s3_result = upload_file_to_s3(result["video_path"])
+            finally:
+                workspaces.release(result.get("workspace"))
+            if s3_result["status"] != "success":
+                print(f"{quality} rendition of video {video_id}: S3 Upload Error: {s3_result['message']}")
+                job_events.publish(job_uuid, {"type": "rendition", "quality": quality, "status": "failed"})
+                return
+            video_url = s3_result["url"]
+
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if not video:
+            return
+        db.add(VideoRendition(video_id=video_id, quality=quality, video_url=video_url))
+        # videos.video_url always points at the best rendition available
+        if all(quality_rank(quality) > quality_rank(q) for q in renditions):
+            video.video_url = video_url
+        db.commit()
+        presign_cache.invalidate(video_id)
+        if not cached:
+            store_render(db, cache_key, flags, video)
+        job_events.publish(job_uuid, {"type": "rendition", "quality": quality, "status": "completed",
+                                      "videoId": video_id})
+    except Exception as e:
+        db.rollback()
+        print(f"{quality} rendition of video {video_id} failed: {e}")
+    finally:
+        SessionLocal.remove()
+
+
+def finish_job(db, job, timings: dict, started: float):
+    save_timings(db, job, timings, time.perf_counter() - started)
+    if job.status in TERMINAL_STATUSES:
+        JOBS_FINISHED.inc(job.status.value)
+        finish_followers(db, job)
+        job_events.publish(job.job_uuid, status_event(job))
+
+
+def handle_stage_error(db, job, e: Exception):
+    db.rollback()
+    if job:
+        job.status = JobStatus.failed
+        job.error_message = f"Exception: {str(e)}"
+        db.commit()
+
+
+def record_queue_wait(timings: dict, queue_wait: float = None):
+    # DB-queue workers pass the wait in; executor tasks look up their own
+    if queue_wait is None:
+        queue_wait = job_executor.current_wait()
+    if queue_wait is not None:
+        timings["queue_wait"] = round(queue_wait, 4)
+    return timings
+
+
+def process_job(job_uuid: str, prompt: str, queue_wait: float = None):
+    db = SessionLocal()
+    job = None
+    # Per-stage seconds, persisted on the job row when it finishes
+    timings = record_queue_wait({}, queue_wait)
+    started = time.perf_counter()
+    reservation = None
+    try:
+        job = start_job(db, job_uuid)
+        if not job:
+            return
+        # Acquired while the LLM is still writing the code, once it has accepted
+        reservation = SandboxReservation(preview_quality(job.quality))
+        extra = speculative_extras(prompt)
+        if extra:
+            speculative_stage(db, job, prompt, timings, extra, reservation)
+            return
+        code = llm_stage(db, job, prompt, timings, reservation.on_status)
+        if code is None:
+            return
+        if not sanitize_stage(db, job, code, timings):
+            return
+        code = symbol_stage(db, job, code, prompt, timings)
+        if code is None:
+            return
+        render_stage(db, job, code, prompt, timings, reservation)
+    except Exception as e:
+        handle_stage_error(db, job, e)
+    finally:
+        # No-op once the render took it
+        if reservation:
+            reservation.cancel()
+        if job:
+            finish_job(db, job, timings, started)
+        # Worker threads are reused; drop this job's session from the registry
+        SessionLocal.remove()
+
+
+# Speculative generation: a job asks the LLM for several candidate programs at
+# once, drops those that fail the static checks, and races the rest in
+# sandboxes. The first video wins and the other renders are cancelled, so a
+# failed render costs the job a sibling's time instead of a whole retry.
+
+def speculative_extras(prompt: str):
+    # A cached answer was accepted before and is all we'd render
+    if SPECULATIVE_K <= 1 or cached_manim_code(prompt):
+        return 0
+    return extra_candidates()
+
+
+def generate_candidate(events, index: int, prompt: str, stop: threading.Event, on_status=None):
+    response = request_manim_code(prompt, on_status=on_status, cancel=stop)
+    events.put(("llm", index, response))
+
+
+def render_candidate(events, index: int, code: str, quality: str, cancel: threading.Event, on_progress,
+                     reservation=None):
+    timings = {}
+    try:
+        result = run_code_in_docker(code, timings, quality, on_progress=on_progress, reservation=reservation,
+                                    cancel=cancel)
+    except Exception as e:
+        result = {"status": "error", "error": f"Exception: {str(e)}", "job_id": None}
+    events.put(("render", index, (result, timings)))
+
+
+def check_candidate(code: str, timings: dict):
+    """Why code can't be rendered (sanitizer or symbol check), or None."""
+    with stage_timer("sanitize", timings) as span:
+        safe, reason = sanitize_ast(code)
+        if not safe:
+            span.fail()
+    if not safe:
+        return f"AST Sanitizer: {reason}"
+    with stage_timer("symbol_check", timings) as span:
+        problems = check_symbols(code)
+        if problems:
+            span.fail()
+    if problems:
+        return f"Unknown manim symbols:\n{format_diagnostics(problems)}"
+    return None
+
+
+def sandbox_seconds(timings: dict):
+    return timings.get("container_start", 0.0) + timings.get("render", 0.0)
+
+
+def leading_progress(job_uuid: str, quality: str):
+    # Racing renders share one progress bar: only the one furthest along moves it
+    publish = render_progress(job_uuid, quality)
+    best = [0.0]
+    lock = threading.Lock()
+
+    def update(progress, animation):
+        with lock:
+            if progress <= best[0]:
+                return
+            best[0] = progress
+        publish(progress, animation)
+    return update
+
+
+def drain_candidates(events, generating: int, rendering: int, extra: int):
+    """Wait out the losing candidates, drop their videos, and give the job's
+    extra candidates back to the budget."""
+    try:
+        while generating or rendering:
+            kind, _, payload = events.get()
+            if kind == "llm":
+                generating -= 1
+                continue
+            rendering -= 1
+            result, timings = payload
+            workspaces.release(result.get("workspace"))
+            if result["status"] == "success":
+                # Finished after the winner (or before the kill reached it)
+                speculation.count("renders_lost")
+            else:
+                speculation.count("renders_cancelled" if SPECULATIVE_CANCEL else "renders_failed")
+            speculation.count("wasted_render_seconds", sandbox_seconds(timings))
+    finally:
+        speculation.give(extra)
+
+
+def speculative_stage(db, job, prompt: str, timings: dict, extra: int, reservation=None):
+    """Generate 1 + extra candidates in parallel and race the ones that pass
+    the static checks, up to SPECULATIVE_RACE at a time. The job is
+    rejected only if every candidate rejects the prompt. Completes or fails
+    the job."""
+    print(f"PROMPT: {prompt} ({1 + extra} candidates)")
+    quality = preview_quality(job.quality)
+    flags = render_args(quality)
+    events = queue.Queue()
+    stop = threading.Event()  # ends the candidates still being generated
+    on_progress = leading_progress(job.job_uuid, quality)
+    generating = 0  # candidates whose LLM call hasn't returned
+    ready = deque()  # (index, code) that passed the checks, waiting for a sandbox
+    seen = set()
+    racing = {}  # index -> (code, cancel event)
+    first_render = None
+    first_failed = False
+    accepted = False
+    rejection = None
+    rejections = 0
+    winner = None  # (code, result, render timings), or (code, cached video, None)
+    error = None
+    started = time.perf_counter()
+    try:
+        speculation.count("candidates", 1 + extra)
+        publish_stage(job.job_uuid, "llm", candidates=1 + extra)
+        for index in range(1 + extra):
+            threading.Thread(target=generate_candidate,
+                             args=(events, index, prompt, stop, reservation.on_status if reservation else None),
+                             name=f"candidate-{job.job_uuid[:8]}-{index}", daemon=True).start()
+            generating += 1
+
+        while winner is None and (generating or ready or racing):
+            while ready and len(racing) < max(1, SPECULATIVE_RACE):
+                index, code = ready.popleft()
+                cancel = threading.Event()
+                racing[index] = (code, cancel)
+                if first_render is None:
+                    first_render = index
+                    publish_stage(job.job_uuid, "rendering", progress=None, quality=quality)
+                speculation.count("renders")
+                # Only the first render finds the reservation still open
+                threading.Thread(target=render_candidate,
+                                 args=(events, index, code, quality, cancel, on_progress, reservation),
+                                 name=f"race-{job.job_uuid[:8]}-{index}", daemon=True).start()
+
+            kind, index, payload = events.get()
+            if kind == "llm":
+                generating -= 1
+                status = payload.get("status")
+                if status == "rejected":
+                    # Sampled at temperature 0.9, one refusal isn't the final word
+                    speculation.count("rejected")
+                    rejections += 1
+                    rejection = payload
+                    continue
+                if status != "accepted":
+                    # API errors; the other candidates may still make it
+                    error = payload.get("reason")
+                    continue
+                speculation.count("accepted")
+                if not accepted:
+                    accepted = True
+                    record_stage("llm", time.perf_counter() - started, timings)
+                code = payload.get("code", "")
+                if code in seen:
+                    speculation.count("duplicates")
+                    continue
+                seen.add(code)
+                problem = check_candidate(code, timings)
+                if problem:
+                    print(f"Candidate {index}: {problem}")
+                    speculation.count("failed_checks")
+                    error = problem
+                    continue
+                with stage_timer("render_cache", timings):
+                    cached_video = lookup_render(db, render_cache_key(code, flags))
+                if cached_video:
+                    winner = (code, cached_video, None)
+                    continue
+                ready.append((index, code))
+                continue
+
+            code, _ = racing.pop(index)
+            result, render_timings = payload
+            if result["status"] == "success":
+                winner = (code, result, render_timings)
+                speculation.count("winner_render_seconds", sandbox_seconds(render_timings))
+                if index == first_render:
+                    speculation.count("won_by_first")
+                else:
+                    speculation.count("won_by_hedge")
+                    if first_failed:
+                        speculation.count("rescued")
+                continue
+            speculation.count("renders_failed")
+            speculation.count("wasted_render_seconds", sandbox_seconds(render_timings))
+            print(f"Candidate {index}: render failed")
+            if index == first_render:
+                first_failed = True
+            error = result.get("error", "Unknown error during Docker run")
+    finally:
+        stop.set()
+        if SPECULATIVE_CANCEL:
+            for _, cancel in racing.values():
+                cancel.set()
+        # The losers finish (or die) in the background
+        threading.Thread(target=drain_candidates, args=(events, generating, len(racing), extra),
+                         name=f"drain-{job.job_uuid[:8]}", daemon=True).start()
+
+    if not accepted:
+        record_stage("llm", time.perf_counter() - started, timings, failed=True)
+    if rejections == 1 + extra:
+        # Unanimous, so cached like any rejection
+        remember_manim_code(prompt, rejection)
+        fail_job(db, job, rejection.get("reason"))
+        return
+    if winner is None:
+        fail_job(db, job, error or (rejection or {}).get("reason") or "No candidate could be rendered")
+        return
+
+    code, result, render_timings = winner
+    job.generated_code = code
+    db.commit()
+    # Later requests for the prompt get the code that rendered
+    remember_manim_code(prompt, {"status": "accepted", "code": code})
+    if render_timings is None:
+        use_cached_render(db, job, code, quality, result)
+        return
+    for stage, value in render_timings.items():
+        timings[stage] = round(timings.get(stage, 0.0) + value, 4)
+    save_render(db, job, code, prompt, timings, quality, result)
+
+
+# Batches: one coordinator thread per batch fans the LLM calls out, sanitizes
+# each result as it arrives and hands the survivors to the job executor, so
+# the first renders start while later prompts are still being generated.
+
+def process_batch(batch_uuid: str, jobs):
+    """jobs: (job_uuid, prompt) pairs of the batch's leader jobs."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, BATCH_LLM_CONCURRENCY),
+                            thread_name_prefix=f"batch-{batch_uuid[:8]}") as pool:
+        futures = [pool.submit(generate_batch_job, job_uuid, prompt) for job_uuid, prompt in jobs]
+        for future in as_completed(futures):
+            job_uuid, prompt, code, timings, job_started = future.result()
+            if code is None or not sanitize_batch_job(job_uuid, prompt, code, timings, job_started):
+                # Ended before its render was queued; free the slot reserved at admission
+                job_executor.release_batch()
+    print(f"Batch {batch_uuid}: generated {len(jobs)} job(s) in {time.perf_counter() - started:.1f}s")
+    SessionLocal.remove()
+
+
+def generate_batch_job(job_uuid: str, prompt: str):
+    db = SessionLocal()
+    job = None
+    code = None
+    timings = {}
+    started = time.perf_counter()
+    try:
+        job = start_job(db, job_uuid)
+        if job:
+            code = llm_stage(db, job, prompt, timings)
+    except Exception as e:
+        handle_stage_error(db, job, e)
+    finally:
+        if job and code is None:
+            finish_job(db, job, timings, started)
+        SessionLocal.remove()
+    return job_uuid, prompt, code, timings, started
+
+
+def sanitize_batch_job(job_uuid: str, prompt: str, code: str, timings: dict, started: float):
+    """Returns True once the job's render is queued."""
+    db = SessionLocal()
+    job = None
+    try:
+        job = db.query(Job).filter(Job.job_uuid == job_uuid).first()
+        if not job:
+            return False
+        if not sanitize_stage(db, job, code, timings):
+            return False
+        code = symbol_stage(db, job, code, prompt, timings)
+        if code is None:
+            return False
+        # Takes the slot the batch reserved at admission
+        if not job_executor.submit(render_batch_job, job_uuid, prompt, code, timings, started, batch=True,
+                                   user=job.user_id, cost=quality_cost(preview_quality(job.quality)),
+                                   key=job_uuid):
+            fail_job(db, job, "Job queue is full, try again later")
+            return False
+        job = None
+        return True
+    except Exception as e:
+        handle_stage_error(db, job, e)
+    finally:
+        if job:
+            finish_job(db, job, timings, started)
+        SessionLocal.remove()
+
+
+def render_batch_job(job_uuid: str, prompt: str, code: str, timings: dict, started: float):
+    db = SessionLocal()
+    job = None
+    record_queue_wait(timings)
+    try:
+        job = db.query(Job).filter(Job.job_uuid == job_uuid).first()
+        if not job:
+            return
+        render_stage(db, job, code, prompt, timings)
+    except Exception as e:
+        handle_stage_error(db, job, e)
+    finally:
+        if job:
+            finish_job(db, job, timings, started)
+        SessionLocal.remove()
+
+
+def start_batch(batch_uuid: str, jobs):
+    threading.Thread(target=process_batch, args=(batch_uuid, jobs),
+                     name=f"batch-{batch_uuid[:8]}", daemon=True).start()
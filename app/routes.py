@@ -1,27 +1,83 @@
 import os
+import json
+import time
 import uuid
-from flask import  request
-from threading import Thread
+import threading
+from contextlib import contextmanager, ExitStack
+from datetime import datetime, timedelta
+from flask import  request, Response, stream_with_context
+from sqlalchemy import text
+from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import SQLAlchemyError
 from flask_restx import Namespace, Resource, fields
 
 
-from app.utils.filters import is_prompt_unsafe
-from app.utils.openai_client import get_manim_code
-from app.utils.ast_sanitizer import sanitize_ast
-from app.utils.s3_handler import upload_file_to_s3, generate_presigned_url
-
-from app.sandbox.docker_runner import run_code_in_docker
+from app.utils.filters import is_prompt_unsafe, screen_prompts
+from app.utils.presign_cache import presign_cache
+from app.utils.job_executor import job_executor
+from app.utils.job_queue import has_capacity, wake_workers, queue_stats, queue_position, db_backend
+from app.utils.fair_queue import quality_cost
+from app.utils.job_events import job_events, TERMINAL_EVENT_STATUSES
+from app.utils.render_cache import render_cache_stats
+from app.utils.llm_cache import llm_cache, normalize_prompt, hash_text
+from app.utils.llm_client import llm_client
+from app.utils.speculation import speculation
+from app.utils.metrics import registry
+
+from app.sandbox.docker_runner import SANDBOX_POOL_SIZE, RENDER_QUALITIES, QUALITY_ORDER
+from app.sandbox.scenes import scene_cache
+from app.sandbox.workspace import workspaces
+from app.sandbox.scheduler import resource_scheduler, SANDBOX_SCHEDULER
+from app.sandbox.reservation import reservation_stats
+
+from app.pipeline import (
+    process_job, start_batch, mark_job_failed, copy_outcome, status_event, TERMINAL_STATUSES,
+    RENDER_DEFAULT_QUALITY, preview_quality,
+)
 
 from app.db.db import SessionLocal
 from app.db.models.job import Job, JobStatus
+from app.db.models.user import User
 from app.db.models.video import Video 
+from app.db.models.rendition import VideoRendition
 
 main = Namespace('main', description='Main routes for video generation')
 
+# Identical prompts submitted within this many seconds of an in-flight job
+# follow that job instead of running their own pipeline. 0 disables it.
+JOB_DEDUP_WINDOW = int(os.getenv("JOB_DEDUP_WINDOW", "60"))
+
+# Serialize the leader lookup and insert of one prompt within this process,
+# striped by fingerprint so different prompts don't wait on each other;
+# across processes lock_fingerprint() takes a Postgres advisory lock
+coalesce_locks = [threading.Lock() for _ in range(64)]
+
+# Jobs are queued fairly per user, taken from the X-User-Id header set by the
+# auth proxy in front of the API; requests without it run as this user
+DEFAULT_USER_ID = int(os.getenv("DEFAULT_USER_ID", "1"))
+
+PRESIGN_BATCH_LIMIT = int(os.getenv("PRESIGN_BATCH_LIMIT", "200"))
+GENERATE_BATCH_LIMIT = int(os.getenv("GENERATE_BATCH_LIMIT", "100"))
+
+# Push-based progress: SSE keepalive interval, how long one stream may stay
+# open, and the longest long-poll wait a client may ask for
+JOB_EVENTS_KEEPALIVE = int(os.getenv("JOB_EVENTS_KEEPALIVE", "15"))
+JOB_EVENTS_STREAM_TIMEOUT = int(os.getenv("JOB_EVENTS_STREAM_TIMEOUT", "600"))
+JOB_EVENTS_MAX_WAIT = int(os.getenv("JOB_EVENTS_MAX_WAIT", "30"))
+
 # Define request/response models (optional but recommended for Swagger)
 prompt_model = main.model('Prompt', {
-    'prompt': fields.String(required=True, description='User prompt for video generation')
+    'prompt': fields.String(required=True, description='User prompt for video generation'),
+    'quality': fields.String(description='Final quality: low, medium, high or production', enum=list(RENDER_QUALITIES))
+})
+
+generate_batch_model = main.model('GenerateBatch', {
+    'prompts': fields.List(fields.String, required=True, description='User prompts, one video each'),
+    'quality': fields.String(description='Final quality for every video of the batch', enum=list(RENDER_QUALITIES))
+})
+
+presign_batch_model = main.model('PresignBatch', {
+    'video_ids': fields.List(fields.Integer, required=True, description='IDs of the videos to sign URLs for')
 })
 
 job_status_model = main.model('JobStatus', {
@@ -29,7 +85,14 @@ job_status_model = main.model('JobStatus', {
     'job_uuid': fields.String,
     'created_at': fields.String,
     'video_url': fields.String,
-    'error_message': fields.String
+    'error_message': fields.String,
+    'coalesced': fields.Boolean,
+    'leaderJobId': fields.String,
+    'stageTimings': fields.Raw,
+    'quality': fields.String,
+    'renditions': fields.List(fields.String),
+    'queuePosition': fields.Integer(description='Jobs that will start before this one'),
+    'estimatedStart': fields.String(description='Estimated start time (UTC) of a pending job')
 })
 
 @main.route('/')
@@ -45,6 +108,9 @@ class GenerateRoute(Resource):
         data = request.get_json()
         user_prompt = data.get("prompt","")
         print(user_prompt)
+        quality = data.get("quality") or RENDER_DEFAULT_QUALITY
+        if quality not in RENDER_QUALITIES:
+            return {"status": "error", "message": f"quality must be one of {', '.join(RENDER_QUALITIES)}"}, 400
 
         # Step 1: Pre-check for malicious intent
         flagged, reason = is_prompt_unsafe(user_prompt)
@@ -54,38 +120,276 @@ class GenerateRoute(Resource):
                 "status": "abort",
                 "reason": reason
             }, 400
-        
 
-        print(user_prompt)
-        # Step 2: Create job entry
+        fingerprint = prompt_fingerprint(user_prompt, quality)
         job_uuid = str(uuid.uuid4())
-        job = Job(
-            user_id=1,
-            prompt=user_prompt,
-            job_uuid=job_uuid,
-            status=JobStatus.pending
-        )
-
-        print(job)
         try:
-            db.add(job)
-            db.commit()
-            db.refresh(job)
+            user_id = request_user_id(db)
+            if user_id is None:
+                return {"status": "error", "message": "Unknown user"}, 400
+            with coalescing([fingerprint]):
+                lock_fingerprint(db, fingerprint)
+
+                # Step 2: Join an identical job that is already in flight
+                leader = find_leader(db, fingerprint)
+                if leader:
+                    db.add(Job(
+                        user_id=user_id,
+                        prompt=user_prompt,
+                        job_uuid=job_uuid,
+                        status=JobStatus.pending,
+                        prompt_fingerprint=fingerprint,
+                        leader_job_uuid=leader.job_uuid,
+                        quality=quality
+                    ))
+                    db.commit()
+                    print(f"Job {job_uuid} coalesced into {leader.job_uuid}")
+                    return {
+                        "status": "queued",
+                        "jobId": job_uuid,
+                        "coalesced": True
+                    }, 202
+
+                # Admission control: don't accept work the executor can't queue
+                if not has_capacity(db, 1, user_id):
+                    db.rollback()
+                    job_executor.record_rejected()
+                    return busy_response()
+
+                print(user_prompt)
+                # Step 3: Create job entry
+                job = Job(
+                    user_id=user_id,
+                    prompt=user_prompt,
+                    job_uuid=job_uuid,
+                    status=JobStatus.pending,
+                    prompt_fingerprint=fingerprint,
+                    quality=quality
+                )
+
+                print(job)
+                db.add(job)
+                db.commit()
         except SQLAlchemyError as e:
             db.rollback()
             return {"status": "error", "message": str(e)}, 500
         finally:
             db.close()
 
-        # Step 3. Start background processing
-        Thread(target=process_job, args=(job_uuid, user_prompt)).start()
-
-        # 4. Respond immediately with job UUID
+        # Step 4. Hand off to the bounded worker pool, or with the DB queue
+        # leave the pending row for a worker to claim
+        if db_backend():
+            wake_workers()
+        elif not job_executor.submit(process_job, job_uuid, user_prompt, user=user_id,
+                                     cost=quality_cost(preview_quality(quality)), key=job_uuid):
+            # Queue filled up between the admission check and now
+            mark_job_failed(job_uuid, "Server busy, job was not queued")
+            return busy_response()
+
+        # 5. Respond immediately with job UUID
         return {
             "status": "queued",
             "jobId": job_uuid
         }, 202
-    
+
+
+
+def pipeline_stats():
+    stats = {
+        "executor": job_executor.stats(),
+        "render_cache": render_cache_stats(),
+        "llm_cache": llm_cache.stats(),
+        "llm": llm_client.stats(),
+        "presign": presign_cache.stats()
+    }
+    if SANDBOX_POOL_SIZE > 0:
+        from app.sandbox.container_pool import sandbox_pool
+        stats["sandbox_pool"] = sandbox_pool.stats()
+    stats["scene_cache"] = scene_cache.stats()
+    stats["workspace"] = workspaces.stats()
+    stats["sandbox_reservations"] = reservation_stats()
+    stats["speculation"] = speculation.stats()
+    if SANDBOX_SCHEDULER:
+        stats["scheduler"] = resource_scheduler.stats()
+    if db_backend():
+        db = SessionLocal()
+        try:
+            stats["job_queue"] = queue_stats(db)
+        finally:
+            db.close()
+    return stats
+
+
+def collect_pipeline_stats():
+    # Exposes the numeric /api/stats values on /metrics as manim_<section>_<name> gauges
+    samples = []
+    for section, values in pipeline_stats().items():
+        for name, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            samples.append((f"manim_{section}_{name}", "gauge", f"{section} {name} (see /api/stats)", value))
+    return samples
+
+
+registry.register_collector(collect_pipeline_stats)
+
+
+@main.route('/generate/batch')
+class GenerateBatchRoute(Resource):
+    @main.expect(generate_batch_model)
+    def post(self):
+        data = request.get_json(silent=True) or {}
+        prompts = data.get("prompts")
+        if not isinstance(prompts, list) or not prompts or not all(isinstance(p, str) for p in prompts):
+            return {"status": "error", "message": "prompts must be a non-empty list of strings"}, 400
+        if len(prompts) > GENERATE_BATCH_LIMIT:
+            return {"status": "error", "message": f"At most {GENERATE_BATCH_LIMIT} prompts per batch"}, 400
+        quality = data.get("quality") or RENDER_DEFAULT_QUALITY
+        if quality not in RENDER_QUALITIES:
+            return {"status": "error", "message": f"quality must be one of {', '.join(RENDER_QUALITIES)}"}, 400
+
+        # Step 1: Pre-check every prompt; flagged ones get no job
+        rejected = []
+        accepted = []
+        for index, (prompt, (flagged, reason)) in enumerate(zip(prompts, screen_prompts(prompts))):
+            if flagged:
+                rejected.append({"index": index, "status": "abort", "reason": reason})
+            else:
+                accepted.append((index, prompt, prompt_fingerprint(prompt, quality)))
+        if not accepted:
+            return {"status": "abort", "rejected": rejected}, 400
+
+        batch_uuid = str(uuid.uuid4())
+        reserved = 0
+        db = SessionLocal()
+        try:
+            user_id = request_user_id(db)
+            if user_id is None:
+                return {"status": "error", "message": "Unknown user"}, 400
+            with coalescing(fp for _, _, fp in accepted):
+                # Sorted so concurrent batches take the advisory locks in the same order
+                for fingerprint in sorted({fp for _, _, fp in accepted}):
+                    lock_fingerprint(db, fingerprint)
+
+                # Step 2: Leaders are in-flight jobs with the same prompt, or
+                # the first job of the batch with that prompt
+                leaders = find_leaders(db, {fp for _, _, fp in accepted})
+                jobs = []
+                to_run = []
+                for index, prompt, fingerprint in accepted:
+                    job_uuid = str(uuid.uuid4())
+                    leader_uuid = leaders.get(fingerprint)
+                    jobs.append({"index": index, "jobId": job_uuid})
+                    if leader_uuid:
+                        jobs[-1]["coalesced"] = True
+                    else:
+                        if JOB_DEDUP_WINDOW > 0:
+                            leaders[fingerprint] = job_uuid
+                        to_run.append((job_uuid, prompt))
+                    db.add(Job(
+                        user_id=user_id,
+                        prompt=prompt,
+                        job_uuid=job_uuid,
+                        status=JobStatus.pending,
+                        prompt_fingerprint=fingerprint,
+                        leader_job_uuid=leader_uuid,
+                        batch_uuid=batch_uuid,
+                        quality=quality
+                    ))
+
+                # Admission control for the batch as a whole: every job that
+                # will render needs a queue slot. In-process batches have a
+                # bound of their own (JOB_BATCH_QUEUE_SIZE) and reserve their
+                # slots now, since their renders are queued after the LLM stage
+                if db_backend():
+                    admitted = has_capacity(db, len(to_run), user_id)
+                else:
+                    admitted = job_executor.reserve_batch(len(to_run), user_id)
+                    reserved = len(to_run) if admitted else 0
+                if not admitted:
+                    db.rollback()
+                    job_executor.record_rejected()
+                    return busy_response()
+
+                # Step 3: All job rows in one transaction
+                db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            job_executor.release_batch(reserved)
+            return {"status": "error", "message": str(e)}, 500
+        finally:
+            db.close()
+
+        # Step 4: LLM fan-out, sanitizing and renders run in the background;
+        # with the DB queue, workers claim the batch's jobs one by one
+        if to_run and db_backend():
+            wake_workers()
+        elif to_run:
+            start_batch(batch_uuid, to_run)
+        print(f"Batch {batch_uuid}: {len(jobs)} job(s), {len(to_run)} to run, {len(rejected)} rejected")
+
+        return {
+            "status": "queued",
+            "batchId": batch_uuid,
+            "jobs": jobs,
+            "rejected": rejected
+        }, 202
+
+
+@main.route('/batch_status/<string:batch_uuid>')
+@main.param('batch_uuid', 'Batch UUID')
+class BatchStatusRoute(Resource):
+    def get(self, batch_uuid):
+        db = SessionLocal()
+        try:
+            # One query for the whole batch; followers outside the batch are
+            # resolved with one more
+            jobs = db.query(Job).filter(Job.batch_uuid == batch_uuid).order_by(Job.id).all()
+            if not jobs:
+                return {"status": "error", "message": "Batch not found"}, 404
+
+            pending_leaders = {j.leader_job_uuid for j in jobs if j.leader_job_uuid and j.status not in TERMINAL_STATUSES}
+            leaders = {}
+            if pending_leaders:
+                leaders = {j.job_uuid: j for j in db.query(Job).filter(Job.job_uuid.in_(pending_leaders))}
+
+            counts = {status.value: 0 for status in JobStatus}
+            entries = []
+            for job in jobs:
+                source = job
+                if job.leader_job_uuid and job.status not in TERMINAL_STATUSES:
+                    source = leaders.get(job.leader_job_uuid, job)
+                counts[source.status.value] += 1
+                entry = {"jobId": job.job_uuid, "status": source.status.value}
+                if source.status == JobStatus.completed:
+                    entry["videoId"] = source.video_id
+                elif source.status == JobStatus.failed:
+                    entry["error_message"] = source.error_message
+                entries.append(entry)
+
+            finished = counts["completed"] + counts["failed"]
+            if finished == len(jobs):
+                status = "completed"
+            elif counts["pending"] == len(jobs):
+                status = "pending"
+            else:
+                status = "running"
+            return {
+                "status": status,
+                "batchId": batch_uuid,
+                "total": len(jobs),
+                "counts": counts,
+                "progress": round(finished / len(jobs), 3),
+                "jobs": entries
+            }, 200
+        finally:
+            db.close()
+
+
+@main.route('/stats')
+class StatsRoute(Resource):
+    def get(self):
+        return pipeline_stats(), 200
 
 
 @main.route('/job_status/<string:job_uuid>')
@@ -95,21 +399,41 @@ class JobStatusRoute(Resource):
     def get(self, job_uuid):
         db = SessionLocal()
         try:
-            job = db.query(Job).filter(Job.job_uuid == job_uuid).first()
+            # Job, its video and the video's renditions in one round trip
+            job = db.query(Job).options(
+                joinedload(Job.video).joinedload(Video.renditions)
+            ).filter(Job.job_uuid == job_uuid).first()
             if not job:
                 return {"status": "error", "message": "Job not found"}, 404
         
+            if job.leader_job_uuid and job.status not in TERMINAL_STATUSES:
+                resolve_follower(db, job)
+
             response = {
                 "status": job.status,
                 "jobId": job.job_uuid,
-                "created_at": job.created_at.isoformat()
+                "created_at": job.created_at.isoformat(),
+                "quality": job.quality
             }
+            if job.leader_job_uuid:
+                response["coalesced"] = True
+                response["leaderJobId"] = job.leader_job_uuid
+            if job.stage_timings:
+                response["stageTimings"] = job.stage_timings
+            if job.status == JobStatus.pending and not job.leader_job_uuid:
+                position = queue_position(db, job)
+                if position:
+                    ahead, eta = position
+                    response["queuePosition"] = ahead
+                    if eta is not None:
+                        response["estimatedStart"] = (datetime.utcnow() + timedelta(seconds=eta)).isoformat()
 
             if job.status == "completed":
-                video = db.query(Video).filter(Video.job_id == job_uuid).first()
+                video = job.video
                 if video:
                     response["videoId"] = video.id
                     response["codeText"] = video.associated_code
+                    response["renditions"] = sorted((r.quality for r in video.renditions), key=QUALITY_ORDER.index)
 
             elif job.status == "failed":
                 response["error_message"] = job.error_message
@@ -120,20 +444,135 @@ class JobStatusRoute(Resource):
             db.close()
 
 
+def load_event_source(job_uuid: str):
+    # One query up front; after that progress comes from the event bus, not the DB
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.job_uuid == job_uuid).first()
+        if not job:
+            return None, None
+        if job.leader_job_uuid and job.status not in TERMINAL_STATUSES:
+            resolve_follower(db, job)
+        snapshot = status_event(job)
+        snapshot.update(jobId=job.job_uuid, seq=0, time=time.time())
+        # Followers have no pipeline of their own; they watch their leader's
+        source = job.leader_job_uuid if job.status not in TERMINAL_STATUSES and job.leader_job_uuid else job.job_uuid
+        return source, snapshot
+    finally:
+        db.close()
+
+
+def refresh_status(job_uuid: str):
+    """The job's final status event from the DB, or None while it is still running.
+
+    Covers a terminal event that never reached this process (NOTIFY failed,
+    listener reconnecting); readers call it when the bus has been quiet.
+    """
+    _, snapshot = load_event_source(job_uuid)
+    if snapshot and snapshot["status"] in TERMINAL_EVENT_STATUSES:
+        return dict(snapshot, seq=int(time.time() * 1_000_000))
+    return None
+
+
+def format_sse(event: dict):
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+@main.route('/job_events/<string:job_uuid>')
+@main.param('job_uuid', 'Job UUID')
+class JobEventsRoute(Resource):
+    def get(self, job_uuid):
+        """Server-Sent Events stream of status changes and stage progress."""
+        source, snapshot = load_event_source(job_uuid)
+        if not snapshot:
+            return {"status": "error", "message": "Job not found"}, 404
+        last_seq = int(request.headers.get("Last-Event-ID") or 0)
+
+        def stream():
+            seq = last_seq
+            yield format_sse(snapshot)
+            if snapshot["status"] in TERMINAL_EVENT_STATUSES:
+                return
+            deadline = time.monotonic() + JOB_EVENTS_STREAM_TIMEOUT
+            while time.monotonic() < deadline:
+                events = job_events.wait(source, seq, JOB_EVENTS_KEEPALIVE)
+                if not events:
+                    final = refresh_status(job_uuid)
+                    if final:
+                        yield format_sse(final)
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                for event in events:
+                    seq = event["seq"]
+                    yield format_sse(dict(event, jobId=job_uuid))
+                    if event["type"] == "status" and event["status"] in TERMINAL_EVENT_STATUSES:
+                        return
+
+        return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@main.route('/job_status/<string:job_uuid>/wait')
+@main.param('job_uuid', 'Job UUID')
+class JobStatusWaitRoute(Resource):
+    def get(self, job_uuid):
+        """Long-poll: returns as soon as there are events newer than ?since=, or after ?timeout= seconds."""
+        source, snapshot = load_event_source(job_uuid)
+        if not snapshot:
+            return {"status": "error", "message": "Job not found"}, 404
+        since = request.args.get("since", 0, type=int)
+        timeout = min(request.args.get("timeout", JOB_EVENTS_MAX_WAIT, type=float), JOB_EVENTS_MAX_WAIT)
+
+        if snapshot["status"] in TERMINAL_EVENT_STATUSES:
+            events = [snapshot]
+        else:
+            events = [dict(e, jobId=job_uuid) for e in job_events.wait(source, since, timeout)]
+            if not events:
+                final = refresh_status(job_uuid)
+                events = [final] if final else []
+        return {
+            "status": events[-1]["status"] if events and events[-1]["type"] == "status" else snapshot["status"],
+            "events": events,
+            "since": events[-1]["seq"] if events else since
+        }, 200
+
+
 @main.route('/get_presigned_url/<string:video_id>')
 @main.param('video_id', 'VIDEO ID')
+@main.param('quality', 'best (default) for the best rendition available now, or low, medium, high, production')
 class PresignedUrlRoute(Resource):
     def get(self, video_id):
         if not video_id:
             return {'error': 'Missing video ID'}, 400
+        if not video_id.isdigit():
+            return {'error': 'Invalid video ID'}, 400
+        video_id = int(video_id)
+        quality = request.args.get("quality", "best")
+        if quality != "best" and quality not in RENDER_QUALITIES:
+            return {'error': f"quality must be best or one of {', '.join(RENDER_QUALITIES)}"}, 400
+
+        # Signed URLs are reused until shortly before they expire; a hit
+        # needs neither the database nor a signature. videos.video_url is the
+        # best rendition, cached under the bare video ID.
+        cache_key = video_id if quality == "best" else (video_id, quality)
+        url = presign_cache.get(cache_key)
+        if url:
+            return {'url': url}
 
         db = SessionLocal()
         try:
-            video = db.query(Video).filter(Video.id == video_id).first()
+            if quality == "best":
+                video = db.query(Video).filter(Video.id == video_id).first()
+            else:
+                video = db.query(VideoRendition).filter(
+                    VideoRendition.video_id == video_id,
+                    VideoRendition.quality == quality
+                ).first()
             if not video:
                 return {'error': 'Video not found'}, 404
-            response = generate_presigned_url(video.video_url)
-            return response
+            final = quality != "best" or video_id not in upgrades_pending(db, [video_id])
+            return {'url': presign_cache.sign(cache_key, video.video_url, final)}
         except Exception as e:
             print(e)
             return {'error': str(e)}, 500
@@ -141,86 +580,140 @@ class PresignedUrlRoute(Resource):
             db.close()
 
 
-
-def process_job(job_uuid: str, prompt: str):
-    db = SessionLocal()
+@main.route('/presigned_urls')
+class PresignedUrlBatchRoute(Resource):
+    @main.expect(presign_batch_model)
+    def post(self):
+        data = request.get_json() or {}
+        video_ids = data.get("video_ids") or []
+        if not isinstance(video_ids, list) or len(video_ids) > PRESIGN_BATCH_LIMIT:
+            return {'error': f'video_ids must be a list of at most {PRESIGN_BATCH_LIMIT} IDs'}, 400
+        try:
+            video_ids = list(dict.fromkeys(int(v) for v in video_ids))
+        except (TypeError, ValueError):
+            return {'error': 'Invalid video ID'}, 400
+
+        urls = {}
+        missing = []
+        for video_id in video_ids:
+            url = presign_cache.get(video_id)
+            if url:
+                urls[str(video_id)] = url
+            else:
+                missing.append(video_id)
+
+        errors = {}
+        if missing:
+            # One query for every URL the cache couldn't answer
+            db = SessionLocal()
+            try:
+                videos = db.query(Video.id, Video.video_url).filter(Video.id.in_(missing)).all()
+                pending = upgrades_pending(db, missing)
+            finally:
+                db.close()
+            for video in videos:
+                try:
+                    urls[str(video.id)] = presign_cache.sign(video.id, video.video_url, video.id not in pending)
+                except Exception as e:
+                    errors[str(video.id)] = str(e)
+
+        not_found = [v for v in video_ids if str(v) not in urls and str(v) not in errors]
+        return {'urls': urls, 'not_found': not_found, 'errors': errors}, 200
+
+
+
+def upgrades_pending(db, video_ids):
+    """Ids of the videos whose best URL will still change: the rendition at
+    their job's quality isn't there yet."""
+    final = db.query(VideoRendition.video_id).join(Video, Video.id == VideoRendition.video_id).join(
+        Job, Job.job_uuid == Video.job_id).filter(
+        VideoRendition.video_id.in_(video_ids), VideoRendition.quality == Job.quality)
+    with_job = db.query(Video.id).join(Job, Job.job_uuid == Video.job_id).filter(Video.id.in_(video_ids))
+    return {video_id for video_id, in with_job} - {video_id for video_id, in final}
+
+
+def request_user_id(db):
+    header = request.headers.get("X-User-Id")
+    if not header:
+        return DEFAULT_USER_ID
     try:
-        job = db.query(Job).filter(Job.job_uuid == job_uuid).first()
-        if not job:
-            print(f"Job {job_uuid} not found.")
-            return
-        
-        job.status = JobStatus.running
-        db.commit()
-    
-        # Step 1: OpenAI call
-        print(f"PROMPT: {prompt}")
-        response = get_manim_code(prompt)
-
-        if response.get("status") == "rejected":
-            job.status = JobStatus.failed
-            job.error_message = response.get("reason")
-            db.commit()
-            return
-                
-        code = response.get("code", "")
-        print(code)
-
-        job.generated_code=code
-        db.commit()
-
-        print("AST")
-
-        # Step 2: AST sanitizer
-        safe, reason = sanitize_ast(code)
-        if not safe:
-            print(safe,reason)
-            job.status = JobStatus.failed
-            job.error_message = f"AST Sanitizer: {reason}"
-            db.commit()
-            return
-
-        # Step 5: Run in Docker
-        print("DOCKER CODE")
-        result = run_code_in_docker(code)
-        print(result["video_path"])
-        if result["status"] == "success":
-            s3_result = upload_file_to_s3(result["video_path"])
-            if(s3_result["status"] != "success"):
-                job.status = JobStatus.failed
-                job.error_message = f"S3 Upload Error: {s3_result['message']}"
-                db.commit()
-                return
-            job.status = JobStatus.completed
-            db.commit()
-
-            video = Video(
-                user_id=job.user_id,
-                job_id=job.job_uuid,
-                title=f"Video for {prompt[:30]}",
-                associated_code=code,
-                video_url=s3_result["url"]
-            )
-            db.add(video)
-            db.commit()
-
-            # Clean up local file after successful upload
-            if os.path.exists(result['video_path']):
-                print(f"VIDEO PATH = {result['video_path']}")
-                # os.remove(result["video_path"])
-            return
-        
-        
-        # If Docker fails
+        user_id = int(header)
+    except ValueError:
+        return None
+    return user_id if db.get(User, user_id) else None
+
+
+def busy_response():
+    retry_after = job_executor.retry_after()
+    return {
+        "status": "busy",
+        "message": "Too many jobs in progress, please retry later",
+        "retry_after": retry_after
+    }, 503, {"Retry-After": str(retry_after)}
+
+
+def prompt_fingerprint(prompt: str, quality: str = "low"):
+    # Same prompt at a different quality is a different video
+    return hash_text(f"{normalize_prompt(prompt)}\0{quality}")
+
+
+@contextmanager
+def coalescing(fingerprints):
+    """Hold the in-process locks of these prompt fingerprints, taken in a
+    fixed order so batches can't deadlock each other."""
+    stripes = sorted({int(fp[:8], 16) % len(coalesce_locks) for fp in fingerprints})
+    with ExitStack() as stack:
+        for stripe in stripes:
+            stack.enter_context(coalesce_locks[stripe])
+        yield
+
+
+def lock_fingerprint(db, fingerprint: str):
+    # Transaction scoped, released by the commit/rollback that follows
+    if JOB_DEDUP_WINDOW > 0 and db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:fp))"), {"fp": fingerprint})
+
+
+def find_leader(db, fingerprint: str):
+    if JOB_DEDUP_WINDOW <= 0:
+        return None
+    since = datetime.utcnow() - timedelta(seconds=JOB_DEDUP_WINDOW)
+    return db.query(Job).filter(
+        Job.prompt_fingerprint == fingerprint,
+        Job.leader_job_uuid.is_(None),
+        Job.status.in_([JobStatus.pending, JobStatus.running]),
+        Job.created_at >= since
+    ).order_by(Job.created_at).first()
+
+
+def find_leaders(db, fingerprints):
+    """fingerprint -> job_uuid of the in-flight leader, for many fingerprints at once."""
+    if JOB_DEDUP_WINDOW <= 0 or not fingerprints:
+        return {}
+    since = datetime.utcnow() - timedelta(seconds=JOB_DEDUP_WINDOW)
+    leaders = {}
+    rows = db.query(Job.prompt_fingerprint, Job.job_uuid).filter(
+        Job.prompt_fingerprint.in_(fingerprints),
+        Job.leader_job_uuid.is_(None),
+        Job.status.in_([JobStatus.pending, JobStatus.running]),
+        Job.created_at >= since
+    ).order_by(Job.created_at)
+    for fingerprint, job_uuid in rows:
+        leaders.setdefault(fingerprint, job_uuid)
+    return leaders
+
+
+def resolve_follower(db, job):
+    # Covers a follower that joined just as its leader finished, after the
+    # leader had already notified its followers
+    leader = db.query(Job).filter(Job.job_uuid == job.leader_job_uuid).first()
+    if not leader:
         job.status = JobStatus.failed
-        job.error_message = result.get("error", "Unknown error during Docker run")
+        job.error_message = "Coalesced job lost its leader"
         db.commit()
-
-    except Exception as e:
-        job.status = JobStatus.failed
-        job.error_message = f"Exception: {str(e)}"
+    elif leader.status in TERMINAL_STATUSES:
+        copy_outcome(leader, job)
         db.commit()
-    finally:
-        db.close()
-
-
+    else:
+        # Mirrored for the response only; the follower row stays pending
+        job.status = leader.status
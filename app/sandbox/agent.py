@@ -0,0 +1,92 @@
+"""In-container render agent used by the warm sandbox pool.
+
+Runs inside the manim image. It imports manim once, then serves render
+requests read as JSON lines from stdin. Every request is rendered in a forked
+child so the preloaded interpreter is reused but no state leaks between jobs.
+
+Protocol (one JSON object per line):
+    host  -> agent  {"job_dir": "/workspace/<id>", "args": ["-ql", "main.py"]}
+    agent -> host   {"type": "ready"}
+    agent -> host   {"type": "log", "line": "..."}        (zero or more)
+    agent -> host   {"type": "result", "returncode": 0}
+
+This file must only depend on the standard library and manim itself.
+"""
+import os
+import re
+import sys
+import json
+import codecs
+
+
+def emit(message):
+    sys.__stdout__.write(json.dumps(message) + "\n")
+    sys.__stdout__.flush()
+
+
+def render_in_child(job_dir, args):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Child: point stdio at the pipe and run the manim CLI in the job dir
+        try:
+            os.close(read_fd)
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.dup2(write_fd, 1)
+            os.dup2(write_fd, 2)
+            os.chdir(job_dir)
+            from manim.__main__ import main
+            main(["render", *args], standalone_mode=False)
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        os._exit(code)
+
+    # Parent: relay the child's output line by line, then reap it. Progress
+    # bars redraw with \r, so that ends a line too
+    os.close(write_fd)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    partial = ""
+    while True:
+        data = os.read(read_fd, 65536)
+        if not data:
+            break
+        parts = re.split(r"[\r\n]", partial + decoder.decode(data))
+        partial = parts.pop()
+        for part in parts:
+            emit({"type": "log", "line": part})
+    os.close(read_fd)
+    if partial:
+        emit({"type": "log", "line": partial})
+    _, status = os.waitpid(pid, 0)
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def main():
+    # Preload the heavy imports once; every forked child inherits them
+    import numpy  # noqa: F401
+    import manim  # noqa: F401
+    import manim.__main__  # noqa: F401
+
+    emit({"type": "ready"})
+    for raw in sys.stdin:
+        raw = raw.strip()
+        if not raw:
+            continue
+        request = json.loads(raw)
+        returncode = render_in_child(request["job_dir"], request.get("args", []))
+        emit({"type": "result", "returncode": returncode})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+import signal
+import subprocess
+from contextlib import nullcontext
+
+from app.sandbox.docker_runner import (
+    SANDBOX_IMAGE, SANDBOX_TIMEOUT, SANDBOX_POOL_SIZE,
+    write_script, find_video, render_args, lockdown_flags,
+)
+from app.sandbox.workspace import workspaces
+from app.sandbox.output_monitor import OutputMonitor
+from app.sandbox.scheduler import SANDBOX_SCHEDULER, SANDBOX_PIDS_LIMIT
+from app.utils.metrics import stage_timer
+
+# Recycle policy: a container is replaced after this many jobs, after this
+# many seconds, or right away on any anomaly (timeout, dead agent, crash)
+SANDBOX_POOL_MAX_JOBS = int(os.getenv("SANDBOX_POOL_MAX_JOBS", "20"))
+SANDBOX_POOL_MAX_AGE = int(os.getenv("SANDBOX_POOL_MAX_AGE", "3600"))
+# Also treat a failed render (bad scene, manim exception) as an anomaly
+SANDBOX_POOL_RECYCLE_ON_ERROR = os.getenv("SANDBOX_POOL_RECYCLE_ON_ERROR", "1") == "1"
+SANDBOX_POOL_START_TIMEOUT = int(os.getenv("SANDBOX_POOL_START_TIMEOUT", "120"))
+
+AGENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent.py")
+
+class SandboxError(Exception):
+    pass
+
+
+class SandboxContainer:
+    """One pre-started container running the render agent.
+
+    Each container only sees its own workspace directory, so jobs in different
+    containers can never read each other's files. Setting
+    SANDBOX_POOL_MAX_JOBS=1 gives every job a fresh container.
+    """
+
+    def __init__(self):
+        self.name = f"manim-pool-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.workspace = None
+        self.jobs_run = 0
+        self.started_at = None
+        self.healthy = False
+        self.limits = None  # (cpus, memory) currently applied
+        self._process = None
+        self._lines = queue.Queue()
+
+    def docker_command(self):
+        command = [
+            "docker", "run", "-i", "--rm",
+            "--name", self.name,
+            *lockdown_flags(),
+            "-v", f"{os.path.abspath(self.workspace)}:/workspace",
+            "-v", f"{AGENT_PATH}:/agent/agent.py:ro",
+            "-w", "/workspace",
+        ]
+        if SANDBOX_SCHEDULER:
+            # CPU and memory follow each job's lease (apply_limits)
+            command += ["--pids-limit", str(SANDBOX_PIDS_LIMIT)]
+        return command + [SANDBOX_IMAGE, "python", "-u", "/agent/agent.py"]
+
+    def start(self):
+        self.workspace = workspaces.create("pool")
+        self._process = subprocess.Popen(
+            self.docker_command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        message = self._next_message(SANDBOX_POOL_START_TIMEOUT)
+        if message.get("type") != "ready":
+            self.kill()
+            raise SandboxError(f"Sandbox agent failed to start: {message}")
+        self.started_at = time.monotonic()
+        self.healthy = True
+
+    def _read_stdout(self):
+        for line in self._process.stdout:
+            self._lines.put(line)
+        self._lines.put(None)  # EOF: the agent or the container died
+
+    def _next_message(self, timeout):
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0.0, timeout))
+            except queue.Empty:
+                raise TimeoutError()
+            if line is None:
+                raise SandboxError("Sandbox agent exited unexpectedly")
+            try:
+                return json.loads(line)
+            except json.JSONDecodeError:
+                # Stray output from the image entrypoint; not part of the protocol
+                continue
+
+    def expired(self):
+        if not self.healthy:
+            return True
+        if self.jobs_run >= SANDBOX_POOL_MAX_JOBS:
+            return True
+        return time.monotonic() - self.started_at > SANDBOX_POOL_MAX_AGE
+
+    def apply_limits(self, lease):
+        """Resize the container to the job's CPU and memory quota."""
+        if lease is None or self.limits == (lease.cpus, lease.memory):
+            return
+        result = subprocess.run(["docker", "update", *lease.limit_flags(), self.name],
+                                capture_output=True, text=True)
+        if result.returncode == 0:
+            self.limits = (lease.cpus, lease.memory)
+        else:
+            # e.g. a memory limit below what the idle agent already uses
+            print(f"Sandbox pool: could not resize {self.name}: {result.stderr.strip()}")
+
+    def render(self, job_id: str, timeout: int, args, monitor: OutputMonitor):
+        """Render workspace/<job_id>/main.py, feeding its output to monitor.
+        Returns the return code; raises TimeoutError on timeout, abort or cancel."""
+        self.jobs_run += 1
+        request = {"job_dir": f"/workspace/{job_id}", "args": args}
+        deadline = time.monotonic() + timeout
+        try:
+            self._process.stdin.write(json.dumps(request) + "\n")
+            self._process.stdin.flush()
+            while True:
+                remaining = monitor.deadline(deadline) - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError()
+                try:
+                    # Wake up now and then to notice a cancelled render
+                    message = self._next_message(min(remaining, 0.25))
+                except TimeoutError:
+                    continue
+                if message.get("type") == "log":
+                    monitor.feed_line(message.get("line", ""))
+                elif message.get("type") == "result":
+                    return message.get("returncode", 1)
+        except BaseException:
+            self.healthy = False
+            raise
+
+    def kill(self):
+        self.healthy = False
+        subprocess.run(["docker", "kill", self.name], capture_output=True)
+        if self._process:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        workspaces.release(self.workspace)
+
+
+class SandboxPool:
+    def __init__(self, size: int):
+        self.size = size
+        self._idle = []
+        self._cond = threading.Condition()
+        self._live = 0  # started or starting containers
+
+        self._jobs = 0
+        self._recycled = 0
+        self._start_failures = 0
+        self._aborted = 0
+        self._cancelled = 0
+
+    def warm(self):
+        # Bring the pool up to size in the background
+        with self._cond:
+            missing = self.size - self._live
+            self._live += missing
+        for _ in range(missing):
+            threading.Thread(target=self._start_container, daemon=True).start()
+
+    def _start_container(self):
+        container = SandboxContainer()
+        try:
+            container.start()
+        except Exception as e:
+            print(f"Sandbox pool: container start failed: {e}")
+            workspaces.release(container.workspace)
+            with self._cond:
+                self._live -= 1
+                self._start_failures += 1
+                self._cond.notify_all()
+            return
+        with self._cond:
+            self._idle.append(container)
+            self._cond.notify()
+
+    def _acquire(self, timeout):
+        self.warm()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._idle:
+                if self._live == 0:
+                    # Every start failed; don't wait for containers that will never come
+                    raise SandboxError("No sandbox containers available")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError()
+                self._cond.wait(remaining)
+            return self._idle.pop()
+
+    def _release(self, container):
+        if container.expired():
+            with self._cond:
+                self._live -= 1
+                self._recycled += 1
+            threading.Thread(target=container.kill, daemon=True).start()
+            self.warm()
+            return
+        with self._cond:
+            self._idle.append(container)
+            self._cond.notify()
+
+    def reserve(self, timeout):
+        """Take an idle container for a render that will run() with it soon."""
+        return self._acquire(timeout)
+
+    def unreserve(self, container):
+        self._release(container)
+
+    def run(self, code: str, timings: dict = None, quality: str = "low", scene: str = None,
+            monitor: OutputMonitor = None, lease=None, container=None):
+        """Render on a warm container: the given reserved one, or the next idle one."""
+        monitor = monitor or OutputMonitor()
+        job_id = str(uuid.uuid4())
+        try:
+            # Waiting for a warm container (or one being started) is this path's start-up cost
+            with stage_timer("container_start", timings):
+                if container is None:
+                    container = self._acquire(SANDBOX_TIMEOUT)
+        except TimeoutError:
+            return {"status": "error", "error": "Timed out waiting for a sandbox", "job_id": job_id}
+        except SandboxError as e:
+            return {"status": "error", "error": str(e), "job_id": job_id}
+
+        with stage_timer("render", timings) as span:
+            result = self._render(container, job_id, code, quality, scene, monitor, lease)
+            if result["status"] != "success":
+                span.fail()
+        return result
+
+    def _render(self, container, job_id: str, code: str, quality: str, scene: str, monitor: OutputMonitor,
+                lease=None):
+        job_dir = os.path.join(container.workspace, job_id)
+        result = self._render_job(container, job_dir, job_id, code, quality, scene, monitor, lease)
+        if result["status"] != "success":
+            workspaces.release(job_dir)
+            return result
+        # The container's workspace goes when the container is recycled, which
+        # can be before the caller uploads; give the job a workspace of its own
+        try:
+            workspace = workspaces.adopt(job_dir)
+        except OSError as e:
+            workspaces.release(job_dir)
+            return {"status": "error", "error": f"Could not keep the rendered video: {e}", "job_id": job_id}
+        result["video_path"] = os.path.join(workspace, os.path.relpath(result["video_path"], job_dir))
+        result["workspace"] = workspace
+        return result
+
+    def _render_job(self, container, job_dir: str, job_id: str, code: str, quality: str, scene: str,
+                    monitor: OutputMonitor, lease=None):
+        try:
+            with self._cond:
+                self._jobs += 1
+            write_script(job_dir, code)
+            container.apply_limits(lease)
+            with lease.track(container.name) if lease else nullcontext():
+                returncode = container.render(job_id, SANDBOX_TIMEOUT, render_args(quality, scene), monitor)
+            if returncode == -signal.SIGKILL and lease:
+                # Nothing in the container kills renders but the kernel's OOM killer
+                container.healthy = False
+                return {"status": "error", "job_id": job_id, "oom": True,
+                        "error": f"Render ran out of memory ({lease.memory} byte limit)\n{monitor.failure()}"}
+            if returncode != 0:
+                if returncode < 0 or SANDBOX_POOL_RECYCLE_ON_ERROR:
+                    container.healthy = False
+                return {"status": "error", "error": monitor.failure(), "job_id": job_id}
+
+            print("Docker Run successfully")
+            video_path = find_video(job_dir, quality, scene)
+            if video_path:
+                return {"status": "success", "video_path": video_path, "job_id": job_id}
+            return {"status": "error", "error": monitor.text() or "No video file generated.", "job_id": job_id}
+        except TimeoutError:
+            # Timed out, cancelled, or printed a traceback and didn't exit;
+            # either way the container is unhealthy now and gets killed on release
+            if monitor.cancelled:
+                with self._cond:
+                    self._cancelled += 1
+            elif monitor.aborted:
+                with self._cond:
+                    self._aborted += 1
+            return {"status": "error", "error": monitor.failure(timed_out=True), "job_id": job_id}
+        except Exception as e:
+            container.healthy = False
+            return {"status": "error", "error": str(e), "job_id": job_id}
+        finally:
+            self._release(container)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "live": self._live,
+                "idle": len(self._idle),
+                "jobs": self._jobs,
+                "recycled": self._recycled,
+                "start_failures": self._start_failures,
+                "aborted": self._aborted,
+                "cancelled": self._cancelled,
+            }
+
+
+sandbox_pool = SandboxPool(SANDBOX_POOL_SIZE)
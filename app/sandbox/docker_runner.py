@@ -1,68 +1,285 @@
 import os
-import uuid
+import time
 import shutil
+import threading
 import subprocess
+from functools import partial
+from contextlib import nullcontext
+
+from app.utils.metrics import record_stage, stage_timer, STAGE_IN_FLIGHT
+from app.sandbox.workspace import workspaces, WorkspaceFull, SANDBOX_WORKSPACE_ROOT
+from app.sandbox.output_monitor import OutputMonitor, estimate_animations
+from app.sandbox.scheduler import resource_scheduler, SANDBOX_SCHEDULER
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-BASE_DIR = os.path.join(CURRENT_DIR, "temp")
+BASE_DIR = SANDBOX_WORKSPACE_ROOT
 os.makedirs(BASE_DIR, exist_ok=True)
 
-def run_code_in_docker(code: str):
-    job_id = str(uuid.uuid4())
-    job_dir = os.path.join(BASE_DIR, job_id)
-    os.makedirs(job_dir, exist_ok=True)
+SANDBOX_IMAGE = os.getenv("SANDBOX_IMAGE", "manimcommunity/manim")
+SANDBOX_TIMEOUT = int(os.getenv("SANDBOX_TIMEOUT", "300"))
+# Number of warm containers kept ready; 0 keeps the cold `docker run` per job
+SANDBOX_POOL_SIZE = int(os.getenv("SANDBOX_POOL_SIZE", "0"))
+# Lockdown options for every sandbox container: cold and pooled renders, and
+# helpers such as the scene concat
+SANDBOX_NETWORK = os.getenv("SANDBOX_NETWORK", "none")
+SANDBOX_READ_ONLY = os.getenv("SANDBOX_READ_ONLY", "0") == "1"
+# Exit status of a container the kernel killed, which for a render we didn't
+# kill ourselves means it ran out of memory
+OOM_EXIT_CODE = 137
 
-    # Write the code to a Python file
+# Quality name -> (manim flag, output directory under media/videos/main), lowest first
+RENDER_QUALITIES = {
+    "low": ("-ql", "480p15"),
+    "medium": ("-qm", "720p30"),
+    "high": ("-qh", "1080p60"),
+    "production": ("-qp", "2160p60"),
+}
+QUALITY_ORDER = list(RENDER_QUALITIES)
+
+
+def lockdown_flags():
+    flags = ["--network", SANDBOX_NETWORK, "--cap-drop", "ALL", "--security-opt", "no-new-privileges"]
+    if SANDBOX_READ_ONLY:
+        flags += ["--read-only", "--tmpfs", "/tmp"]
+    return flags
+
+
+def render_args(quality: str = "low", scene: str = None):
+    args = [RENDER_QUALITIES[quality][0], "main.py"]
+    if scene:
+        args.append(scene)
+    return args
+
+
+RENDER_ARGS = render_args("low")
+
+
+def write_script(job_dir: str, code: str):
+    os.makedirs(job_dir, exist_ok=True)
     script_path = os.path.join(job_dir, "main.py")
     with open(script_path, "w",encoding="utf-8") as f:
         f.write(code)
+    return script_path
+
+
+def find_video(job_dir: str, quality: str = "low", scene: str = None):
+    OUTPUT_DIR = os.path.join(job_dir,"media","videos","main", RENDER_QUALITIES[quality][1])
+    if scene:
+        path = os.path.join(OUTPUT_DIR, f"{scene}.mp4")
+        return path if os.path.exists(path) else None
+    # Look for MP4 output
+    for root, dirs, files in os.walk(OUTPUT_DIR):
+        for file in files:
+            if file.endswith(".mp4"):
+                return os.path.join(root, file)
+    return None
+
+
+def run_code_in_docker(code: str, timings: dict = None, quality: str = "low", scene: str = None,
+                       on_progress=None, reservation=None, cancel: threading.Event = None):
+    """Render code in a sandbox; stage durations are added to timings if given.
+
+    Scripts with several scenes are split into one render per scene (see
+    app/sandbox/scenes.py); scene renders only that scene. on_progress is
+    called with (progress, animation) while manim renders. reservation is a
+    SandboxReservation for this render, taken in place of waiting for a slot.
+    Setting the cancel event kills the render, or skips it if not started.
+    A successful result carries the "workspace" holding the video, which the
+    caller releases (workspaces.release) once it is done with the file.
+    """
+    if scene is None:
+        from app.sandbox.scenes import find_scenes, render_scenes
+        scenes = find_scenes(code)
+        if len(scenes) > 1:
+            # Each scene gets a slot of its own
+            if reservation is not None:
+                reservation.cancel()
+            render_one = partial(run_code_in_docker, cancel=cancel) if cancel else run_code_in_docker
+            return render_scenes(code, scenes, render_one, timings, quality, on_progress)
+
+    expected_animations = estimate_animations(code, scene)
+    lease = container = None
+    if reservation is not None:
+        with stage_timer("resource_wait", timings):
+            lease, container = reservation.take()
+    reserved = [container]
+
+    def render(lease):
+        if cancel is not None and cancel.is_set():
+            return {"status": "error", "error": "Render cancelled", "job_id": None}
+        monitor = OutputMonitor(on_progress, expected_animations, cancel=cancel)
+        if SANDBOX_POOL_SIZE > 0:
+            from app.sandbox.container_pool import sandbox_pool
+            container, reserved[0] = reserved[0], None
+            return sandbox_pool.run(code, timings, quality, scene, monitor, lease, container)
+        return run_cold(code, timings, quality, scene, monitor, lease)
+
+    try:
+        return render_with_resources(render, quality, timings, lease=lease)
+    finally:
+        if reserved[0] is not None:
+            from app.sandbox.container_pool import sandbox_pool
+            sandbox_pool.unreserve(reserved[0])
+
+
+def render_with_resources(render, quality: str = "low", timings: dict = None, scheduler=None, lease=None):
+    """Call render(lease) once the scheduler has room for a quality render
+    (lease is None with SANDBOX_SCHEDULER=0), or at once with a lease acquired
+    beforehand. A render killed for outgrowing an adapted memory quota is
+    retried once with the full quota."""
+    scheduler = scheduler or (resource_scheduler if SANDBOX_SCHEDULER else None)
+    if scheduler is None:
+        return render(None)
+    ceiling = False
+    while True:
+        if lease is None:
+            with stage_timer("resource_wait", timings) as span:
+                lease = scheduler.acquire(quality, SANDBOX_TIMEOUT, ceiling)
+                if lease is None:
+                    span.fail()
+        if lease is None:
+            return {"status": "error", "error": "Timed out waiting for render resources", "job_id": None}
+        try:
+            result = render(lease)
+        finally:
+            scheduler.release(lease)
+        if not result.get("oom"):
+            return result
+        scheduler.record_oom(lease)
+        if lease.ceiling:
+            return result
+        print(f"Render ran out of its {lease.memory} byte memory quota; retrying with the full quota")
+        ceiling = True
+        lease = None
+
+
+def run_cold(code: str, timings: dict, quality: str, scene: str, monitor: OutputMonitor, lease=None):
+    STAGE_IN_FLIGHT.inc("render")
+    started = time.perf_counter()
+    try:
+        result = run_code_in_cold_container(code, quality, scene, monitor, lease)
+    finally:
+        STAGE_IN_FLIGHT.dec("render")
+    elapsed = time.perf_counter() - started
+    # Until manim prints its first line, the container and the manim import
+    # are starting; that part is what the warm pool saves
+    startup = monitor.startup_seconds() or 0.0
+    if startup:
+        record_stage("container_start", startup, timings)
+    record_stage("render", elapsed - startup, timings, failed=result["status"] != "success")
+    return result
+
 
-    # Run Docker
+def run_code_in_cold_container(code: str, quality: str = "low", scene: str = None, monitor: OutputMonitor = None,
+                               lease=None):
+    monitor = monitor or OutputMonitor()
+    try:
+        job_dir = workspaces.create("job")
+    except WorkspaceFull as e:
+        return {"status": "error", "error": str(e), "job_id": None}
+    job_id = os.path.basename(job_dir)
+    result = render_in_cold_container(job_dir, job_id, code, quality, scene, monitor, lease)
+    if result["status"] == "success":
+        result["workspace"] = job_dir
+    else:
+        workspaces.release(job_dir)
+    return result
+
+
+def pump_output(stream, monitor: OutputMonitor):
+    while True:
+        data = os.read(stream.fileno(), 65536)
+        if not data:
+            break
+        monitor.feed_bytes(data)
+    monitor.close()
+
+
+def stream_container(process, name: str, monitor: OutputMonitor, timeout: int):
+    """Feed the container's output to monitor until it exits. Returns the exit
+    code, or None if the container was killed (timeout, or a traceback)."""
+    reader = threading.Thread(target=pump_output, args=(process.stdout, monitor), daemon=True)
+    reader.start()
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = monitor.deadline(deadline) - time.monotonic()
+        if remaining <= 0:
+            # Killing the docker CLI would leave the container running
+            subprocess.run(["docker", "kill", name], capture_output=True)
+            process.kill()
+            process.wait()
+            reader.join(5)
+            return None
+        try:
+            process.wait(timeout=min(remaining, 0.25))
+            break
+        except subprocess.TimeoutExpired:
+            continue
+    reader.join(5)
+    return process.returncode
+
+
+def render_in_cold_container(job_dir: str, job_id: str, code: str, quality: str, scene: str,
+                             monitor: OutputMonitor, lease=None):
+    # Write the code to a Python file
+    write_script(job_dir, code)
+
+    # Run Docker; named so it can be killed
+    name = f"manim-{job_id}"
     docker_command = [
         "docker", "run", "--rm",
+        "--name", name,
+        "-e", "PYTHONUNBUFFERED=1",  # stream manim's output instead of flushing it at exit
+        *lockdown_flags(),  # no network, no capabilities, no privilege escalation
         "-v", f"{os.path.abspath(job_dir)}:/manim",  # mount volume
-        "manimcommunity/manim",
-        "manim","-ql", "main.py",
+        *(lease.docker_flags() if lease else []),  # CPU, memory and process quota
+        SANDBOX_IMAGE,
+        "manim", *render_args(quality, scene),
     ]
 
     try:
-        result = subprocess.run(docker_command, capture_output=True, text=True, timeout=300)
-        stdout, stderr = result.stdout, result.stderr
+        process = subprocess.Popen(docker_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0)
+        with lease.track(name) if lease else nullcontext():
+            returncode = stream_container(process, name, monitor, SANDBOX_TIMEOUT)
+
+        if returncode is None:
+            return {
+                "status": "error",
+                "error": monitor.failure(timed_out=True),
+                "job_id": job_id
+            }
+
+        if returncode == OOM_EXIT_CODE and lease:
+            return {
+                "status": "error",
+                "error": f"Render ran out of memory ({lease.memory} byte limit)\n{monitor.failure()}",
+                "job_id": job_id,
+                "oom": True
+            }
 
         # Check if Docker ran successfully
-        if result.returncode != 0:
+        if returncode != 0:
             return {
                 "status": "error",
-                "error": stderr or stdout or "Unknown error",
+                "error": monitor.failure(),
                 "job_id": job_id
             }
-        
 
-        OUTPUT_DIR = os.path.join(job_dir,"media","videos","main", "480p15")
         print("Docker Run successfully")
-        # Look for MP4 output
-        for root, dirs, files in os.walk(OUTPUT_DIR):
-            for file in files:
-                if file.endswith(".mp4"):
-                    video_path = os.path.join(root, file)
-                    return {
-                        "status": "success",
-                        "video_path": video_path,
-                        "job_id": job_id
-                    }
-                
-        return {
-            "status": "error",
-            "error": stderr or stdout or "No video file generated.",
-            "job_id": job_id
-        }
+        video_path = find_video(job_dir, quality, scene)
+        if video_path:
+            return {
+                "status": "success",
+                "video_path": video_path,
+                "job_id": job_id
+            }
 
-    except subprocess.TimeoutExpired:
         return {
             "status": "error",
-            "error": "Execution timed out",
+            "error": monitor.text() or "No video file generated.",
             "job_id": job_id
         }
+
     except Exception as e:
         return {
             "status": "error",
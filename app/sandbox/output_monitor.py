@@ -0,0 +1,164 @@
+import os
+import re
+import ast
+import time
+import codecs
+import threading
+from collections import deque
+
+# Sandbox output kept per render (the tail, which is where errors are)
+SANDBOX_OUTPUT_LINES = int(os.getenv("SANDBOX_OUTPUT_LINES", "200"))
+SANDBOX_OUTPUT_LINE_CHARS = int(os.getenv("SANDBOX_OUTPUT_LINE_CHARS", "2000"))
+# Seconds a render may keep running after printing a traceback, so the rest
+# of the traceback is captured, before the sandbox is killed
+SANDBOX_ABORT_GRACE = float(os.getenv("SANDBOX_ABORT_GRACE", "2"))
+# Minimum seconds between two progress updates published for one render
+SANDBOX_PROGRESS_INTERVAL = float(os.getenv("SANDBOX_PROGRESS_INTERVAL", "1"))
+
+# manim's tqdm bars: "Animation 3: Create(Circle):  45%|####5     | 27/60 [...]"
+PROGRESS_LINE = re.compile(r"Animation (\d+)\s*:.*?(\d{1,3})%\|")
+# Animations replayed from partial movie files print no bar
+CACHED_LINE = re.compile(r"Animation (\d+)\s*:\s*Using cached data")
+# Plain and rich-formatted Python tracebacks
+TRACEBACK_LINE = re.compile(r"Traceback \(most recent call last\)")
+LINE_BREAK = re.compile(r"[\r\n]")
+
+
+def estimate_animations(code: str, scene: str = None):
+    """Number of self.play / self.wait call sites in the scene (or the whole
+    script). Loops make the real count higher; this only scales progress."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return 0
+    roots = [tree]
+    if scene:
+        roots = [n for n in tree.body if isinstance(n, ast.ClassDef) and n.name == scene] or roots
+    count = 0
+    for root in roots:
+        for node in ast.walk(root):
+            if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr in ("play", "wait")
+                    and isinstance(node.func.value, ast.Name) and node.func.value.id == "self"):
+                count += 1
+    return count
+
+
+class OutputMonitor:
+    """Consumes a render's output as it is produced.
+
+    Keeps the last lines in a ring buffer, turns manim's progress bars into a
+    0-1 progress value passed to on_progress(progress, animation), and notes
+    when a traceback appears so the caller can abort the render early. Setting
+    the cancel event aborts the render too. Used by both the cold
+    `docker run` path and the warm pool.
+    """
+
+    def __init__(self, on_progress=None, expected_animations: int = 0, max_lines: int = SANDBOX_OUTPUT_LINES,
+                 cancel: threading.Event = None):
+        self.on_progress = on_progress
+        self.cancel = cancel
+        self.expected_animations = expected_animations
+        self.lines = deque(maxlen=max_lines)
+        self.started = time.monotonic()
+        self.first_output_at = None
+        self.fatal_at = None
+        self.progress = 0.0
+        self.animation = None
+        self._partial = ""
+        self._bar_in_buffer = None  # animation whose bar is the last buffered line
+        self._last_emit = 0.0
+        self._lock = threading.Lock()
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def feed_bytes(self, data: bytes):
+        self.feed(self._decoder.decode(data))
+
+    def feed(self, text: str):
+        # Progress bars redraw with \r, so both \r and \n end a line
+        parts = LINE_BREAK.split(self._partial + text)
+        self._partial = parts.pop()
+        for part in parts:
+            self.feed_line(part)
+
+    def close(self):
+        if self._partial:
+            self.feed_line(self._partial)
+            self._partial = ""
+
+    def feed_line(self, line: str):
+        line = line.rstrip()[:SANDBOX_OUTPUT_LINE_CHARS]
+        if not line.strip():
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self.first_output_at is None:
+                self.first_output_at = now
+            if self.fatal_at is None and TRACEBACK_LINE.search(line):
+                self.fatal_at = now
+
+            match = PROGRESS_LINE.search(line)
+            cached = CACHED_LINE.search(line)
+            animation = int((match or cached).group(1)) if (match or cached) else None
+            # A bar redraw replaces the previous frame of the same bar
+            if animation is not None and match and self._bar_in_buffer == animation and self.lines:
+                self.lines[-1] = line
+            else:
+                self.lines.append(line)
+            self._bar_in_buffer = animation if match else None
+
+        if animation is not None:
+            fraction = 1.0 if cached else min(int(match.group(2)), 100) / 100
+            self._update_progress(animation, fraction, now)
+
+    def _update_progress(self, animation: int, fraction: float, now: float):
+        total = max(self.expected_animations, animation + 1)
+        # Never report 100% before the render has actually finished
+        progress = round(min(0.99, (animation + fraction) / total), 3)
+        changed_animation = animation != self.animation
+        self.animation = animation
+        if progress <= self.progress:
+            return
+        self.progress = progress
+        if self.on_progress and (changed_animation or now - self._last_emit >= SANDBOX_PROGRESS_INTERVAL):
+            self._last_emit = now
+            try:
+                self.on_progress(progress, animation)
+            except Exception as e:
+                print(f"Render progress callback failed: {e}")
+
+    def deadline(self, deadline: float):
+        """The monotonic time the render must be done by: the timeout, or the
+        abort grace after a traceback, whichever is sooner; now if cancelled."""
+        if self.cancelled:
+            return time.monotonic()
+        if self.fatal_at is None:
+            return deadline
+        return min(deadline, self.fatal_at + SANDBOX_ABORT_GRACE)
+
+    @property
+    def aborted(self):
+        return self.fatal_at is not None
+
+    @property
+    def cancelled(self):
+        return self.cancel is not None and self.cancel.is_set()
+
+    def startup_seconds(self):
+        """Seconds until the sandbox printed anything (container and manim start-up)."""
+        if self.first_output_at is None:
+            return None
+        return self.first_output_at - self.started
+
+    def text(self):
+        with self._lock:
+            return "\n".join(self.lines)
+
+    def failure(self, timed_out: bool = False):
+        """Error message for a failed render, with the captured output."""
+        output = self.text()
+        if self.cancelled:
+            return "Render cancelled"
+        if timed_out and not self.aborted:
+            return f"Execution timed out\n{output}".rstrip()
+        return output or "Unknown error"
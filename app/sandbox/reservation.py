@@ -0,0 +1,116 @@
+import os
+import time
+import threading
+
+from app.sandbox.docker_runner import SANDBOX_POOL_SIZE, SANDBOX_TIMEOUT
+from app.sandbox.scheduler import resource_scheduler, SANDBOX_SCHEDULER
+
+# Take a job's render slot (its scheduler quota and, with the pool, a warm
+# container) as soon as the LLM accepts the prompt, while the code is still
+# being generated
+SANDBOX_RESERVE = os.getenv("SANDBOX_RESERVE", "1") == "1"
+
+_counters = {"reserved": 0, "used": 0, "cancelled": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def reservation_stats():
+    with _counters_lock:
+        return dict(_counters)
+
+
+class SandboxReservation:
+    """A render slot acquired in the background ahead of the render.
+
+    start() begins acquiring; the render take()s what was acquired, and
+    cancel() gives it back if the job never gets that far (sanitizer or
+    symbol check failure, render cache hit). Both are safe to call in any
+    order and more than once.
+    """
+
+    def __init__(self, quality: str, scheduler=None):
+        self.quality = quality
+        self._scheduler = scheduler or (resource_scheduler if SANDBOX_SCHEDULER else None)
+        self._lease = None
+        self._container = None
+        self._started = False
+        self.started_at = None  # time.monotonic() of start()
+        self._done = threading.Event()
+        self._closed = False  # taken or cancelled
+        self._lock = threading.Lock()
+
+    def on_status(self, status: str):
+        # For get_manim_code(on_status=...)
+        if status == "accepted":
+            self.start()
+
+    def start(self):
+        if not SANDBOX_RESERVE or (self._scheduler is None and SANDBOX_POOL_SIZE <= 0):
+            return
+        with self._lock:
+            if self._started or self._closed:
+                return
+            self._started = True
+            self.started_at = time.monotonic()
+        _count("reserved")
+        threading.Thread(target=self._reserve, name="sandbox-reserve", daemon=True).start()
+
+    def _reserve(self):
+        lease = container = None
+        try:
+            if self._scheduler is not None:
+                lease = self._scheduler.acquire(self.quality, SANDBOX_TIMEOUT)
+            if SANDBOX_POOL_SIZE > 0 and (lease is not None or self._scheduler is None):
+                from app.sandbox.container_pool import sandbox_pool
+                container = sandbox_pool.reserve(SANDBOX_TIMEOUT)
+        except Exception as e:
+            print(f"Sandbox reservation failed, the render will wait for its own slot: {e}")
+        with self._lock:
+            self._lease, self._container = lease, container
+            self._done.set()
+            closed = self._closed
+        if closed:
+            # Cancelled, or the render gave up waiting, while we were acquiring
+            self._release(lease, container)
+
+    def take(self, timeout: float = SANDBOX_TIMEOUT):
+        """(lease, container) for the render, either of which may be None."""
+        with self._lock:
+            if not self._started or self._closed:
+                self._closed = True
+                return None, None
+        self._done.wait(timeout)
+        with self._lock:
+            self._closed = True
+            if not self._done.is_set():
+                return None, None
+            lease, container = self._lease, self._container
+            self._lease = self._container = None
+        _count("used")
+        return lease, container
+
+    def cancel(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if not self._started:
+                return
+            _count("cancelled")
+            if not self._done.is_set():
+                return
+            lease, container = self._lease, self._container
+            self._lease = self._container = None
+        self._release(lease, container)
+
+    def _release(self, lease, container):
+        if container is not None:
+            from app.sandbox.container_pool import sandbox_pool
+            sandbox_pool.unreserve(container)
+        if lease is not None:
+            self._scheduler.release(lease)
@@ -0,0 +1,300 @@
+import os
+import ast
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+import subprocess
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.ast_sanitizer import ALLOWED_BASE_CLASSES
+from app.utils.render_cache import strip_docstrings
+from app.utils.metrics import stage_timer
+from app.sandbox.docker_runner import (
+    BASE_DIR, SANDBOX_IMAGE, SANDBOX_TIMEOUT, render_args, lockdown_flags, render_with_resources,
+)
+from app.sandbox.workspace import workspaces, WorkspaceFull
+from app.sandbox.scheduler import Lease, SANDBOX_QUOTAS, SANDBOX_PIDS_LIMIT
+
+# Scripts with several scenes render them in parallel, at most this many at a time
+SCENE_PARALLELISM = int(os.getenv("SCENE_PARALLELISM", "4"))
+# Rendered scene clips are kept on local disk so an edited script only
+# re-renders the scenes that changed
+SCENE_CACHE_DIR = os.getenv("SCENE_CACHE_DIR", os.path.join(BASE_DIR, "scene_cache"))
+SCENE_CACHE_MAX_BYTES = int(os.getenv("SCENE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# The ffmpeg concat only copies streams; it runs under the quota of a low-quality render
+CONCAT_QUALITY = "low"
+
+SCENE_BASE_CLASSES = {name for name in ALLOWED_BASE_CLASSES if name.endswith("Scene")}
+
+
+def _base_names(node):
+    return [base.id for base in node.bases if isinstance(base, ast.Name)]
+
+
+def _defines_construct(node):
+    return any(isinstance(item, ast.FunctionDef) and item.name == "construct" for item in node.body)
+
+
+def _scene_classes(tree):
+    # Scene subclasses in definition order, including subclasses of scenes
+    # defined earlier in the same script
+    scenes = {}
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and any(b in SCENE_BASE_CLASSES or b in scenes for b in _base_names(node)):
+            scenes[node.name] = node
+    return scenes
+
+
+def _ancestors(name, scenes):
+    chain = []
+    pending = [name]
+    while pending:
+        node = scenes[pending.pop()]
+        chain.append(node)
+        pending.extend(b for b in _base_names(node) if b in scenes and scenes[b] not in chain)
+    return chain
+
+
+def find_scenes(code: str):
+    """Names of the renderable Scene classes in code, in definition order."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    scenes = _scene_classes(tree)
+    return [name for name in scenes if any(_defines_construct(n) for n in _ancestors(name, scenes))]
+
+
+def scene_cache_keys(code: str, scene_names, render_flags):
+    """scene name -> cache key covering the scene, its in-script base scenes and
+    every other top-level statement (imports, helpers, constants)."""
+    tree = strip_docstrings(ast.parse(code))
+    scenes = _scene_classes(tree)
+    shared = ast.dump(ast.Module(body=[n for n in tree.body if not (isinstance(n, ast.ClassDef) and n.name in scenes)],
+                                 type_ignores=[]), annotate_fields=False)
+    flags = " ".join(render_flags).encode("utf-8")
+    keys = {}
+    for name in scene_names:
+        digest = hashlib.sha256()
+        digest.update(shared.encode("utf-8"))
+        for node in _ancestors(name, scenes):
+            digest.update(b"\0")
+            digest.update(ast.dump(node, annotate_fields=False).encode("utf-8"))
+        digest.update(b"\0" + flags + b"\0" + name.encode("utf-8"))
+        keys[name] = digest.hexdigest()
+    return keys
+
+
+class SceneClipCache:
+    """Clips on local disk, named by cache key, evicted least recently used first.
+    Clips pinned by a script that is still being put together are never evicted."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pinned = Counter()  # path -> scripts using it
+        self._hits = 0
+        self._misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.mp4")
+
+    def get(self, key):
+        path = self._path(key)
+        with self._lock:
+            if os.path.exists(path):
+                os.utime(path)
+                self._hits += 1
+                return path
+            self._misses += 1
+        return None
+
+    @contextmanager
+    def pinned(self, keys):
+        paths = [self._path(key) for key in keys]
+        with self._lock:
+            self._pinned.update(paths)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pinned.subtract(paths)
+                self._pinned += Counter()  # drop the zero counts
+
+    def put(self, key, clip_path):
+        os.makedirs(self.directory, exist_ok=True)
+        # Copy then rename, so a reader never sees a partial clip
+        tmp_path = f"{self._path(key)}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(clip_path, tmp_path)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+        return self._path(key)
+
+    def _evict(self):
+        with self._lock:
+            try:
+                entries = [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith(".mp4")]
+                entries = [(os.stat(p).st_mtime, os.stat(p).st_size, p) for p in entries]
+            except FileNotFoundError:
+                return
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if self._pinned[path]:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+scene_cache = SceneClipCache(SCENE_CACHE_DIR, SCENE_CACHE_MAX_BYTES)
+
+
+def concat_clips(clip_paths, output_dir: str, lease=None):
+    """Join clips with ffmpeg's concat demuxer without re-encoding.
+
+    Every clip comes from the same manim version and quality flag, so the
+    streams match and `-c copy` is safe. Runs in the sandbox image, which
+    ships ffmpeg; the host doesn't need it. The container is locked down
+    like a render's and held to the lease's quota (or the low-quality
+    quota when the scheduler is off).
+    """
+    names = []
+    for i, clip in enumerate(clip_paths):
+        name = f"clip_{i:03d}.mp4"
+        shutil.copyfile(clip, os.path.join(output_dir, name))
+        names.append(name)
+    with open(os.path.join(output_dir, "clips.txt"), "w", encoding="utf-8") as f:
+        f.writelines(f"file '{name}'\n" for name in names)
+
+    if lease is None:
+        cpus, memory = SANDBOX_QUOTAS.get(CONCAT_QUALITY) or min(SANDBOX_QUOTAS.values())
+        lease = Lease(CONCAT_QUALITY, cpus, memory, SANDBOX_PIDS_LIMIT, ceiling=True)
+    name = f"manim-concat-{os.path.basename(output_dir)}"
+    command = [
+        "docker", "run", "--rm", "--name", name,
+        *lockdown_flags(),
+        *lease.docker_flags(),
+        "-v", f"{os.path.abspath(output_dir)}:/manim", "-w", "/manim",
+        SANDBOX_IMAGE,
+        "ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+        "-i", "clips.txt", "-c", "copy", "output.mp4",
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=SANDBOX_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        # Killing the docker CLI would leave the container running
+        subprocess.run(["docker", "kill", name], capture_output=True)
+        raise
+    output_path = os.path.join(output_dir, "output.mp4")
+    if result.returncode != 0 or not os.path.exists(output_path):
+        raise RuntimeError(result.stderr or result.stdout or "ffmpeg produced no output")
+    return output_path
+
+
+class SceneProgress:
+    """Combines per-scene render progress into one value for the whole script;
+    cached scenes count as done."""
+
+    def __init__(self, scenes, missing, on_progress):
+        self.on_progress = on_progress
+        self.fractions = {name: 0.0 if name in missing else 1.0 for name in scenes}
+        self._lock = threading.Lock()
+
+    def callback(self, name):
+        def update(progress, animation):
+            with self._lock:
+                self.fractions[name] = progress
+                total = round(sum(self.fractions.values()) / len(self.fractions), 3)
+            self.on_progress(total, None)
+        return update if self.on_progress else None
+
+
+def render_scenes(code: str, scenes, render_one, timings: dict = None, quality: str = "low", on_progress=None):
+    """Render each scene with render_one(code, timings, quality, scene, on_progress)
+    in parallel and join the clips in script order. Returns the
+    run_code_in_docker result dict."""
+    keys = scene_cache_keys(code, scenes, render_args(quality))
+    # Pinned before the lookup, so no other script's put() evicts a clip
+    # between here and the concat
+    with scene_cache.pinned(keys.values()):
+        return _render_scenes(code, scenes, keys, render_one, timings, quality, on_progress)
+
+
+def _render_scenes(code: str, scenes, keys, render_one, timings: dict, quality: str, on_progress):
+    clips = {name: scene_cache.get(keys[name]) for name in scenes}
+    missing = [name for name in scenes if not clips[name]]
+    print(f"Rendering {len(missing)} of {len(scenes)} scenes ({len(scenes) - len(missing)} cached)")
+
+    progress = SceneProgress(scenes, missing, on_progress)
+    started = time.perf_counter()
+    results = {}
+    # One dict per scene: the renders run in parallel
+    scene_timings = {name: {} for name in missing}
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, min(SCENE_PARALLELISM, len(missing)))) as pool:
+            futures = {name: pool.submit(render_one, code, scene_timings[name], quality, name,
+                                         progress.callback(name))
+                       for name in missing}
+            results = {name: future.result() for name, future in futures.items()}
+    if timings is not None:
+        # Waits and start-ups add up over the scenes; render is the wall time
+        # of the parallel renders (each clip is also observed on its own)
+        for stage_timings in scene_timings.values():
+            for stage, value in stage_timings.items():
+                if stage != "render":
+                    timings[stage] = round(timings.get(stage, 0.0) + value, 4)
+        timings["render"] = round(timings.get("render", 0.0) + time.perf_counter() - started, 4)
+        timings["scenes"] = len(scenes)
+        timings["scenes_cached"] = len(scenes) - len(missing)
+
+    # Each clip is copied into the cache; the scene workspaces aren't needed after that
+    failed = None
+    try:
+        for name in missing:
+            result = results[name]
+            if result["status"] != "success":
+                failed = f"Scene {name}: {result.get('error')}"
+                break
+            clips[name] = scene_cache.put(keys[name], result["video_path"])
+    finally:
+        for result in results.values():
+            workspaces.release(result.get("workspace"))
+    if failed:
+        return {"status": "error", "error": failed, "job_id": None}
+
+    try:
+        output_dir = workspaces.create("concat")
+    except (WorkspaceFull, OSError) as e:
+        return {"status": "error", "error": str(e), "job_id": None}
+    job_id = os.path.basename(output_dir)
+
+    def concat(lease):
+        try:
+            with stage_timer("concat", timings):
+                video_path = concat_clips([clips[name] for name in scenes], output_dir, lease)
+        except (RuntimeError, OSError, subprocess.TimeoutExpired) as e:
+            return {"status": "error", "error": f"Concatenating scenes failed: {e}", "job_id": job_id}
+        return {"status": "success", "video_path": video_path, "job_id": job_id, "workspace": output_dir}
+
+    result = render_with_resources(concat, CONCAT_QUALITY, timings)
+    if result["status"] != "success":
+        workspaces.release(output_dir)
+    return result
@@ -0,0 +1,250 @@
+import os
+import re
+import time
+import threading
+import subprocess
+from collections import deque
+from contextlib import contextmanager
+
+SIZE_UNITS = {
+    "": 1, "b": 1,
+    "k": 1000, "kb": 1000, "m": 1000 ** 2, "mb": 1000 ** 2, "g": 1000 ** 3, "gb": 1000 ** 3,
+    "kib": 1024, "mib": 1024 ** 2, "gib": 1024 ** 3, "tib": 1024 ** 4,
+}
+
+
+def parse_size(text: str):
+    """"512m", "2g", "1.5GiB", "1048576" -> bytes. Docker's k/m/g are binary."""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([a-zA-Z]*)\s*", str(text))
+    if not match:
+        raise ValueError(f"Not a size: {text!r}")
+    unit = match.group(2).lower()
+    if unit in ("k", "m", "g"):
+        unit += "ib"
+    return int(float(match.group(1)) * SIZE_UNITS[unit])
+
+
+def node_memory():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return 8 * 1024 ** 3
+
+
+def parse_quotas(text: str):
+    """"low=1:1g,medium=2:2g" -> {"low": (1.0, 1073741824), ...}"""
+    quotas = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        quality, _, limits = item.partition("=")
+        cpus, _, memory = limits.partition(":")
+        quotas[quality.strip()] = (float(cpus), parse_size(memory))
+    return quotas
+
+
+# Set to 0 to run renders without limits or admission control
+SANDBOX_SCHEDULER = os.getenv("SANDBOX_SCHEDULER", "1") == "1"
+# What this process may hand out; with several app processes on one node,
+# give each its share
+SANDBOX_NODE_CPUS = float(os.getenv("SANDBOX_NODE_CPUS") or os.cpu_count() or 1)
+SANDBOX_NODE_RESERVED_MEMORY = parse_size(os.getenv("SANDBOX_NODE_RESERVED_MEMORY", "1g"))
+SANDBOX_NODE_MEMORY = parse_size(os.getenv("SANDBOX_NODE_MEMORY") or
+                                 str(max(node_memory() - SANDBOX_NODE_RESERVED_MEMORY, 1024 ** 3)))
+# Per-quality quota ceiling, quality=cpus:memory
+SANDBOX_QUOTAS = parse_quotas(os.getenv("SANDBOX_QUOTAS", "low=1:1g,medium=2:2g,high=2:3g,production=4:4g"))
+SANDBOX_PIDS_LIMIT = int(os.getenv("SANDBOX_PIDS_LIMIT", "512"))
+# Quotas adapt to measured usage (EWMA of per-job CPU and peak memory, times
+# the headroom), between these floors and the ceilings above
+SANDBOX_MIN_CPUS = float(os.getenv("SANDBOX_MIN_CPUS", "0.5"))
+SANDBOX_MIN_MEMORY = parse_size(os.getenv("SANDBOX_MIN_MEMORY", "512m"))
+SANDBOX_QUOTA_HEADROOM = float(os.getenv("SANDBOX_QUOTA_HEADROOM", "1.5"))
+SANDBOX_USAGE_ALPHA = float(os.getenv("SANDBOX_USAGE_ALPHA", "0.2"))
+# Seconds between container stats samples; 0 disables sampling (and adaptation)
+SANDBOX_STATS_INTERVAL = float(os.getenv("SANDBOX_STATS_INTERVAL", "2"))
+
+
+def docker_stats(name: str):
+    """(cpu cores, memory bytes) a running container uses, or None."""
+    try:
+        result = subprocess.run(
+            ["docker", "stats", "--no-stream", "--format", "{{.CPUPerc}}|{{.MemUsage}}", name],
+            capture_output=True, text=True, timeout=10,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    try:
+        cpu, memory = result.stdout.strip().split("|")
+        return float(cpu.strip().rstrip("%")) / 100, parse_size(memory.split("/")[0])
+    except (ValueError, KeyError):
+        return None
+
+
+class Lease:
+    """Resources granted to one render."""
+
+    def __init__(self, quality: str, cpus: float, memory: int, pids_limit: int, ceiling: bool,
+                 stats_reader=None, interval: float = 0):
+        self.quality = quality
+        self.cpus = cpus
+        self.memory = memory
+        self.pids_limit = pids_limit
+        self.ceiling = ceiling  # granted the full quota, not an adapted one
+        self.stats_reader = stats_reader
+        self.interval = interval
+        self.peak_memory = 0
+        self.cpu_samples = []
+
+    def limit_flags(self):
+        # Swap equal to memory: a render that outgrows its quota is killed, not swapped
+        return ["--cpus", f"{self.cpus:g}", "--memory", str(self.memory), "--memory-swap", str(self.memory)]
+
+    def docker_flags(self):
+        return self.limit_flags() + ["--pids-limit", str(self.pids_limit)]
+
+    def observe(self, cpus: float, memory: int):
+        self.cpu_samples.append(cpus)
+        self.peak_memory = max(self.peak_memory, memory)
+
+    @contextmanager
+    def track(self, container_name: str):
+        """Sample the container's usage while the block runs."""
+        if not self.stats_reader or self.interval <= 0:
+            yield self
+            return
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(self.interval):
+                usage = self.stats_reader(container_name)
+                if usage:
+                    self.observe(*usage)
+
+        threading.Thread(target=sample, name=f"stats-{container_name}", daemon=True).start()
+        try:
+            yield self
+        finally:
+            done.set()
+
+
+class ResourceScheduler:
+    """Admits renders while their CPU and memory quotas fit on the node.
+
+    Waiters are served in arrival order, so a large render isn't starved by
+    a stream of small ones. Quotas start at the configured ceiling per
+    quality and follow the usage sampled from running containers; a render
+    killed for running out of memory raises its quality's estimate.
+    stats_reader(container_name) -> (cpus, bytes) is injectable so the
+    scheduler can be driven by a fake runner.
+    """
+
+    def __init__(self, cpus: float, memory: int, quotas: dict, pids_limit: int = SANDBOX_PIDS_LIMIT,
+                 stats_reader=docker_stats, interval: float = SANDBOX_STATS_INTERVAL,
+                 alpha: float = SANDBOX_USAGE_ALPHA, headroom: float = SANDBOX_QUOTA_HEADROOM,
+                 min_cpus: float = SANDBOX_MIN_CPUS, min_memory: int = SANDBOX_MIN_MEMORY):
+        self.cpus = cpus
+        self.memory = memory
+        self.quotas = quotas
+        self.pids_limit = pids_limit
+        self.stats_reader = stats_reader
+        self.interval = interval
+        self.alpha = alpha
+        self.headroom = headroom
+        self.min_cpus = min_cpus
+        self.min_memory = min_memory
+
+        self._cond = threading.Condition()
+        self._free_cpus = cpus
+        self._free_memory = memory
+        self._waiting = deque()
+        self._running = 0
+        self._usage = {}  # quality -> [cpu EWMA, peak memory EWMA]
+
+        self._admitted = 0
+        self._timeouts = 0
+        self._oom_kills = 0
+        self._wait_seconds = 0.0
+
+    def quota(self, quality: str, ceiling: bool = False):
+        """(cpus, memory bytes) a render of this quality is given, never more than the node has."""
+        max_cpus, max_memory = self.quotas.get(quality) or max(self.quotas.values())
+        cpus, memory = max_cpus, max_memory
+        with self._cond:
+            usage = self._usage.get(quality)
+        if usage and not ceiling:
+            cpus = min(max_cpus, max(self.min_cpus, usage[0] * self.headroom))
+            memory = min(max_memory, max(self.min_memory, int(usage[1] * self.headroom)))
+        return round(min(cpus, self.cpus), 2), min(memory, self.memory)
+
+    def acquire(self, quality: str, timeout: float = None, ceiling: bool = False):
+        """Block until the quota fits; returns a Lease, or None on timeout."""
+        cpus, memory = self.quota(quality, ceiling)
+        ticket = object()
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        with self._cond:
+            self._waiting.append(ticket)
+            try:
+                while not (self._waiting[0] is ticket
+                           and cpus <= self._free_cpus + 1e-9 and memory <= self._free_memory):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._timeouts += 1
+                        return None
+                    self._cond.wait(remaining)
+                self._free_cpus -= cpus
+                self._free_memory -= memory
+                self._running += 1
+                self._admitted += 1
+                self._wait_seconds += time.monotonic() - started
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+        full = ceiling or (cpus, memory) == self.quota(quality, True)
+        return Lease(quality, cpus, memory, self.pids_limit, full, self.stats_reader, self.interval)
+
+    def release(self, lease: Lease):
+        with self._cond:
+            self._free_cpus += lease.cpus
+            self._free_memory += lease.memory
+            self._running -= 1
+            if lease.cpu_samples:
+                cpus = sum(lease.cpu_samples) / len(lease.cpu_samples)
+                usage = self._usage.get(lease.quality)
+                if usage is None:
+                    self._usage[lease.quality] = [cpus, lease.peak_memory]
+                else:
+                    usage[0] += self.alpha * (cpus - usage[0])
+                    usage[1] += self.alpha * (lease.peak_memory - usage[1])
+            self._cond.notify_all()
+
+    def record_oom(self, lease: Lease):
+        # The render outgrew its quota; estimate at least that much from now on
+        with self._cond:
+            self._oom_kills += 1
+            usage = self._usage.get(lease.quality)
+            if usage:
+                usage[1] = max(usage[1], lease.memory)
+
+    def stats(self):
+        with self._cond:
+            stats = {
+                "cpus": self.cpus,
+                "memory": self.memory,
+                "free_cpus": round(self._free_cpus, 2),
+                "free_memory": self._free_memory,
+                "running": self._running,
+                "waiting": len(self._waiting),
+                "admitted": self._admitted,
+                "timeouts": self._timeouts,
+                "oom_kills": self._oom_kills,
+                "avg_wait": round(self._wait_seconds / self._admitted, 4) if self._admitted else 0.0,
+            }
+        for quality in self.quotas:
+            cpus, memory = self.quota(quality)
+            stats[f"{quality}_cpus"] = cpus
+            stats[f"{quality}_memory"] = memory
+        return stats
+
+
+resource_scheduler = ResourceScheduler(SANDBOX_NODE_CPUS, SANDBOX_NODE_MEMORY, SANDBOX_QUOTAS)
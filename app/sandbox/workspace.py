@@ -0,0 +1,281 @@
+import os
+import re
+import time
+import uuid
+import shutil
+import threading
+
+# Host directory holding render workspaces, bind-mounted into the sandbox.
+# Point it at a tmpfs (e.g. /dev/shm/manim) to keep renders off the disk;
+# use a dedicated directory, the janitor owns everything it recognises in it.
+SANDBOX_WORKSPACE_ROOT = (os.getenv("SANDBOX_WORKSPACE_ROOT")
+                          or os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp"))
+# New workspaces are refused while the managed directories hold more than this
+SANDBOX_WORKSPACE_MAX_BYTES = int(os.getenv("SANDBOX_WORKSPACE_MAX_BYTES", str(10 * 1024 ** 3)))
+# A job workspace still around after this many seconds has leaked and is removed
+SANDBOX_WORKSPACE_MAX_AGE = int(os.getenv("SANDBOX_WORKSPACE_MAX_AGE", "3600"))
+# Seconds between janitor sweeps; 0 disables the janitor thread
+SANDBOX_JANITOR_INTERVAL = int(os.getenv("SANDBOX_JANITOR_INTERVAL", "60"))
+# create() re-measures usage once the last measurement is this many seconds old
+SANDBOX_WORKSPACE_MEASURE_INTERVAL = float(os.getenv("SANDBOX_WORKSPACE_MEASURE_INTERVAL", "2"))
+
+# <pid>-<kind>-<hex>: the owning process is part of the name, so any process
+# can tell which leftovers belong to one that is gone
+WORKSPACE_NAME = re.compile(r"^(\d+)-(job|pool|concat)-[0-9a-f]{32}$")
+# Directories written before workspaces were managed
+LEGACY_NAME = re.compile(r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}(-concat)?"
+                         r"|manim-pool-\d+-[0-9a-f]{8})$")
+
+
+class WorkspaceFull(Exception):
+    pass
+
+
+def pid_alive(pid: int):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def tree_size(path: str):
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return total
+
+
+def filesystem_type(path: str):
+    # Longest mount point containing path, from /proc/mounts (Linux only)
+    path = os.path.realpath(path)
+    best, fstype = "", None
+    try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount = fields[1].replace("\\040", " ")
+                if (path == mount or path.startswith(mount.rstrip("/") + "/")) and len(mount) > len(best):
+                    best, fstype = mount, fields[2]
+    except OSError:
+        pass
+    return fstype
+
+
+class WorkspaceManager:
+    """Per-render directories under one root, removed as soon as their output
+    is uploaded or the render fails.
+
+    A janitor thread catches what deterministic cleanup misses: workspaces
+    left by dead processes (reclaimed at start-up too) and job workspaces of
+    this process older than max_age. Directories of other live processes are
+    left to their own janitor. Files the scene cache keeps are not workspaces.
+    """
+
+    def __init__(self, root: str, max_bytes: int, max_age: int,
+                 measure_interval: float = SANDBOX_WORKSPACE_MEASURE_INTERVAL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.measure_interval = measure_interval
+        self._lock = threading.Lock()
+        self._measure_lock = threading.Lock()
+        self._active = {}  # path -> kind
+        self._usage = 0
+        self._measured_at = None  # monotonic time of the last measurement
+        self._janitor = None
+
+        self._created = 0
+        self._released = 0
+        self._reclaimed = 0
+        self._refused = 0
+        self._remove_failures = 0
+
+    def _new_path(self, kind: str):
+        return os.path.join(self.root, f"{os.getpid()}-{kind}-{uuid.uuid4().hex}")
+
+    def _managed(self):
+        try:
+            return [e for e in os.scandir(self.root) if e.is_dir(follow_symlinks=False)
+                    and (WORKSPACE_NAME.match(e.name) or LEGACY_NAME.match(e.name))]
+        except FileNotFoundError:
+            return []
+
+    def usage(self):
+        """Bytes the workspaces hold, measured at most measure_interval ago."""
+        with self._measure_lock:
+            if self._measured_at is None or time.monotonic() - self._measured_at >= self.measure_interval:
+                usage = sum(tree_size(entry.path) for entry in self._managed())
+                with self._lock:
+                    self._usage = usage
+                    self._measured_at = time.monotonic()
+        return self._usage
+
+    def create(self, kind: str = "job"):
+        """Make a fresh workspace directory and return its path."""
+        if self.usage() > self.max_bytes:
+            # The last measurement is over quota; measure again before refusing
+            self.sweep()
+            if self._usage > self.max_bytes:
+                with self._lock:
+                    self._refused += 1
+                raise WorkspaceFull(f"Sandbox workspaces use {self._usage} bytes, over the {self.max_bytes} byte quota")
+        path = self._new_path(kind)
+        # Tracked before it exists, so a concurrent sweep never takes it for an orphan
+        with self._lock:
+            self._active[path] = kind
+            self._created += 1
+        try:
+            os.makedirs(path)
+        except OSError:
+            with self._lock:
+                self._active.pop(path, None)
+            raise
+        return path
+
+    def adopt(self, path: str, kind: str = "job"):
+        """Move a directory under the root (e.g. a job inside a pooled
+        container's workspace) into a workspace of its own; returns the new path."""
+        target = self._new_path(kind)
+        with self._lock:
+            self._active[target] = kind
+            self._created += 1
+        try:
+            os.rename(path, target)
+        except OSError:
+            with self._lock:
+                self._active.pop(target, None)
+            raise
+        return target
+
+    def release(self, path: str):
+        """Delete a workspace, or a directory inside one. Safe to call twice."""
+        if not path:
+            return
+        with self._lock:
+            self._active.pop(path, None)
+        if self._remove(path):
+            with self._lock:
+                self._released += 1
+
+    def _remove(self, path: str):
+        if not os.path.exists(path):
+            return False
+        try:
+            shutil.rmtree(path)
+            return True
+        except FileNotFoundError:
+            # Removed concurrently (release racing the janitor)
+            return False
+        except OSError as e:
+            # Usually files the container wrote as another user
+            print(f"Could not remove sandbox workspace {path}: {e}")
+            with self._lock:
+                self._remove_failures += 1
+            return False
+
+    def _stale(self, name: str, path: str, now: float):
+        match = WORKSPACE_NAME.match(name)
+        if not match:
+            if not LEGACY_NAME.match(name):
+                return False
+            try:
+                return now - os.stat(path).st_mtime > self.max_age
+            except OSError:
+                return False
+        pid, kind = int(match.group(1)), match.group(2)
+        if pid != os.getpid():
+            return not pid_alive(pid)
+        with self._lock:
+            active = path in self._active
+        if not active:
+            # Ours but untracked: left by an earlier process that had our pid
+            return True
+        if kind == "pool":
+            # Lives as long as its container
+            return False
+        try:
+            return now - os.stat(path).st_mtime > self.max_age
+        except OSError:
+            return False
+
+    def sweep(self):
+        """Remove stale workspaces and re-measure usage. Returns the number removed."""
+        removed = 0
+        usage = 0
+        now = time.time()
+        for entry in self._managed():
+            if self._stale(entry.name, entry.path, now):
+                with self._lock:
+                    self._active.pop(entry.path, None)
+                if self._remove(entry.path):
+                    removed += 1
+                    continue
+            usage += tree_size(entry.path)
+        with self._lock:
+            self._usage = usage
+            self._measured_at = time.monotonic()
+            self._reclaimed += removed
+        if removed:
+            print(f"Sandbox janitor: removed {removed} stale workspace(s)")
+        return removed
+
+    def start(self, interval: int = SANDBOX_JANITOR_INTERVAL):
+        """Reclaim leftovers from earlier runs and start the janitor (once)."""
+        os.makedirs(self.root, exist_ok=True)
+        self.sweep()
+        with self._lock:
+            if self._janitor or interval <= 0:
+                return
+            self._janitor = threading.Thread(target=self._run_janitor, args=(interval,),
+                                             name="workspace-janitor", daemon=True)
+        self._janitor.start()
+
+    def _run_janitor(self, interval: int):
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Sandbox janitor failed: {e}")
+
+    def stats(self):
+        try:
+            disk = shutil.disk_usage(self.root)
+            disk_free, disk_total = disk.free, disk.total
+        except OSError:
+            disk_free = disk_total = 0
+        with self._lock:
+            return {
+                "root": self.root,
+                "filesystem": filesystem_type(self.root),
+                "bytes": self._usage,
+                "max_bytes": self.max_bytes,
+                "active": len(self._active),
+                "created": self._created,
+                "released": self._released,
+                "reclaimed": self._reclaimed,
+                "refused": self._refused,
+                "remove_failures": self._remove_failures,
+                "disk_free_bytes": disk_free,
+                "disk_total_bytes": disk_total,
+            }
+
+
+workspaces = WorkspaceManager(SANDBOX_WORKSPACE_ROOT, SANDBOX_WORKSPACE_MAX_BYTES, SANDBOX_WORKSPACE_MAX_AGE)
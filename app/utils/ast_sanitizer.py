@@ -1,12 +1,16 @@
+import os
 import ast
+import hashlib
+import threading
+from collections import OrderedDict
 
 PROHIBITED_IMPORTS = {"os", "sys", "subprocess", "socket", "urllib"}
 PROHIBITED_FUNCTIONS = {"open", "eval", "exec", "compile", "globals", "locals", "input"}
 ALLOWED_BASE_CLASSES = {
-    "Scene", 
-    "ThreeDScene", 
-    "MovingCameraScene", 
-    "ZoomedScene", 
+    "Scene",
+    "ThreeDScene",
+    "MovingCameraScene",
+    "ZoomedScene",
     "LinearTransformationScene",
     "Axes",
     "NumberPlane",
@@ -14,38 +18,125 @@ ALLOWED_BASE_CLASSES = {
     "ReconfigurableScene"
 }  # Only allow Manim Scene subclassing
 
-def sanitize_ast(code: str):
+SANITIZER_CACHE_SIZE = int(os.getenv("SANITIZER_CACHE_SIZE", "512"))
+
+
+# Rules: each takes a node and yields violation messages for it
+
+def check_import(node):
+    for alias in node.names:
+        if alias.name.split('.')[0] in PROHIBITED_IMPORTS:
+            yield f"Use of prohibited import: {alias.name}"
+
+
+def check_import_from(node):
+    if node.module and node.module.split('.')[0] in PROHIBITED_IMPORTS:
+        yield f"Use of prohibited import: {node.module}"
+
+
+def check_call(node):
+    if isinstance(node.func, ast.Name) and node.func.id in PROHIBITED_FUNCTIONS:
+        yield f"Use of prohibited function: {node.func.id}"
+    if isinstance(node.func, ast.Attribute) and node.func.attr in PROHIBITED_FUNCTIONS:
+        yield f"Use of prohibited attribute: {node.func.attr}"
+
+
+def check_name(node):
+    # Catches prohibited builtins that are referenced without being called
+    if node.id in PROHIBITED_FUNCTIONS:
+        yield f"Use of prohibited identifier: {node.id}"
+
+
+def check_class_bases(node):
+    for base in node.bases:
+        if isinstance(base, ast.Name) and base.id not in ALLOWED_BASE_CLASSES:
+            yield f"Unauthorized base class: {base.id}"
+
+
+# Node type -> rules run on it. Adding a rule only costs time on the node
+# types it is registered for.
+RULES = {
+    ast.Import: [check_import],
+    ast.ImportFrom: [check_import_from],
+    ast.Call: [check_call],
+    ast.Name: [check_name],
+    ast.ClassDef: [check_class_bases],
+}
+
+
+class _StopVisit(Exception):
+    pass
+
+
+class SanitizerVisitor(ast.NodeVisitor):
+    """Single pass over the tree that runs the RULES registered for each node type."""
+
+    def __init__(self, collect_all: bool = False):
+        self.collect_all = collect_all
+        self.violations = []
+
+    def visit(self, node):
+        for rule in RULES.get(type(node), ()):
+            for message in rule(node):
+                self.violations.append({
+                    "line": getattr(node, "lineno", None),
+                    "col": getattr(node, "col_offset", None),
+                    "message": message
+                })
+                if not self.collect_all:
+                    raise _StopVisit()
+        self.generic_visit(node)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+TOO_DEEP = {"line": None, "col": None, "message": "Code is nested too deeply to analyze"}
+
+
+def _run_rules(code: str, collect_all: bool):
     try:
         tree = ast.parse(code)
     except SyntaxError as e:
-        return False, f"Syntax error in code: {str(e)}"
-
-    for node in ast.walk(tree):
-        # Check for prohibited imports
-        if isinstance(node, ast.Import):
-            for alias in node.names:
-                if alias.name.split('.')[0] in PROHIBITED_IMPORTS:
-                    return False, f"Use of prohibited import: {alias.name}"
-
-        if isinstance(node, ast.ImportFrom):
-            if node.module and node.module.split('.')[0] in PROHIBITED_IMPORTS:
-                return False, f"Use of prohibited import: {node.module}"
-
-        # Check for prohibited function calls
-        if isinstance(node, ast.Call):
-            if isinstance(node.func, ast.Name) and node.func.id in PROHIBITED_FUNCTIONS:
-                return False, f"Use of prohibited function: {node.func.id}"
-            if isinstance(node.func, ast.Attribute) and node.func.attr in PROHIBITED_FUNCTIONS:
-                return False, f"Use of prohibited attribute: {node.func.attr}"
-
-        # Check for prohibited attributes usage (globals, locals, etc.)
-        if isinstance(node, ast.Name) and node.id in PROHIBITED_FUNCTIONS:
-            return False, f"Use of prohibited identifier: {node.id}"
-
-        # Check class inheritance
-        if isinstance(node, ast.ClassDef):
-            for base in node.bases:
-                if isinstance(base, ast.Name) and base.id not in ALLOWED_BASE_CLASSES:
-                    return False, f"Unauthorized base class: {base.id}"
+        return ({"line": e.lineno, "col": e.offset, "message": f"Syntax error in code: {str(e)}"},)
+    except RecursionError:
+        # Deeper still, the parser itself runs out of stack
+        return (dict(TOO_DEEP),)
 
+    visitor = SanitizerVisitor(collect_all)
+    try:
+        visitor.visit(tree)
+    except _StopVisit:
+        pass
+    except RecursionError:
+        visitor.violations.append(dict(TOO_DEEP))
+    return tuple(visitor.violations)
+
+
+def analyze_code(code: str, collect_all: bool = False):
+    """Violations found in code, each a {"line", "col", "message"} dict.
+
+    Stops at the first violation unless collect_all is set. Results are cached
+    by a hash of the code, so re-checking identical LLM output is free.
+    """
+    key = (hashlib.sha256(code.encode("utf-8")).hexdigest(), collect_all)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return [dict(v) for v in _cache[key]]
+
+    violations = _run_rules(code, collect_all)
+
+    with _cache_lock:
+        _cache[key] = violations
+        while len(_cache) > SANITIZER_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return [dict(v) for v in violations]
+
+
+def sanitize_ast(code: str):
+    violations = analyze_code(code)
+    if violations:
+        return False, violations[0]["message"]
     return True, "Code passed AST analysis"
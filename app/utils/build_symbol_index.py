@@ -0,0 +1,352 @@
+"""Build app/utils/manim_symbols.json, the manim API index used by symbol_check.
+
+Reads manim's source statically instead of importing it, so it runs anywhere:
+against a wheel (no cairo or pango needed) or an installed package. Use the
+manim version the sandbox image pins, and rebuild the index when that changes:
+
+    pip download manim==0.22.0 --no-deps -d /tmp/wheels
+    python app/utils/build_symbol_index.py /tmp/wheels/manim-0.22.0-py3-none-any.whl
+
+Only depends on the standard library, so it runs without the app's settings.
+"""
+import os
+import re
+import ast
+import sys
+import json
+import zipfile
+import argparse
+import tempfile
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "manim_symbols.json")
+
+
+class ModuleInfo:
+    def __init__(self, name, tree, is_package):
+        self.name = name
+        self.is_package = is_package
+        self.bindings = {}   # name -> ("class", node) / ("def", None) / ("value", None)
+                             #        / ("import", (module, attr or None))
+        self.star_imports = []
+        self.all_names = None
+        self._collect(tree.body)
+
+    def resolve_relative(self, module, level):
+        if not level:
+            return module
+        parts = self.name.split(".")
+        if not self.is_package:
+            parts = parts[:-1]
+        parts = parts[:len(parts) - (level - 1)]
+        return ".".join(parts + ([module] if module else []))
+
+    def _collect(self, body):
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                self.bindings[node.name] = ("class", node)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self.bindings[node.name] = ("def", None)
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname:
+                        self.bindings[alias.asname] = ("import", (alias.name, None))
+                    else:
+                        top = alias.name.split(".")[0]
+                        self.bindings[top] = ("import", (top, None))
+            elif isinstance(node, ast.ImportFrom):
+                module = self.resolve_relative(node.module, node.level)
+                for alias in node.names:
+                    if alias.name == "*":
+                        self.star_imports.append(module)
+                    else:
+                        self.bindings[alias.asname or alias.name] = ("import", (module, alias.name))
+            elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    for name in target_names(target):
+                        if name == "__all__":
+                            self._collect_all(node)
+                        elif not isinstance(node, ast.AnnAssign) or node.value is not None:
+                            self.bindings.setdefault(name, ("value", None))
+            elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+                # __all__.extend([...]) / __all__.append("...")
+                func = node.value.func
+                if (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name)
+                        and func.value.id == "__all__" and self.all_names is not None):
+                    for arg in node.value.args:
+                        self.all_names.extend(literal_names(arg) or [])
+            elif isinstance(node, ast.If):
+                # Names only bound for type checkers don't exist at runtime
+                if not is_type_checking(node.test):
+                    self._collect(node.body)
+                self._collect(node.orelse)
+            elif isinstance(node, ast.Try):
+                self._collect(node.body)
+                for handler in node.handlers:
+                    self._collect(handler.body)
+                self._collect(node.orelse)
+                self._collect(node.finalbody)
+
+    def _collect_all(self, node):
+        names = literal_names(node.value)
+        if names is None:
+            self.all_names = None
+        elif isinstance(node, ast.AugAssign) and self.all_names is not None:
+            self.all_names.extend(names)
+        else:
+            self.all_names = names
+
+
+def target_names(target):
+    if isinstance(target, ast.Name):
+        return [target.id]
+    if isinstance(target, (ast.Tuple, ast.List)):
+        return [n for elt in target.elts for n in target_names(elt)]
+    return []
+
+
+def literal_names(node):
+    if isinstance(node, (ast.List, ast.Tuple)):
+        if all(isinstance(e, ast.Constant) and isinstance(e.value, str) for e in node.elts):
+            return [e.value for e in node.elts]
+        return None
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, right = literal_names(node.left), literal_names(node.right)
+        if left is not None and right is not None:
+            return left + right
+    return None
+
+
+def is_type_checking(test):
+    return ((isinstance(test, ast.Name) and test.id == "TYPE_CHECKING")
+            or (isinstance(test, ast.Attribute) and test.attr == "TYPE_CHECKING"))
+
+
+class SourceTree:
+    def __init__(self, package_dir):
+        self.package = os.path.basename(os.path.normpath(package_dir))
+        self.files = {}
+        root = os.path.dirname(os.path.normpath(package_dir))
+        for dirpath, _, filenames in os.walk(package_dir):
+            for filename in filenames:
+                if not filename.endswith(".py"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                parts = os.path.relpath(path, root)[:-3].split(os.sep)
+                is_package = parts[-1] == "__init__"
+                if is_package:
+                    parts = parts[:-1]
+                self.files[".".join(parts)] = (path, is_package)
+        self._modules = {}
+        self._exports = {}
+        self.classes = {}      # class key -> entry
+        self._class_keys = {}  # (module, name) -> class key
+
+    def module(self, name):
+        if name not in self.files:
+            return None
+        if name not in self._modules:
+            path, is_package = self.files[name]
+            with open(path, encoding="utf-8") as f:
+                self._modules[name] = ModuleInfo(name, ast.parse(f.read()), is_package)
+        return self._modules[name]
+
+    def exports(self, name, seen=None):
+        """name -> binding owner module for `from <name> import *`."""
+        if name in self._exports:
+            return self._exports[name]
+        info = self.module(name)
+        if info is None:
+            return {}
+        seen = (seen or set()) | {name}
+        names = {}
+        for star in info.star_imports:
+            if star not in seen:
+                names.update(self.exports(star, seen))
+        for bound in info.bindings:
+            names[bound] = name
+        if info.all_names is not None:
+            names = {n: names.get(n, name) for n in info.all_names}
+        else:
+            names = {n: owner for n, owner in names.items() if not n.startswith("_")}
+        self._exports[name] = names
+        return names
+
+    def lookup(self, module, name, depth=0):
+        """Follow imports to the binding of name in module: (kind, detail)."""
+        if depth > 50:
+            return ("value", None)
+        info = self.module(module)
+        if info is None:
+            return ("external", None)
+        binding = info.bindings.get(name)
+        if binding is None:
+            owner = self.star_bindings(module).get(name)
+            if owner and owner != module:
+                return self.lookup(owner, name, depth + 1)
+            if f"{module}.{name}" in self.files:
+                return ("module", None)
+            return ("value", None)
+        kind, detail = binding
+        if kind == "class":
+            return ("class", self.class_key(module, name))
+        if kind == "import":
+            source, attr = detail
+            if attr is None:
+                return ("module", None)
+            if not source.startswith(self.package):
+                return ("external", None)
+            if f"{source}.{attr}" in self.files:
+                return ("module", None)
+            return self.lookup(source, attr, depth + 1)
+        return (kind, None)
+
+    def star_bindings(self, module):
+        # Names a module gets from its own `from x import *` lines
+        info = self.module(module)
+        names = {}
+        for star in info.star_imports:
+            names.update(self.exports(star))
+        return names
+
+    def class_key(self, module, name):
+        if (module, name) not in self._class_keys:
+            key = name if name not in self.classes else f"{name}@{module}"
+            self._class_keys[(module, name)] = key
+            self.classes[key] = None  # reserve the key before recursing into bases
+            self.classes[key] = self._class_entry(module, self.module(module).bindings[name][1])
+        return self._class_keys[(module, name)]
+
+    def _class_entry(self, module, node):
+        entry = {"bases": [], "members": set()}
+        for base in node.bases:
+            base_key = self._resolve_base(module, base)
+            if base_key is None:
+                continue
+            if base_key == "external":
+                entry["open"] = True
+            else:
+                entry["bases"].append(base_key)
+
+        for item in node.body:
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                entry["members"].add(item.name)
+                if item.name == "__getattr__":
+                    prefixes = getattr_prefixes(item)
+                    if prefixes:
+                        entry["getattr"] = sorted(prefixes)
+                    else:
+                        entry["open"] = True
+            elif isinstance(item, (ast.Assign, ast.AnnAssign)):
+                targets = item.targets if isinstance(item, ast.Assign) else [item.target]
+                for target in targets:
+                    entry["members"].update(target_names(target))
+
+        for sub in ast.walk(node):
+            # Instance attributes: self.x = ... in any method
+            if (isinstance(sub, ast.Attribute) and isinstance(sub.ctx, ast.Store)
+                    and isinstance(sub.value, ast.Name) and sub.value.id == "self"):
+                entry["members"].add(sub.attr)
+            # setattr(self, "x", ...); computed names (manim uses them to
+            # update attributes that already exist) aren't indexed
+            elif (isinstance(sub, ast.Call) and isinstance(sub.func, ast.Name) and sub.func.id == "setattr"
+                  and len(sub.args) >= 2 and is_self(sub.args[0])
+                  and isinstance(sub.args[1], ast.Constant) and isinstance(sub.args[1].value, str)):
+                entry["members"].add(sub.args[1].value)
+            # self.__dict__.update(...) can add anything
+            elif (isinstance(sub, ast.Call) and isinstance(sub.func, ast.Attribute) and sub.func.attr == "update"
+                  and isinstance(sub.func.value, ast.Attribute) and sub.func.value.attr == "__dict__"
+                  and is_self(sub.func.value.value)):
+                entry["open"] = True
+        return entry
+
+    def _resolve_base(self, module, base):
+        if isinstance(base, ast.Subscript):
+            base = base.value
+        if isinstance(base, ast.Name):
+            if base.id in ("object", "Generic", "Protocol"):
+                return None
+            kind, detail = self.lookup(module, base.id)
+            return detail if kind == "class" else "external"
+        if isinstance(base, ast.Attribute) and base.attr in ("Generic", "Protocol"):
+            return None
+        return "external"
+
+
+def is_self(node):
+    return isinstance(node, ast.Name) and node.id == "self"
+
+
+def getattr_prefixes(func):
+    prefixes = set()
+    for node in ast.walk(func):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr == "startswith"):
+            for arg in node.args:
+                if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                    prefixes.add(arg.value)
+    return prefixes
+
+
+def package_version(package_dir):
+    root = os.path.dirname(os.path.normpath(package_dir))
+    for entry in os.listdir(root):
+        match = re.match(r"^manim-([^-]+)\.dist-info$", entry)
+        if match:
+            return match.group(1)
+    return None
+
+
+def build_index(package_dir, version=None):
+    tree = SourceTree(package_dir)
+    names = {}
+    for name in sorted(tree.exports(tree.package)):
+        owner = tree.exports(tree.package)[name]
+        kind, detail = tree.lookup(owner, name)
+        if kind == "class":
+            names[name] = detail
+        else:
+            names[name] = {"def": "function", "value": "value", "module": "module", "external": "value"}[kind]
+
+    classes = {}
+    for key, entry in sorted(tree.classes.items()):
+        compact = {"bases": entry["bases"], "members": sorted(entry["members"])}
+        if entry.get("open"):
+            compact["open"] = True
+        if entry.get("getattr"):
+            compact["getattr"] = entry["getattr"]
+        classes[key] = compact
+
+    submodules = sorted({m.split(".")[1] for m in tree.files if m.count(".") >= 1})
+    return {
+        "manim_version": version or package_version(package_dir) or "unknown",
+        "names": names,
+        "classes": classes,
+        "submodules": submodules,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", help="manim wheel, or the manim package directory")
+    parser.add_argument("--version", help="manim version, if it can't be read from the dist-info")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        package_dir = args.source
+        if args.source.endswith(".whl"):
+            with zipfile.ZipFile(args.source) as wheel:
+                wheel.extractall(tmp)
+            package_dir = os.path.join(tmp, "manim")
+        index = build_index(package_dir, args.version)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"), sort_keys=True)
+        f.write("\n")
+    print(f"manim {index['manim_version']}: {len(index['names'])} names, "
+          f"{len(index['classes'])} classes -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import os
+import heapq
+from collections import deque
+
+# Cost of a task by the quality it renders, in units of one preview render;
+# a user's turn buys JOB_FAIR_QUANTUM of it
+JOB_QUALITY_COSTS = os.getenv("JOB_QUALITY_COSTS", "low=1,medium=2,high=4,production=8")
+JOB_FAIR_QUANTUM = float(os.getenv("JOB_FAIR_QUANTUM", "1"))
+# Per-user share of the quantum as "user_id=weight,..."; unlisted users get 1
+JOB_USER_WEIGHTS = os.getenv("JOB_USER_WEIGHTS", "")
+# A task queued this long runs next, ahead of other users and higher classes
+JOB_AGING_SECONDS = float(os.getenv("JOB_AGING_SECONDS", "120"))
+
+
+def parse_weights(text: str, key=str):
+    weights = {}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        name, _, value = item.partition("=")
+        try:
+            weights[key(name.strip())] = float(value)
+        except ValueError:
+            print(f"Fair queue: ignoring malformed weight {item!r}")
+    return weights
+
+
+QUALITY_COSTS = parse_weights(JOB_QUALITY_COSTS)
+USER_WEIGHTS = parse_weights(JOB_USER_WEIGHTS, key=int)
+
+
+def quality_cost(quality: str):
+    return QUALITY_COSTS.get(quality, 1.0)
+
+
+class Task:
+    __slots__ = ("priority", "user", "cost", "fn", "args", "key", "queued_at", "seq", "batch")
+
+    def __init__(self, priority, user, cost, fn, args, key, queued_at, seq, batch=False):
+        self.priority = priority
+        self.user = user
+        self.cost = cost
+        self.fn = fn
+        self.args = args
+        self.key = key
+        self.queued_at = queued_at
+        self.seq = seq
+        self.batch = batch
+
+
+# _turn when no user's turn is in progress (None is a valid user)
+NO_TURN = object()
+
+
+class DeficitRoundRobin:
+    """One priority class: a FIFO per user, served by deficit round-robin.
+
+    Each user with queued tasks takes turns; a turn adds quantum * weight to
+    the user's deficit, and the user's tasks run while it covers their cost.
+    A user with many or expensive tasks waits more turns, so one heavy user
+    can't push everyone else back.
+    """
+
+    def __init__(self, quantum: float, weights: dict):
+        self.quantum = quantum
+        self.weights = weights
+        self.flows = {}  # user -> deque of tasks
+        self.active = deque()  # users with queued tasks, in turn order
+        self.deficit = {}
+        self._turn = NO_TURN  # user whose turn is in progress
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def copy(self):
+        other = DeficitRoundRobin(self.quantum, self.weights)
+        other.flows = {user: deque(flow) for user, flow in self.flows.items()}
+        other.active = deque(self.active)
+        other.deficit = dict(self.deficit)
+        other._turn = self._turn
+        other._size = self._size
+        return other
+
+    def push(self, task: Task):
+        flow = self.flows.get(task.user)
+        if flow is None:
+            flow = self.flows[task.user] = deque()
+            self.active.append(task.user)
+            self.deficit[task.user] = 0.0
+        flow.append(task)
+        self._size += 1
+
+    def heads(self):
+        return (flow[0] for flow in self.flows.values())
+
+    def _take(self, user):
+        flow = self.flows[user]
+        task = flow.popleft()
+        self.deficit[user] -= task.cost
+        self._size -= 1
+        if not flow:
+            # An idle user doesn't bank credit
+            del self.flows[user]
+            del self.deficit[user]
+            self.active.remove(user)
+            if self._turn == user:
+                self._turn = NO_TURN
+        return task
+
+    def _end_turn(self):
+        self.active.rotate(-1)
+        self._turn = NO_TURN
+
+    def pop(self, can_run):
+        blocked = 0
+        while self.active:
+            if blocked >= len(self.active):
+                return None
+            user = self.active[0]
+            task = self.flows[user][0]
+            if not can_run(task, False):
+                self._end_turn()
+                blocked += 1
+                continue
+            blocked = 0
+            if self._turn != user:
+                self._turn = user
+                self.deficit[user] += self.quantum * self.weights.get(user, 1.0)
+            if self.deficit[user] < task.cost:
+                self._end_turn()
+                continue
+            return self._take(user)
+        return None
+
+    def remove_head(self, task: Task):
+        return self._take(task.user)
+
+
+class FairQueue:
+    """Tasks by priority class (lower first), each class fair across users.
+
+    Classes are strict, except that a task queued for longer than
+    aging_seconds runs next whatever its class or user, so background work
+    is never starved by a steady stream of new jobs.
+    """
+
+    def __init__(self, quantum: float = JOB_FAIR_QUANTUM, weights: dict = None,
+                 aging_seconds: float = JOB_AGING_SECONDS):
+        self.quantum = max(0.01, quantum)
+        self.weights = USER_WEIGHTS if weights is None else weights
+        self.aging_seconds = aging_seconds
+        self.classes = {}  # priority -> DeficitRoundRobin
+        self._size = 0
+        self.aged = 0
+
+    def __len__(self):
+        return self._size
+
+    def copy(self):
+        other = FairQueue(self.quantum, self.weights, self.aging_seconds)
+        other.classes = {priority: drr.copy() for priority, drr in self.classes.items()}
+        other._size = self._size
+        return other
+
+    def push(self, task: Task):
+        drr = self.classes.get(task.priority)
+        if drr is None:
+            drr = self.classes[task.priority] = DeficitRoundRobin(self.quantum, self.weights)
+        drr.push(task)
+        self._size += 1
+
+    def tasks(self):
+        for drr in self.classes.values():
+            for flow in drr.flows.values():
+                yield from flow
+
+    def queued_for(self, user, priority):
+        drr = self.classes.get(priority)
+        return len(drr.flows.get(user, ())) if drr else 0
+
+    def _oldest_aged(self, now, can_run):
+        if self.aging_seconds <= 0:
+            return None
+        oldest = None
+        for drr in self.classes.values():
+            for task in drr.heads():
+                if now - task.queued_at < self.aging_seconds or not can_run(task, True):
+                    continue
+                if oldest is None or (task.queued_at, task.seq) < (oldest.queued_at, oldest.seq):
+                    oldest = task
+        return oldest
+
+    def pop(self, now: float, can_run):
+        """Next task to run, or None if nothing queued may run now.
+
+        can_run(task, aged) vetoes tasks, e.g. for per-user caps; aged is
+        True for a task jumping ahead because it waited too long.
+        """
+        task = self._oldest_aged(now, can_run)
+        if task is not None:
+            self.aged += 1
+            task = self.classes[task.priority].remove_head(task)
+        else:
+            for priority in sorted(self.classes):
+                task = self.classes[priority].pop(can_run)
+                if task is not None:
+                    break
+        if task is None:
+            return None
+        self._size -= 1
+        if not self.classes[task.priority]:
+            del self.classes[task.priority]
+        return task
+
+
+def simulate_start(queue: FairQueue, key, now: float, workers: int, running, duration, can_run):
+    """Estimated (position, seconds until start) of the task with key.
+
+    Replays the queue on a copy: running is a list of (seconds left, task)
+    for the busy workers, duration(task) the expected run time of a task,
+    and can_run(task, aged, running_tasks) the same veto the executor uses.
+    """
+    queue = queue.copy()
+    ends = [(left, i, task) for i, (left, task) in enumerate(running)]
+    heapq.heapify(ends)
+    seq = len(ends)
+    clock = 0.0
+    position = 0
+    while True:
+        while len(ends) < workers:
+            in_flight = [task for _, _, task in ends]
+            task = queue.pop(now + clock, lambda t, aged: can_run(t, aged, in_flight))
+            if task is None:
+                break
+            if task.key == key:
+                return position, clock
+            position += 1
+            heapq.heappush(ends, (clock + duration(task), seq, task))
+            seq += 1
+        if not ends or not len(queue):
+            return None
+        clock = max(clock, heapq.heappop(ends)[0])
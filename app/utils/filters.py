@@ -10,10 +10,98 @@ dangerous_patterns = [
     r"(import).*?(os|sys|socket|shutil)",
 ]
 
+# The same patterns as keyword sets: every set must match, in order, on one
+# line (`.` never crosses a newline). Matching them with plain keyword scans
+# instead of `.*` keeps the work linear in the prompt length, where re.search
+# on the patterns above backtracks quadratically on long prompts.
+PATTERN_KEYWORDS = [
+    (("os.", "subprocess", "eval", "exec"),),
+    (("delete", "remove", "overwrite", "format"), ("file",)),
+    (("access",), ("network", "internet", "socket")),
+    (("send", "get", "post"), ("request", "http")),
+    (("steal", "leak", "expose"), ("data",)),
+    (("import",), ("os", "sys", "socket", "shutil")),
+]
+
+
+def _alternation(keywords):
+    # Shortest first, so at any position the regex finds the earliest-ending keyword
+    return "|".join(re.escape(k) for k in sorted(keywords, key=len))
+
+
+class _CompiledPattern:
+    def __init__(self, pattern, keyword_sets):
+        self.pattern = pattern
+        self.first = re.compile(f"(?=({_alternation(keyword_sets[0])}))")
+        self.rest = [re.compile(_alternation(keywords)) for keywords in keyword_sets[1:]]
+
+    def _first_end(self, line):
+        # Earliest end of any first keyword; once a start is past the best end
+        # found so far nothing later can beat it, so this stops early
+        best = None
+        for match in self.first.finditer(line):
+            if best is not None and match.start() >= best:
+                break
+            end = match.end(1)
+            if best is None or end < best:
+                best = end
+        return best
+
+    def matches(self, text):
+        for line in text.split("\n"):
+            pos = self._first_end(line)
+            if pos is None:
+                continue
+            for regex in self.rest:
+                match = regex.search(line, pos)
+                if not match:
+                    break
+                pos = match.end()
+            else:
+                return True
+        return False
+
+
+_compiled = [_CompiledPattern(p, k) for p, k in zip(dangerous_patterns, PATTERN_KEYWORDS)]
+
+# One pass over the prompt with every leading keyword as a named group tells
+# which patterns can match at all; only those are confirmed. Leading keywords
+# of different patterns must not be prefixes of each other, or the lookahead
+# would only report one of them.
+_prefilter = re.compile("(?=" + "|".join(
+    f"(?P<p{i}>{_alternation(keywords[0])})" for i, keywords in enumerate(PATTERN_KEYWORDS)
+) + ")")
+
+
+# Plain (non-lookahead) search for any leading keyword: the fast path for
+# the vast majority of prompts, which contain none
+_any_keyword = re.compile(_alternation({k for keywords in PATTERN_KEYWORDS for k in keywords[0]}))
+
+
+def _candidates(lowered):
+    first = _any_keyword.search(lowered)
+    if not first:
+        return set()
+    found = set()
+    for match in _prefilter.finditer(lowered, first.start()):
+        found.add(match.lastgroup)
+        if len(found) == len(_compiled):
+            break
+    return found
+
+
 def is_prompt_unsafe(prompt: str):
     lowered = prompt.lower()
+    candidates = _candidates(lowered)
+    if not candidates:
+        return False, None
+
+    for i, compiled in enumerate(_compiled):
+        if f"p{i}" in candidates and compiled.matches(lowered):
+            return True, f"Prompt contains potentially dangerous pattern: {compiled.pattern}"
+    return False, None
+
 
-    for pattern in dangerous_patterns:
-        if re.search(pattern,lowered):
-            return True, f"Prompt contains potentially dangerous pattern: {pattern}"
-    return False, None
\ No newline at end of file
+def screen_prompts(prompts):
+    """is_prompt_unsafe for many prompts at once; results keep the input order."""
+    return [is_prompt_unsafe(prompt) for prompt in prompts]
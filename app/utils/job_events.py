@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import uuid
+import select
+import threading
+from collections import deque
+from sqlalchemy import text
+
+from app.db.db import engine, SessionFactory
+from app.db.models.job import Job
+
+# Events kept per job so late subscribers and reconnecting clients catch up
+JOB_EVENTS_HISTORY = int(os.getenv("JOB_EVENTS_HISTORY", "50"))
+# How long a finished job's events stay around after its last event
+JOB_EVENTS_RETENTION = int(os.getenv("JOB_EVENTS_RETENTION", "300"))
+# Fan events out to other processes through Postgres LISTEN/NOTIFY
+JOB_EVENTS_NOTIFY = os.getenv("JOB_EVENTS_NOTIFY", "auto")
+NOTIFY_CHANNEL = "job_events"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_PAYLOAD = 7900
+# What a status event carries over NOTIFY; the rest (error_message, videoId)
+# is read back from the job row by the receiving process
+NOTIFY_STATUS_FIELDS = ("jobId", "seq", "time", "type", "status")
+
+TERMINAL_EVENT_STATUSES = {"completed", "failed"}
+
+
+def _notify_enabled():
+    if JOB_EVENTS_NOTIFY == "auto":
+        return engine.dialect.name == "postgresql"
+    return JOB_EVENTS_NOTIFY == "1"
+
+
+class JobEventBus:
+    """In-process pub/sub for job progress, optionally bridged across processes.
+
+    Every job keeps a short history of sequenced events. Readers block in
+    wait() until there is something newer than the last sequence number they
+    saw, so nothing is missed between reconnects. Sequence numbers are
+    microsecond timestamps, so they keep increasing when a requeued job is
+    picked up by another process.
+    """
+
+    def __init__(self):
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._cond = threading.Condition()
+        self._history = {}  # job_uuid -> deque of events
+        self._touched = {}  # job_uuid -> last event time
+        self._seq = {}
+        self._listener = None
+
+    def publish(self, job_uuid: str, event: dict):
+        now = time.time()
+        with self._cond:
+            seq = max(self._seq.get(job_uuid, 0) + 1, int(now * 1_000_000))
+            self._seq[job_uuid] = seq
+        event = dict(event, jobId=job_uuid, seq=seq, time=now)
+        self._deliver(job_uuid, event)
+
+        if _notify_enabled():
+            payload = self._notice(event)
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                                 {"channel": NOTIFY_CHANNEL, "payload": payload})
+                    conn.commit()
+            except Exception as e:
+                # Local subscribers already have the event; streams in other
+                # workers pick the final status up from the DB (refresh_status)
+                print(f"Job events: NOTIFY failed: {e}")
+
+    def _notice(self, event: dict):
+        if event["type"] == "status":
+            event = {k: event[k] for k in NOTIFY_STATUS_FIELDS}
+        payload = json.dumps({"origin": self.origin, "event": event})
+        if len(payload.encode()) >= NOTIFY_MAX_PAYLOAD:
+            # Stage events are small; this only guards against an odd oversized field
+            event = {k: event[k] for k in ("jobId", "seq", "time", "type") if k in event}
+            payload = json.dumps({"origin": self.origin, "event": event})
+        return payload
+
+    def _deliver(self, job_uuid: str, event: dict):
+        with self._cond:
+            history = self._history.setdefault(job_uuid, deque(maxlen=JOB_EVENTS_HISTORY))
+            history.append(event)
+            self._touched[job_uuid] = time.monotonic()
+            self._expire()
+            self._cond.notify_all()
+
+    def _expire(self):
+        # Finished jobs go after JOB_EVENTS_RETENTION; anything silent for a
+        # day is assumed to belong to a worker that died mid-job
+        now = time.monotonic()
+        expired = [
+            j for j, t in self._touched.items()
+            if now - t > 86400 or (now - t > JOB_EVENTS_RETENTION and
+                                   self._history[j][-1].get("status") in TERMINAL_EVENT_STATUSES)
+        ]
+        for job_uuid in expired:
+            self._history.pop(job_uuid, None)
+            self._touched.pop(job_uuid, None)
+            self._seq.pop(job_uuid, None)
+
+    def wait(self, job_uuid: str, after_seq: int = 0, timeout: float = 15.0):
+        """Events of job_uuid newer than after_seq; blocks up to timeout for the first one."""
+        self._ensure_listener()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                events = [e for e in self._history.get(job_uuid, ()) if e["seq"] > after_seq]
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events
+                self._cond.wait(remaining)
+
+    def _ensure_listener(self):
+        if self._listener or not _notify_enabled():
+            return
+        with self._cond:
+            if self._listener:
+                return
+            self._listener = threading.Thread(target=self._listen, name="job-events-listener", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                raw = engine.raw_connection()
+                # The LISTEN connection is held for good; keep it out of the pool
+                raw.detach()
+                try:
+                    conn = raw.driver_connection
+                    conn.autocommit = True
+                    conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    while True:
+                        if select.select([conn], [], [], 5) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            self._on_notify(conn.notifies.pop(0).payload)
+                finally:
+                    raw.close()
+            except Exception as e:
+                print(f"Job events: listener error, reconnecting: {e}")
+                time.sleep(1)
+
+    def _on_notify(self, payload: str):
+        message = json.loads(payload)
+        if message.get("origin") == self.origin:
+            return
+        event = message["event"]
+        if event["type"] == "status":
+            event.update(status_details(event["jobId"], event["status"]))
+        self._deliver(event["jobId"], event)
+
+
+def status_details(job_uuid: str, status: str):
+    """Fields of a status event that NOTIFY leaves out, from the job row."""
+    if status not in TERMINAL_EVENT_STATUSES:
+        return {}
+    try:
+        with SessionFactory() as db:
+            job = db.query(Job).filter(Job.job_uuid == job_uuid).first()
+            if not job:
+                return {}
+            if status == "completed":
+                return {"videoId": job.video_id}
+            return {"error_message": job.error_message}
+    except Exception as e:
+        print(f"Job events: could not load job {job_uuid}: {e}")
+        return {}
+
+
+job_events = JobEventBus()
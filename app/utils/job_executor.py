@@ -0,0 +1,281 @@
+import os
+import math
+import time
+import itertools
+import threading
+from collections import Counter
+
+from app.utils.metrics import record_stage
+from app.utils.fair_queue import FairQueue, Task, simulate_start
+
+# Worker pool sizing. Every worker runs one job end to end (LLM call, sanitizer,
+# docker render, upload), so JOB_WORKERS is effectively the number of concurrent
+# renders this process will run.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+# Fallback Retry-After (seconds) when we have no job durations to estimate from yet
+JOB_RETRY_AFTER = int(os.getenv("JOB_RETRY_AFTER", "30"))
+# Workers that may run background tasks (high-quality re-renders) at once, so
+# new jobs always find a free worker soon. Defaults to half the pool.
+JOB_BACKGROUND_WORKERS = int(os.getenv("JOB_BACKGROUND_WORKERS", "0"))
+# Tasks of one user running at once, and jobs one user may have queued;
+# 0 leaves them unbounded
+JOB_USER_MAX_RUNNING = int(os.getenv("JOB_USER_MAX_RUNNING", "0"))
+JOB_USER_QUEUE_SIZE = int(os.getenv("JOB_USER_QUEUE_SIZE", "0"))
+# Jobs of admitted batches not yet rendering, over all batches. Batches are
+# admitted against this bound instead of JOB_QUEUE_SIZE, and reserve their
+# slots up front because their renders are queued only after the LLM stage
+JOB_BATCH_QUEUE_SIZE = int(os.getenv("JOB_BATCH_QUEUE_SIZE", "200"))
+
+# Task priorities; lower runs first
+PRIORITY_NORMAL = 0
+PRIORITY_BACKGROUND = 10
+
+
+class JobExecutor:
+    def __init__(self, workers: int, queue_size: int, background_workers: int = 0,
+                 user_max_running: int = 0, user_queue_size: int = 0, batch_queue_size: int = JOB_BATCH_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.background_workers = max(1, min(self.workers, background_workers or self.workers // 2))
+        self.user_max_running = user_max_running
+        self.user_queue_size = user_queue_size
+        self.batch_queue_size = max(1, batch_queue_size)
+
+        # Per priority class, per-user FIFOs served by deficit round-robin
+        self._queue = FairQueue()
+        self._seq = itertools.count()
+        self._running = {}  # worker thread name -> (task, started)
+        self._running_by_user = Counter()
+        self._background_busy = 0
+        self._background_queued = 0
+        self._batch_slots = 0  # reserved by admitted batch jobs that aren't running yet
+        self._batch_queued = 0  # of those, the ones already queued
+        # priority -> [seconds, cost units run], for start time estimates
+        self._class_runs = {}
+        self._cond = threading.Condition()
+        self._threads = []
+        self._started_at = None
+        self._local = threading.local()
+
+        self._busy = 0
+        self._busy_seconds = 0.0
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    def _ensure_started(self):
+        # Workers are started lazily so importing the app (alembic, scripts)
+        # does not spawn threads
+        if self._threads:
+            return
+        self._started_at = time.monotonic()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _queued(self):
+        # Background tasks are follow-ups of admitted jobs, and batch jobs hold
+        # slots of their own; neither takes queue slots from new requests
+        return len(self._queue) - self._background_queued - self._batch_queued
+
+    def has_capacity(self, n: int = 1, user=None):
+        with self._cond:
+            if self.user_queue_size and user is not None and \
+                    self._queue.queued_for(user, PRIORITY_NORMAL) + n > self.user_queue_size:
+                return False
+            return self._queued() + n <= self.queue_size
+
+    def reserve_batch(self, n: int, user=None):
+        """Reserve slots for n batch jobs, submitted later with batch=True.
+        Returns False when the batch bound (or the user's) has no room."""
+        with self._cond:
+            if self.user_queue_size and user is not None and \
+                    self._queue.queued_for(user, PRIORITY_NORMAL) + n > self.user_queue_size:
+                return False
+            if self._batch_slots + n > self.batch_queue_size:
+                return False
+            self._batch_slots += n
+            return True
+
+    def release_batch(self, n: int = 1):
+        # For batch jobs that end before their render is submitted
+        with self._cond:
+            self._batch_slots = max(self._batch_queued, self._batch_slots - n)
+
+    def record_rejected(self):
+        with self._cond:
+            self._rejected += 1
+
+    def submit(self, fn, *args, force: bool = False, priority: int = PRIORITY_NORMAL,
+               user=None, cost: float = 1.0, key: str = None, batch: bool = False):
+        """Queue fn(*args). Returns False when the queue is full.
+
+        force=True bypasses the queue bound; it is meant for follow-up work of
+        jobs that were already admitted, never for new requests. batch=True
+        uses a slot reserved with reserve_batch() instead, and returns False
+        if none is left. Tasks with a lower priority value run first; within a
+        priority, users take turns weighted by the cost of their tasks. key (a job uuid) makes the task
+        findable by position().
+        """
+        with self._cond:
+            self._ensure_started()
+            if batch and self._batch_queued >= self._batch_slots:
+                self._rejected += 1
+                return False
+            if not force and not batch and self._queued() >= self.queue_size:
+                self._rejected += 1
+                return False
+            self._queue.push(Task(priority, user, cost, fn, args, key, time.monotonic(), next(self._seq), batch))
+            if batch:
+                self._batch_queued += 1
+            elif priority >= PRIORITY_BACKGROUND:
+                self._background_queued += 1
+            self._submitted += 1
+            self._cond.notify_all()
+            return True
+
+    def _can_run(self, task, aged, running_by_user, background_busy):
+        # Background tasks wait while their share of workers is busy, unless
+        # they have waited too long; nobody goes over their per-user cap
+        if self.user_max_running and task.user is not None and \
+                running_by_user[task.user] >= self.user_max_running:
+            return False
+        return aged or task.priority < PRIORITY_BACKGROUND or background_busy < self.background_workers
+
+    def _next_task(self):
+        return self._queue.pop(time.monotonic(), lambda task, aged: self._can_run(
+            task, aged, self._running_by_user, self._background_busy))
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    # Blocked tasks can age into runnable ones without a notify
+                    self._cond.wait(1 if self._queue else None)
+                    task = self._next_task()
+                fn, args = task.fn, task.args
+                background = task.priority >= PRIORITY_BACKGROUND
+                self._busy += 1
+                if background:
+                    self._background_busy += 1
+                if task.batch:
+                    self._batch_queued -= 1
+                    self._batch_slots -= 1
+                elif background:
+                    self._background_queued -= 1
+                self._running_by_user[task.user] += 1
+                started = time.monotonic()
+                self._running[threading.current_thread().name] = (task, started)
+                waited = started - task.queued_at
+                self._wait_seconds += waited
+
+            self._local.queue_wait = waited
+            record_stage("background_queue_wait" if background else "queue_wait", waited)
+            started = time.monotonic()
+            ok = True
+            try:
+                fn(*args)
+            except Exception as e:
+                ok = False
+                print(f"Job executor: task {getattr(fn, '__name__', fn)} raised: {e}")
+            finally:
+                elapsed = time.monotonic() - started
+                with self._cond:
+                    self._busy -= 1
+                    if background:
+                        self._background_busy -= 1
+                    self._running_by_user[task.user] -= 1
+                    if not self._running_by_user[task.user]:
+                        del self._running_by_user[task.user]
+                    del self._running[threading.current_thread().name]
+                    runs = self._class_runs.setdefault(task.priority, [0.0, 0])
+                    runs[0] += elapsed
+                    runs[1] += task.cost
+                    # A finished task may unblock a capped user or a background task
+                    self._cond.notify_all()
+                    self._busy_seconds += elapsed
+                    self._run_seconds += elapsed
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+
+    def current_wait(self):
+        """Seconds the task running on the calling worker spent queued."""
+        return getattr(self._local, "queue_wait", None)
+
+    def _expected_run(self, task):
+        seconds, units = self._class_runs.get(task.priority) or self._class_runs.get(PRIORITY_NORMAL) or (0.0, 0)
+        if units:
+            return seconds / units * task.cost
+        finished = self._completed + self._failed
+        return self._run_seconds / finished if finished else JOB_RETRY_AFTER
+
+    def position(self, key: str):
+        """(tasks ahead, estimated seconds until start) of the queued task with
+        key, by replaying the scheduler over average run times; None if it
+        isn't queued here."""
+        with self._cond:
+            if not any(task.key == key for task in self._queue.tasks()):
+                return None
+            now = time.monotonic()
+            running = [(max(0.0, self._expected_run(task) - (now - started)), task)
+                       for task, started in self._running.values()]
+
+            def can_run(task, aged, in_flight):
+                by_user = Counter(t.user for t in in_flight)
+                background = sum(1 for t in in_flight if t.priority >= PRIORITY_BACKGROUND)
+                return self._can_run(task, aged, by_user, background)
+
+            return simulate_start(self._queue, key, now, self.workers, running,
+                                  self._expected_run, can_run)
+
+    def retry_after(self):
+        # Estimate how long until a queue slot frees up: one average job
+        # duration spread over the workers, scaled by what is already queued
+        with self._cond:
+            finished = self._completed + self._failed
+            if not finished:
+                return JOB_RETRY_AFTER
+            avg_run = self._run_seconds / finished
+            depth = self._queued()
+        return max(1, math.ceil(avg_run * (depth + 1) / self.workers))
+
+    def stats(self):
+        with self._cond:
+            finished = self._completed + self._failed
+            dequeued = finished + self._busy
+            uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+            capacity_seconds = uptime * self.workers
+            return {
+                "workers": self.workers,
+                "busy_workers": self._busy,
+                "utilization": round(self._busy / self.workers, 3),
+                "lifetime_utilization": round(self._busy_seconds / capacity_seconds, 3) if capacity_seconds else 0.0,
+                "queue_depth": self._queued(),
+                "background_queued": self._background_queued,
+                "background_busy": self._background_busy,
+                "queued_users": len({task.user for task in self._queue.tasks()}),
+                "running_users": len(self._running_by_user),
+                "aged": self._queue.aged,
+                "queue_capacity": self.queue_size,
+                "batch_slots": self._batch_slots,
+                "batch_queued": self._batch_queued,
+                "batch_capacity": self.batch_queue_size,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_seconds": round(self._wait_seconds / dequeued, 3) if dequeued else 0.0,
+                "avg_run_seconds": round(self._run_seconds / finished, 3) if finished else 0.0,
+            }
+
+
+job_executor = JobExecutor(JOB_WORKERS, JOB_QUEUE_SIZE, JOB_BACKGROUND_WORKERS,
+                           JOB_USER_MAX_RUNNING, JOB_USER_QUEUE_SIZE)
@@ -0,0 +1,511 @@
+import os
+import time
+import uuid
+import select
+import socket
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import update, func, text, or_
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db.db import engine, SessionFactory
+from app.db.models.job import Job, JobStatus
+from app.utils.job_executor import (
+    job_executor, JOB_WORKERS, JOB_USER_QUEUE_SIZE, JOB_USER_MAX_RUNNING, JOB_RETRY_AFTER, PRIORITY_NORMAL,
+)
+from app.utils.fair_queue import FairQueue, Task, USER_WEIGHTS, quality_cost, simulate_start
+from app.utils.job_events import job_events
+from app.utils.metrics import record_stage, JOBS_FINISHED
+
+# memory: the API process runs the jobs it accepts on its own job_executor,
+# and a restart loses them. db: accepted jobs wait as pending rows until a
+# `python worker.py` process on any node claims one under a lease
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "memory")
+# A claim lasts this many seconds unless the worker's heartbeat renews it
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "15"))
+# Claims a job gets before an expiring lease fails it instead of requeueing it
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Seconds an idle worker waits between claims; on Postgres new jobs wake it sooner
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_REAPER_INTERVAL = float(os.getenv("JOB_REAPER_INTERVAL", "15"))
+# Pending jobs, over all nodes, beyond which the API answers 503
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "1000"))
+# Seconds a stopping worker lets its jobs finish before handing them back
+JOB_SHUTDOWN_TIMEOUT = float(os.getenv("JOB_SHUTDOWN_TIMEOUT", "60"))
+
+QUEUE_CHANNEL = "job_queue"
+# Dialects with SELECT ... FOR UPDATE SKIP LOCKED
+SKIP_LOCKED_DIALECTS = ("postgresql", "mysql", "mariadb", "oracle")
+
+
+def db_backend():
+    return JOB_QUEUE_BACKEND == "db"
+
+
+def pending_jobs(db):
+    # Followers are pending too, but only their leader is ever run
+    return db.query(func.count(Job.id)).filter(
+        Job.status == JobStatus.pending, Job.leader_job_uuid.is_(None)
+    ).scalar()
+
+
+def has_capacity(db, n: int = 1, user=None):
+    if not db_backend():
+        return job_executor.has_capacity(n, user)
+    if JOB_USER_QUEUE_SIZE and user is not None:
+        queued = db.query(func.count(Job.id)).filter(
+            Job.status == JobStatus.pending, Job.leader_job_uuid.is_(None), Job.user_id == user
+        ).scalar()
+        if queued + n > JOB_USER_QUEUE_SIZE:
+            return False
+    return pending_jobs(db) + n <= JOB_QUEUE_LIMIT
+
+
+def expired_lease(now):
+    # Running rows without a lease were started by an in-process pool
+    # (JOB_QUEUE_BACKEND=memory) that is gone; nothing will ever finish them
+    return or_(Job.lease_expires_at < now, Job.lease_expires_at.is_(None))
+
+
+def epoch_seconds(when: datetime):
+    return (when - datetime(1970, 1, 1)).total_seconds()
+
+
+def job_cost(quality: str):
+    from app.pipeline import preview_quality
+    return quality_cost(preview_quality(quality))
+
+
+def pending_queue(db, per_user: int = None):
+    """The pending jobs as the claim order sees them: a FairQueue of (at most
+    per_user per user) pending leader jobs, and the running jobs' Tasks.
+
+    There is no deficit state shared between workers, so each claim rebuilds
+    it: users whose running jobs cost least (per weight) take the first turn.
+    That gives every user their share of the fleet, as the in-process
+    scheduler does for one pool.
+    """
+    rank = func.row_number().over(partition_by=Job.user_id, order_by=(Job.created_at, Job.id)).label("rank")
+    pending = db.query(Job.id, Job.job_uuid, Job.user_id, Job.quality, Job.created_at, rank).filter(
+        Job.status == JobStatus.pending, Job.leader_job_uuid.is_(None)).subquery()
+    rows = db.query(pending)
+    if per_user:
+        rows = rows.filter(pending.c.rank <= per_user)
+    running = [Task(PRIORITY_NORMAL, user, job_cost(quality), None, (), job_uuid, 0.0, 0)
+               for job_uuid, user, quality in db.query(Job.job_uuid, Job.user_id, Job.quality).filter(
+                   Job.status == JobStatus.running)]
+
+    served = defaultdict(float)
+    for task in running:
+        served[task.user] += task.cost / USER_WEIGHTS.get(task.user, 1.0)
+    flows = defaultdict(list)
+    for job_id, job_uuid, user, quality, created_at, _ in rows.order_by(pending.c.created_at, pending.c.id):
+        flows[user].append(Task(PRIORITY_NORMAL, user, job_cost(quality), None, (), job_uuid,
+                                epoch_seconds(created_at), job_id))
+    queue = FairQueue()
+    for user in sorted(flows, key=lambda u: (served[u], flows[u][0].queued_at)):
+        for task in flows[user]:
+            queue.push(task)
+    return queue, running
+
+
+def can_run_with(running_by_user):
+    # JOB_USER_MAX_RUNNING counts the user's jobs on every worker
+    def can_run(task, aged):
+        return not (JOB_USER_MAX_RUNNING and task.user is not None and
+                    running_by_user[task.user] >= JOB_USER_MAX_RUNNING)
+    return can_run
+
+
+def claim_order(db, limit: int):
+    """Ids of the next limit pending jobs to claim, fair across users."""
+    queue, running = pending_queue(db, per_user=limit)
+    running_by_user = Counter(task.user for task in running)
+    can_run = can_run_with(running_by_user)
+    now = epoch_seconds(datetime.utcnow())
+    ids = []
+    while len(ids) < limit:
+        task = queue.pop(now, can_run)
+        if task is None:
+            break
+        running_by_user[task.user] += 1
+        ids.append(task.seq)
+    return ids
+
+
+def fleet_estimates(db, running):
+    """(worker slots, seconds per cost unit) over all workers, from live
+    leases and recently finished jobs."""
+    owners = db.query(func.count(func.distinct(Job.lease_owner))).filter(
+        Job.status == JobStatus.running, Job.lease_expires_at >= datetime.utcnow()).scalar()
+    slots = max(JOB_WORKERS * max(1, owners), len(running))
+    seconds = units = 0.0
+    for quality, timings in db.query(Job.quality, Job.stage_timings).filter(
+            Job.status == JobStatus.completed, Job.stage_timings.isnot(None)
+    ).order_by(Job.id.desc()).limit(50):
+        total = (timings or {}).get("total")
+        if total:
+            # The queue wait isn't run time
+            seconds += max(0.0, total - timings.get("queue_wait", 0.0))
+            units += job_cost(quality)
+    return slots, seconds / units if units else JOB_RETRY_AFTER
+
+
+def queue_position(db, job):
+    """(jobs ahead, estimated seconds until start or None) for a pending job,
+    or None when this process can't tell."""
+    if not db_backend():
+        return job_executor.position(job.job_uuid)
+    queue, running = pending_queue(db)
+    slots, unit_seconds = fleet_estimates(db, running)
+    # Start times of running jobs aren't stored; assume they're halfway done
+    in_flight = [(unit_seconds * task.cost / 2, task) for task in running]
+
+    def can_run(task, aged, in_flight):
+        return can_run_with(Counter(t.user for t in in_flight))(task, aged)
+
+    return simulate_start(queue, job.job_uuid, epoch_seconds(datetime.utcnow()), slots, in_flight,
+                          lambda task: unit_seconds * task.cost, can_run)
+
+
+def wake_workers():
+    """Tell idle workers there are new pending rows (Postgres only; others poll)."""
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, '')"), {"channel": QUEUE_CHANNEL})
+            conn.commit()
+    except Exception as e:
+        print(f"Job queue: NOTIFY failed, workers will poll: {e}")
+
+
+def queue_stats(db):
+    now = datetime.utcnow()
+    running = db.query(func.count(Job.id)).filter(Job.status == JobStatus.running)
+    return {
+        "backend": JOB_QUEUE_BACKEND,
+        "pending": pending_jobs(db),
+        "running": running.scalar(),
+        "expired_leases": running.filter(expired_lease(now)).scalar(),
+        "limit": JOB_QUEUE_LIMIT,
+    }
+
+
+class JobQueue:
+    """Claims, heartbeats and reaping of jobs stored in the jobs table.
+
+    A claim moves a pending job to running under this owner's lease. On
+    databases with SKIP LOCKED, concurrent claimers skip each other's rows;
+    elsewhere (SQLite) each candidate is taken with an UPDATE that only
+    matches while the row is still pending. Leases are renewed while the job
+    runs. A worker that dies stops renewing, and the reaper hands its jobs
+    back to the queue, or fails them after JOB_MAX_ATTEMPTS claims. Delivery
+    is at least once: a worker cut off from the database for longer than the
+    lease can finish a job that another worker has also picked up.
+    """
+
+    def __init__(self, owner: str = None, lease_seconds: int = JOB_LEASE_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.owner = owner or f"{socket.gethostname()[:40]}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._held = set()
+        self._lock = threading.Lock()
+
+        self._claimed = 0
+        self._lost = 0
+        self._requeued = 0
+        self._abandoned = 0
+
+    def _lease_values(self, now):
+        return {"status": JobStatus.running, "lease_owner": self.owner,
+                "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                "attempts": Job.attempts + 1}
+
+    def claim(self, limit: int = 1):
+        """Lease up to limit pending jobs, in the fair order of claim_order().
+        Returns (job_uuid, prompt, seconds queued) tuples."""
+        if limit <= 0:
+            return []
+        db = SessionFactory()
+        try:
+            now = datetime.utcnow()
+            # Twice as many candidates: concurrent claimers compute the same order
+            order = claim_order(db, limit * 2)
+            if db.get_bind().dialect.name in SKIP_LOCKED_DIALECTS:
+                locked = {row.id for row in db.query(Job.id).filter(
+                    Job.id.in_(order), Job.status == JobStatus.pending
+                ).with_for_update(skip_locked=True)} if order else set()
+                ids = [job_id for job_id in order if job_id in locked][:limit]
+                if ids:
+                    db.execute(update(Job).where(Job.id.in_(ids)).values(**self._lease_values(now)))
+            else:
+                # No row locks to skip; losing a race shows up as an UPDATE that matched nothing
+                ids = []
+                for job_id in order:
+                    result = db.execute(update(Job).where(
+                        Job.id == job_id, Job.status == JobStatus.pending
+                    ).values(**self._lease_values(now)))
+                    if result.rowcount:
+                        ids.append(job_id)
+                        if len(ids) == limit:
+                            break
+            claimed = []
+            if ids:
+                rows = db.query(Job.job_uuid, Job.prompt, Job.created_at).filter(Job.id.in_(ids))
+                claimed = [(job_uuid, prompt, max(0.0, (now - created_at).total_seconds()))
+                           for job_uuid, prompt, created_at in rows]
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Job queue: claim failed: {e}")
+            return []
+        finally:
+            db.close()
+        with self._lock:
+            self._held.update(job_uuid for job_uuid, _, _ in claimed)
+            self._claimed += len(claimed)
+        return claimed
+
+    def heartbeat(self):
+        """Renew the leases of the jobs this worker holds."""
+        with self._lock:
+            held = list(self._held)
+        if not held:
+            return
+        db = SessionFactory()
+        try:
+            db.execute(update(Job).where(
+                Job.job_uuid.in_(held), Job.lease_owner == self.owner, Job.status == JobStatus.running
+            ).values(lease_expires_at=datetime.utcnow() + timedelta(seconds=self.lease_seconds)))
+            still_ours = {job_uuid for job_uuid, in db.query(Job.job_uuid).filter(
+                Job.job_uuid.in_(held), Job.lease_owner == self.owner)}
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Job queue: heartbeat failed: {e}")
+            return
+        finally:
+            db.close()
+        with self._lock:
+            lost = (set(held) - still_ours) & self._held
+            self._held -= lost
+            self._lost += len(lost)
+        for job_uuid in lost:
+            print(f"Job queue: lost the lease on {job_uuid}; another worker may run it again")
+
+    def release(self, job_uuid: str):
+        """Drop a processed job. A job that didn't reach a final status keeps its
+        lease, so the reaper puts it back in the queue when the lease runs out."""
+        with self._lock:
+            self._held.discard(job_uuid)
+        db = SessionFactory()
+        try:
+            db.execute(update(Job).where(
+                Job.job_uuid == job_uuid, Job.lease_owner == self.owner,
+                Job.status.in_([JobStatus.completed, JobStatus.failed])
+            ).values(lease_owner=None, lease_expires_at=None))
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Job queue: could not release {job_uuid}: {e}")
+        finally:
+            db.close()
+
+    def requeue_held(self):
+        """Hand every job this worker still holds back to the queue (shutdown)."""
+        with self._lock:
+            held = list(self._held)
+            self._held.clear()
+        if not held:
+            return 0
+        db = SessionFactory()
+        try:
+            result = db.execute(update(Job).where(
+                Job.job_uuid.in_(held), Job.lease_owner == self.owner, Job.status == JobStatus.running
+            ).values(status=JobStatus.pending, lease_owner=None, lease_expires_at=None))
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Job queue: could not requeue held jobs, the reaper will: {e}")
+            return 0
+        finally:
+            db.close()
+        with self._lock:
+            self._requeued += result.rowcount
+        wake_workers()
+        return result.rowcount
+
+    def reap(self):
+        """Requeue running jobs whose lease expired (or that never had one),
+        or fail them after too many claims. Returns (requeued, failed) job uuids."""
+        db = SessionFactory()
+        requeued, failed = [], []
+        try:
+            now = datetime.utcnow()
+            expired = db.query(Job.id, Job.job_uuid, Job.attempts).filter(
+                Job.status == JobStatus.running, expired_lease(now))
+            if db.get_bind().dialect.name in SKIP_LOCKED_DIALECTS:
+                expired = expired.with_for_update(skip_locked=True)
+            for job_id, job_uuid, attempts in expired.all():
+                give_up = attempts >= self.max_attempts
+                values = {"lease_owner": None, "lease_expires_at": None}
+                if give_up:
+                    values.update(status=JobStatus.failed,
+                                  error_message=f"Job abandoned: its worker stopped responding {attempts} times")
+                else:
+                    values.update(status=JobStatus.pending)
+                # Only if the lease is still expired: its worker may have renewed it meanwhile
+                result = db.execute(update(Job).where(
+                    Job.id == job_id, Job.status == JobStatus.running, expired_lease(now)
+                ).values(**values))
+                if result.rowcount:
+                    (failed if give_up else requeued).append(job_uuid)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Job queue: reaper failed: {e}")
+            return [], []
+        finally:
+            db.close()
+
+        with self._lock:
+            self._requeued += len(requeued)
+            self._abandoned += len(failed)
+        for job_uuid in requeued:
+            print(f"Job queue: lease on {job_uuid} expired, requeued")
+            job_events.publish(job_uuid, {"type": "status", "status": "pending"})
+        for job_uuid in failed:
+            JOBS_FINISHED.inc("failed")
+            job_events.publish(job_uuid, {"type": "status", "status": "failed",
+                                          "error_message": "Job abandoned: its worker stopped responding"})
+        if requeued:
+            wake_workers()
+        return requeued, failed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "owner": self.owner,
+                "held": len(self._held),
+                "claimed": self._claimed,
+                "lost_leases": self._lost,
+                "requeued": self._requeued,
+                "abandoned": self._abandoned,
+            }
+
+
+class QueueListener:
+    """Blocks until new jobs are announced (Postgres LISTEN) or timeout passes."""
+
+    def __init__(self):
+        self._conn = None
+        self._raw = None
+
+    def wait(self, timeout: float, stopping: threading.Event):
+        if engine.dialect.name != "postgresql":
+            stopping.wait(timeout)
+            return
+        try:
+            if self._conn is None:
+                self._raw = engine.raw_connection()
+                # Held for the worker's lifetime; keep it out of the pool
+                self._raw.detach()
+                self._conn = self._raw.driver_connection
+                self._conn.autocommit = True
+                self._conn.cursor().execute(f"LISTEN {QUEUE_CHANNEL}")
+            if select.select([self._conn], [], [], timeout) != ([], [], []):
+                self._conn.poll()
+                self._conn.notifies.clear()
+        except Exception as e:
+            print(f"Job queue: listener error, polling instead: {e}")
+            self.close()
+            stopping.wait(timeout)
+
+    def close(self):
+        if self._raw is not None:
+            try:
+                self._raw.close()
+            except Exception:
+                pass
+        self._raw = self._conn = None
+
+
+class JobWorker:
+    """Claims jobs from the queue and runs them, at most `concurrency` at once.
+
+    Background renditions of the jobs it completes run on this process's
+    job_executor, as they do in the API process.
+    """
+
+    def __init__(self, queue: JobQueue = None, concurrency: int = JOB_WORKERS):
+        self.queue = queue or JobQueue()
+        self.concurrency = max(1, concurrency)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._stopping = threading.Event()
+        self._listener = QueueListener()
+
+    def stop(self):
+        self._stopping.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _every(self, interval: float, fn, name: str):
+        def loop():
+            while not self._stopping.wait(interval):
+                try:
+                    fn()
+                except Exception as e:
+                    print(f"Job worker: {name} failed: {e}")
+        threading.Thread(target=loop, name=name, daemon=True).start()
+
+    def run(self):
+        print(f"Job worker {self.queue.owner}: {self.concurrency} slot(s), backend {engine.dialect.name}")
+        self.queue.reap()
+        self._every(JOB_HEARTBEAT_INTERVAL, self.queue.heartbeat, "job-heartbeat")
+        self._every(JOB_REAPER_INTERVAL, self.queue.reap, "job-reaper")
+        while not self._stopping.is_set():
+            with self._cond:
+                free = self.concurrency - self._in_flight
+            claimed = self.queue.claim(free) if free > 0 else []
+            for job_uuid, prompt, waited in claimed:
+                with self._cond:
+                    self._in_flight += 1
+                threading.Thread(target=self._run_job, args=(job_uuid, prompt, waited),
+                                 name=f"job-{job_uuid[:8]}", daemon=True).start()
+            if claimed and len(claimed) == free:
+                # Full: wait for a slot, not for new work
+                with self._cond:
+                    while self._in_flight >= self.concurrency and not self._stopping.is_set():
+                        self._cond.wait()
+            elif not claimed:
+                self._listener.wait(JOB_POLL_INTERVAL, self._stopping)
+        self._drain()
+
+    def _run_job(self, job_uuid: str, prompt: str, waited: float):
+        from app.pipeline import process_job
+        record_stage("queue_wait", waited)
+        try:
+            process_job(job_uuid, prompt, queue_wait=waited)
+        finally:
+            self.queue.release(job_uuid)
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def _drain(self):
+        deadline = time.monotonic() + JOB_SHUTDOWN_TIMEOUT
+        with self._cond:
+            while self._in_flight and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            unfinished = self._in_flight
+        if unfinished:
+            print(f"Job worker: {unfinished} job(s) still running at shutdown; requeued "
+                  f"{self.queue.requeue_held()}")
+        self._listener.close()
+        print(f"Job worker {self.queue.owner} stopped: {self.queue.stats()}")
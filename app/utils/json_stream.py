@@ -0,0 +1,119 @@
+import re
+import json
+
+# Inside a string only quotes and backslashes matter
+STRING_SPECIAL = re.compile(r'["\\]')
+
+
+class JsonObjectStream:
+    """Reads the model's JSON answer as it streams in.
+
+    feed() takes text chunks and returns the names of the top-level string
+    fields that completed in them ("status" arrives within the first few
+    tokens, long before "code"). Anything before the opening brace, such as
+    a ```json fence, is skipped; closed turns True with the closing brace,
+    and nothing after it is read.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.closed = False
+        self._chunks = []
+        self._object = []  # text of the object, from its opening brace
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._raw = []  # current top-level string, still escaped
+        self._key = None
+        self._expect_key = True
+
+    def text(self):
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str):
+        self._chunks.append(chunk)
+        if self.closed or not chunk:
+            return []
+        completed = []
+        i = 0
+        n = len(chunk)
+        if not self._started:
+            i = chunk.find("{")
+            if i < 0:
+                return []
+            self._started = True
+        start = i
+        while i < n:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    if self._depth == 1:
+                        self._raw.append(chunk[i])
+                    i += 1
+                    continue
+                match = STRING_SPECIAL.search(chunk, i)
+                end = match.start() if match else n
+                if self._depth == 1:
+                    self._raw.append(chunk[i:end])
+                if not match:
+                    i = n
+                elif match.group() == "\\":
+                    if self._depth == 1:
+                        self._raw.append("\\")
+                    self._escape = True
+                    i = end + 1
+                else:
+                    self._in_string = False
+                    i = end + 1
+                    if self._depth == 1:
+                        name = self._end_string()
+                        if name:
+                            completed.append(name)
+                continue
+            char = chunk[i]
+            i += 1
+            if char == '"':
+                self._in_string = True
+                self._raw = []
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.closed = True
+                    break
+            elif self._depth == 1:
+                if char == ":":
+                    self._expect_key = False
+                elif char == ",":
+                    self._expect_key = True
+                    self._key = None
+        self._object.append(chunk[start:i])
+        return completed
+
+    def _end_string(self):
+        try:
+            value = json.loads('"' + "".join(self._raw) + '"')
+        except json.JSONDecodeError:
+            value = None
+        self._raw = []
+        if self._expect_key:
+            self._key = value
+            return None
+        if self._key is None:
+            return None
+        self.fields[self._key] = value
+        return self._key
+
+    def result(self):
+        """The answer as a dict: the whole object once closed, else the fields
+        read so far."""
+        if self.closed:
+            try:
+                parsed = json.loads("".join(self._object))
+                if isinstance(parsed, dict):
+                    return parsed
+            except json.JSONDecodeError:
+                pass
+        return dict(self.fields)
@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+
+from app.db.db import SessionFactory
+from app.db.models.llm_cache import LLMCacheEntry
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+# Accepted code is kept for a day; rejections are cheap to keep and are what
+# repeated abusive prompts hit, so they live longer
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_REJECTED_TTL = int(os.getenv("LLM_CACHE_REJECTED_TTL", "604800"))
+
+# Only definitive answers are cached; API errors must be retried
+CACHEABLE_STATUSES = {"accepted", "rejected"}
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str):
+    lowered = _PUNCTUATION.sub(" ", prompt.lower())
+    return _WHITESPACE.sub(" ", lowered).strip()
+
+
+def hash_text(text: str):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Two tier cache: an in-process LRU in front of the shared llm_cache table."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, response)
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def make_key(self, prompt: str, model: str, system_prompt_hash: str):
+        return hash_text("\0".join([normalize_prompt(prompt), model, system_prompt_hash]))
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _remember(self, key, expires_at, response):
+        with self._lock:
+            self._entries[key] = (expires_at, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str):
+        if not LLM_CACHE_ENABLED:
+            return None
+        now = datetime.utcnow()
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and cached[0] > now:
+                self._entries.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return dict(cached[1])
+            if cached:
+                del self._entries[key]
+
+        try:
+            with SessionFactory() as db:
+                entry = db.query(LLMCacheEntry).filter(LLMCacheEntry.cache_key == key).first()
+                if entry and entry.expires_at > now:
+                    response = json.loads(entry.response)
+                    self._remember(key, entry.expires_at, response)
+                    self._count("db_hits")
+                    return dict(response)
+        except (SQLAlchemyError, ValueError) as e:
+            # The cache must never fail a job
+            print(f"LLM cache lookup failed: {e}")
+            self._count("errors")
+
+        self._count("misses")
+        return None
+
+    def put(self, key: str, model: str, system_prompt_hash: str, response: dict):
+        status = response.get("status")
+        if not LLM_CACHE_ENABLED or status not in CACHEABLE_STATUSES:
+            return
+        # Unparseable model output also comes back as a rejection without a
+        # reason (or as accepted without code); don't pin that for a whole TTL
+        if not (response.get("reason") or response.get("code")):
+            return
+        ttl = LLM_CACHE_REJECTED_TTL if status == "rejected" else LLM_CACHE_TTL
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        self._remember(key, expires_at, dict(response))
+
+        try:
+            with SessionFactory() as db:
+                entry = db.query(LLMCacheEntry).filter(LLMCacheEntry.cache_key == key).first()
+                if not entry:
+                    entry = LLMCacheEntry(cache_key=key)
+                    db.add(entry)
+                entry.model = model
+                entry.system_prompt_hash = system_prompt_hash
+                entry.status = status
+                entry.response = json.dumps(response)
+                entry.created_at = datetime.utcnow()
+                entry.expires_at = expires_at
+                db.commit()
+            self._count("stores")
+        except IntegrityError:
+            # Another worker stored the same prompt first; its answer is as good as ours
+            pass
+        except SQLAlchemyError as e:
+            print(f"LLM cache store failed: {e}")
+            self._count("errors")
+
+    def invalidate_stale(self, system_prompt_hash: str):
+        """Drop everything produced under another system prompt, plus expired rows."""
+        with self._lock:
+            self._entries.clear()
+        try:
+            with SessionFactory() as db:
+                deleted = db.query(LLMCacheEntry).filter(
+                    (LLMCacheEntry.system_prompt_hash != system_prompt_hash) |
+                    (LLMCacheEntry.expires_at <= datetime.utcnow())
+                ).delete(synchronize_session=False)
+                db.commit()
+            return deleted
+        except SQLAlchemyError as e:
+            print(f"LLM cache invalidation failed: {e}")
+            return 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        with SessionFactory() as db:
+            db.query(LLMCacheEntry).delete(synchronize_session=False)
+            db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._entries)
+        hits = stats["memory_hits"] + stats["db_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        stats["enabled"] = LLM_CACHE_ENABLED
+        return stats
+
+
+llm_cache = LLMResponseCache(LLM_CACHE_MAX_ENTRIES)
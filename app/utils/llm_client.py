@@ -0,0 +1,338 @@
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+import openai
+from openai import OpenAI
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Any OpenAI-compatible endpoint, e.g. benchmarks/fake_openai_server.py
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+
+# Provider limits for our key; the limiter keeps us under them instead of
+# finding them with 429s
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "200000"))
+# Tokens charged up front for a call's output; corrected once usage is known
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "1500"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# Timeout of one HTTP attempt, and the budget for the whole call including
+# waiting for the limiter, retries and backoff
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "60"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "180"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+
+# Consecutive provider failures that open the breaker, and how long it stays open
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Failures worth another attempt. Everything else (bad request, auth, ...)
+# will fail the same way again.
+RETRYABLE_ERRORS = (openai.APITimeoutError, openai.APIConnectionError,
+                    openai.RateLimitError, openai.InternalServerError)
+
+
+class LLMUnavailable(Exception):
+    """The call was not made or gave up: breaker open or deadline exhausted."""
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, rate_per_minute: int):
+        self.capacity = max(1, rate_per_minute)
+        self.rate = self.capacity / 60.0
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float, deadline: float):
+        """Take amount units, waiting until deadline (monotonic). Returns seconds waited."""
+        amount = min(amount, self.capacity)
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return time.monotonic() - started
+                wait = (amount - self._tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                raise LLMUnavailable("Rate limit wait exceeds the call deadline")
+            time.sleep(wait)
+
+    def adjust(self, amount: float):
+        # Positive: charge more than was reserved; negative: refund
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures -> half_open after
+    `cooldown` seconds, where a single probe call decides whether to close again."""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """False if the call may not go ahead; "probe" for the half-open probe."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return "probe"
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def cancel_probe(self):
+        # The probe call never reached the provider; let the next call probe instead
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._fail()
+
+    def _fail(self):
+        self._failures += 1
+        if self.state == "half_open" or self._failures >= self.threshold:
+            if self.state != "open":
+                print(f"LLM circuit breaker opened after {self._failures} failures")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+    def end_probe(self, failed: bool):
+        # Settles a probe call that exited without deciding the breaker's state
+        # (429s until out of retries, deadline, unexpected errors)
+        with self._lock:
+            if self.state != "half_open" or not self._probing:
+                return
+            if failed:
+                self._fail()
+            else:
+                self._probing = False
+
+
+def retry_after_seconds(error):
+    """Delay the provider asked for on a 429/503, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def backoff_delay(attempt: int):
+    # Full jitter: spreads retries of many workers hit by the same outage
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+
+class LLMClient:
+    """Calls the OpenAI Responses API within rate limits, a concurrency cap and a deadline."""
+
+    def __init__(self):
+        self.requests = TokenBucket(LLM_RPM)
+        self.tokens = TokenBucket(LLM_TPM)
+        self.breaker = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN)
+        self._slots = threading.BoundedSemaphore(max(1, LLM_MAX_CONCURRENCY))
+        self._client = None
+        self._lock = threading.Lock()
+        self._counters = {
+            "calls": 0, "succeeded": 0, "failed": 0, "retries": 0,
+            "rate_limited": 0, "short_circuited": 0, "deadline_exceeded": 0, "stopped_early": 0,
+        }
+        self._throttle_seconds = 0.0
+
+    def _get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    # Retries and timeouts are handled here, not by the SDK
+                    self._client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL or None, max_retries=0)
+        return self._client
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def create_response(self, timeout: float = None, **kwargs):
+        """client.responses.create(**kwargs) with limits, retries and a circuit breaker.
+
+        timeout is the budget for the whole call (default LLM_DEADLINE). Raises
+        LLMUnavailable when the breaker is open or the deadline runs out,
+        and the last provider error when retries are exhausted.
+        """
+        def request(client):
+            response = client.responses.create(**kwargs)
+            return response, getattr(response, "usage", None)
+        return self._call(timeout, kwargs, request)
+
+    def stream_response(self, on_text, timeout: float = None, **kwargs):
+        """Like create_response, but streamed: on_text(delta) gets the output
+        text as it arrives and may return True to stop reading early (the
+        connection is closed). Returns the text read.
+
+        A call fails over to a retry only before any text was handed out;
+        after that the caller has acted on it, so errors are raised.
+        """
+        def request(client):
+            parts = []
+            usage = None
+            stream = client.responses.create(stream=True, **kwargs)
+            try:
+                for event in stream:
+                    if event.type == "response.output_text.delta":
+                        parts.append(event.delta)
+                        if on_text(event.delta):
+                            self._count("stopped_early")
+                            break
+                    elif event.type == "response.completed":
+                        usage = getattr(event.response, "usage", None)
+                    elif event.type in ("response.failed", "error"):
+                        # The provider gave up mid-answer; retried like a dropped connection
+                        raise openai.APIConnectionError(
+                            message=f"Stream failed: {getattr(event, 'message', event.type)}", request=None)
+            except RETRYABLE_ERRORS as e:
+                e.mid_stream = bool(parts)
+                raise
+            finally:
+                stream.close()
+            return "".join(parts), usage
+        return self._call(timeout, kwargs, request)
+
+    def _call(self, timeout: float, kwargs: dict, request):
+        self._count("calls")
+        deadline = time.monotonic() + (timeout or LLM_DEADLINE)
+        allowed = self.breaker.allow()
+        if not allowed:
+            self._count("short_circuited")
+            raise LLMUnavailable("LLM provider unavailable (circuit open)")
+
+        failed = False
+        try:
+            return self._call_with_retries(deadline, kwargs, request)
+        except LLMUnavailable:
+            raise
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            if allowed == "probe":
+                self.breaker.end_probe(failed)
+
+    def _call_with_retries(self, deadline: float, kwargs: dict, request):
+        reserved = (len(kwargs.get("instructions") or "") + len(str(kwargs.get("input") or ""))) // 4 \
+            + LLM_EXPECTED_OUTPUT_TOKENS
+        attempt = 0
+        while True:
+            try:
+                response, usage = self._attempt(deadline, reserved, request)
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, openai.RateLimitError):
+                    # Our limiter was too optimistic; that's not a provider outage
+                    self._count("rate_limited")
+                else:
+                    self.breaker.record_failure()
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                attempt += 1
+                if attempt > LLM_MAX_RETRIES or time.monotonic() + delay >= deadline or \
+                        getattr(e, "mid_stream", False) or \
+                        (self.breaker.state == "open" and not isinstance(e, openai.RateLimitError)):
+                    self._count("failed")
+                    raise
+                print(f"LLM call failed ({type(e).__name__}), retry {attempt} in {delay:.1f}s")
+                self._count("retries")
+                time.sleep(delay)
+                continue
+            except LLMUnavailable:
+                # Gave up before reaching the provider; says nothing about its health
+                self.breaker.cancel_probe()
+                self._count("deadline_exceeded")
+                self._count("failed")
+                raise
+            except openai.APIStatusError:
+                # Our request was bad (4xx); the provider itself is fine
+                self.breaker.record_success()
+                self._count("failed")
+                raise
+
+            self.breaker.record_success()
+            self._count("succeeded")
+            if usage is not None and getattr(usage, "total_tokens", None):
+                self.tokens.adjust(usage.total_tokens - reserved)
+            return response
+
+    def _attempt(self, deadline: float, reserved: int, request):
+        waited = self.requests.acquire(1, deadline)
+        waited += self.tokens.acquire(reserved, deadline)
+
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=max(0.0, deadline - started)):
+            raise LLMUnavailable("Timed out waiting for an LLM slot")
+        waited += time.monotonic() - started
+        with self._lock:
+            self._throttle_seconds += waited
+        try:
+            timeout = min(LLM_ATTEMPT_TIMEOUT, deadline - time.monotonic())
+            if timeout <= 0:
+                raise LLMUnavailable("LLM call deadline exceeded")
+            return request(self._get_client().with_options(timeout=timeout))
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["throttle_seconds"] = round(self._throttle_seconds, 3)
+        stats["breaker_state"] = self.breaker.state
+        stats["breaker_open"] = 1 if self.breaker.state == "open" else 0
+        return stats
+
+
+llm_client = LLMClient()
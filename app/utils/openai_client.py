@@ -1,16 +1,23 @@
 import os
 import re
 import json
-from openai import OpenAI
 from dotenv import load_dotenv
 
+from app.utils.llm_cache import llm_cache, hash_text
+from app.utils.llm_client import llm_client
+from app.utils.json_stream import JsonObjectStream
+
 load_dotenv()
 
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY environment variable not set.")
+# Not fatal at import: the app (and the benchmarks, which swap the LLM for a
+# stand-in) can start without a key; calls fail until one is set
+if not os.getenv("OPENAI_API_KEY"):
+    print("OPENAI_API_KEY is not set; LLM calls will fail")
 
-client = OpenAI(api_key=api_key)
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-mini-2025-04-14")
+# Stream answers: the status is known from the first tokens, and the call
+# returns as soon as the JSON object closes
+LLM_STREAMING = os.getenv("LLM_STREAMING", "1") == "1"
 
 SYSTEM_PROMPT = """
 You are a highly secure AI assistant specialized in generating mathematical animation code using the Manim library (Manim Community version). Your primary responsibility is to protect the system from malicious or unsafe code and content.
@@ -115,6 +122,15 @@ Remember, you are only one layer of security. Always prioritize safety and rejec
 
 """
 
+# Part of every LLM cache key: editing the prompt above invalidates old answers
+SYSTEM_PROMPT_HASH = hash_text(SYSTEM_PROMPT)
+
+def invalidate_stale_llm_cache():
+    deleted = llm_cache.invalidate_stale(SYSTEM_PROMPT_HASH)
+    if deleted:
+        print(f"LLM cache: removed {deleted} stale entries")
+    return deleted
+
 def extract_json_from_string(text):
     # Look for a JSON code block
     match = re.search(r'```json\n(.*?)```', text, re.DOTALL)
@@ -132,17 +148,82 @@ def extract_json_from_string(text):
         # Return an empty dictionary or raise an error if parsing fails
         return {} # Or raise the error: raise
 
-def get_manim_code(user_prompt: str):
+def cached_manim_code(user_prompt: str):
+    cache_key = llm_cache.make_key(user_prompt, OPENAI_MODEL, SYSTEM_PROMPT_HASH)
+    return llm_cache.get(cache_key)
+
+def get_manim_code(user_prompt: str, on_status=None):
+    """on_status(status) is called once the answer's status is known, while
+    the code is still being generated (streaming only; not on cache hits)."""
+    cache_key = llm_cache.make_key(user_prompt, OPENAI_MODEL, SYSTEM_PROMPT_HASH)
+    cached = llm_cache.get(cache_key)
+    if cached:
+        print("LLM cache hit")
+        return cached
+
+    result = request_manim_code(user_prompt, on_status=on_status)
+    llm_cache.put(cache_key, OPENAI_MODEL, SYSTEM_PROMPT_HASH, result)
+    return result
+
+REPAIR_PROMPT = """The Manim code below was generated for the request that follows it, but a static check against manim {version} found names or attributes that do not exist. Fix only those problems, keep the animation the same, and answer in the same JSON format as before.
+
+# Request
+{prompt}
+
+# Code
+{code}
+
+# Problems
+{diagnostics}
+"""
+
+def remember_manim_code(user_prompt: str, result: dict):
+    # Replace the cached answer for the prompt, e.g. with code that was repaired
+    cache_key = llm_cache.make_key(user_prompt, OPENAI_MODEL, SYSTEM_PROMPT_HASH)
+    llm_cache.put(cache_key, OPENAI_MODEL, SYSTEM_PROMPT_HASH, result)
+
+def repair_manim_code(user_prompt: str, code: str, diagnostics: str, manim_version: str):
+    # Not cached: the answer depends on the broken code, not just the prompt
+    repair_input = REPAIR_PROMPT.format(version=manim_version, prompt=user_prompt, code=code,
+                                        diagnostics=diagnostics)
+    return request_manim_code(repair_input, temperature=0.2)
+
+def stream_manim_code(request: dict, on_status=None, cancel=None):
+    reader = JsonObjectStream()
+
+    def on_text(delta):
+        for field in reader.feed(delta):
+            if field == "status" and on_status:
+                on_status(reader.fields["status"])
+        if cancel is not None and cancel.is_set():
+            return True
+        # Stop at the closing brace, or at a rejection once its reason is in
+        return reader.closed or (reader.fields.get("status") == "rejected" and "reason" in reader.fields)
+
+    content = llm_client.stream_response(on_text, **request)
+    if reader.closed or reader.fields.get("status") == "rejected":
+        return content, reader.result()
+    # Cut off mid-answer, or not the JSON we asked for
+    return content, extract_json_from_string(content)
+
+def request_manim_code(user_prompt: str, temperature: float = 0.9, on_status=None, cancel=None):
+    """Setting the cancel event stops a streamed answer early; what was read
+    by then is returned, so the caller should ignore the result."""
     try:
-        response = client.responses.create(
+        # Rate limits, deadlines, retries and the circuit breaker live in llm_client
+        request = dict(
             instructions=SYSTEM_PROMPT,
-            model="gpt-4.1-mini-2025-04-14",
+            model=OPENAI_MODEL,
             input=user_prompt,
-            temperature=0.9
+            temperature=temperature
         )
-        if response:
-            content = response.output[0].content[0].text
-            parsed = extract_json_from_string(content)
+        if LLM_STREAMING:
+            content, parsed = stream_manim_code(request, on_status, cancel)
+        else:
+            response = llm_client.create_response(**request)
+            content = response.output[0].content[0].text if response else None
+            parsed = extract_json_from_string(content) if content else {}
+        if content:
             if parsed.get("status") == "accepted":
                 return parsed
             else:
@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from app.utils.s3_handler import generate_presigned_url, S3_PRESIGN_EXPIRES
+
+# Cached URLs are handed out until this many seconds before they expire, so a
+# client always gets at least that long to start the download
+PRESIGN_SAFETY_MARGIN = int(os.getenv("PRESIGN_SAFETY_MARGIN", "300"))
+PRESIGN_CACHE_MAX_ENTRIES = int(os.getenv("PRESIGN_CACHE_MAX_ENTRIES", "10000"))
+# While a video's higher-quality rendition is still on its way, another
+# process may finish it and invalidate only its own cache; this process then
+# reuses the old "best" URL for at most this many seconds
+PRESIGN_PENDING_TTL = int(os.getenv("PRESIGN_PENDING_TTL", "30"))
+
+
+class PresignedUrlCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # video_id -> (reuse_until, url)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._sign_count = 0
+        self._sign_seconds = 0.0
+        self._sign_max = 0.0
+
+    def get(self, video_id):
+        """Cached URL for video_id, or None when it must be (re)signed."""
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(video_id)
+            if cached and cached[0] > now:
+                self._entries.move_to_end(video_id)
+                self._hits += 1
+                return cached[1]
+            if cached:
+                del self._entries[video_id]
+            self._misses += 1
+        return None
+
+    def sign(self, video_id, video_url: str, final: bool = True):
+        """Sign video_url and cache it. Returns the URL, or raises on failure.
+        final=False caches it for PRESIGN_PENDING_TTL at most."""
+        started = time.perf_counter()
+        signed_at = time.time()
+        result = generate_presigned_url(video_url)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self._sign_count += 1
+            self._sign_seconds += elapsed
+            self._sign_max = max(self._sign_max, elapsed)
+
+        if not isinstance(result, dict) or "url" not in result:
+            error = result[0]["error"] if isinstance(result, tuple) else result.get("error")
+            raise RuntimeError(error or "Could not sign URL")
+
+        reuse_until = signed_at + S3_PRESIGN_EXPIRES - PRESIGN_SAFETY_MARGIN
+        if not final:
+            reuse_until = min(reuse_until, signed_at + PRESIGN_PENDING_TTL)
+        if reuse_until > signed_at:
+            with self._lock:
+                self._entries[video_id] = (reuse_until, result["url"])
+                self._entries.move_to_end(video_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result["url"]
+
+    def invalidate(self, video_id):
+        with self._lock:
+            self._entries.pop(video_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "signed": self._sign_count,
+                "avg_sign_ms": round(self._sign_seconds / self._sign_count * 1000, 3) if self._sign_count else 0.0,
+                "max_sign_ms": round(self._sign_max * 1000, 3),
+            }
+
+
+presign_cache = PresignedUrlCache(PRESIGN_CACHE_MAX_ENTRIES)
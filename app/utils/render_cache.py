@@ -0,0 +1,121 @@
+import os
+import ast
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+
+from app.db.models.render_cache import RenderCacheEntry
+
+RENDER_CACHE_ENABLED = os.getenv("RENDER_CACHE_ENABLED", "1") == "1"
+# Must be shorter than the S3 lifecycle expiration on the videos/ prefix:
+# entries are aged from when the object was uploaded, never from the last hit,
+# so the cache can't point at an object the bucket has already deleted
+RENDER_CACHE_TTL_DAYS = int(os.getenv("RENDER_CACHE_TTL_DAYS", "30"))
+RENDER_CACHE_EVICT_INTERVAL = int(os.getenv("RENDER_CACHE_EVICT_INTERVAL", "3600"))
+
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0}
+_last_eviction = None
+
+
+def strip_docstrings(tree):
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                    and isinstance(body[0].value.value, str):
+                # Keep the body non-empty so the dump stays a valid tree
+                node.body = body[1:] or [ast.Pass()]
+    return tree
+
+
+def normalize_code(code: str):
+    # ast.dump leaves out line/column info, so whitespace, comments and
+    # formatting never reach the hash; docstrings are dropped explicitly
+    tree = strip_docstrings(ast.parse(code))
+    return ast.dump(tree, annotate_fields=False)
+
+
+def render_cache_key(code: str, render_flags):
+    flags = " ".join(render_flags)
+    digest = hashlib.sha256()
+    digest.update(normalize_code(code).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(flags.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _count(name, n=1):
+    with _lock:
+        _counters[name] += n
+
+
+def _expiry_cutoff():
+    return datetime.utcnow() - timedelta(days=RENDER_CACHE_TTL_DAYS)
+
+
+def lookup_render(db, cache_key: str):
+    """Return the cached Video for cache_key, or None on a miss."""
+    if not RENDER_CACHE_ENABLED:
+        return None
+
+    entry = db.query(RenderCacheEntry).filter(RenderCacheEntry.cache_key == cache_key).first()
+    if entry and entry.created_at < _expiry_cutoff():
+        db.delete(entry)
+        db.commit()
+        _count("evicted")
+        entry = None
+
+    if not entry or not entry.video:
+        _count("misses")
+        evict_expired(db)
+        return None
+
+    entry.hits += 1
+    entry.last_hit_at = datetime.utcnow()
+    db.commit()
+    _count("hits")
+    return entry.video
+
+
+def store_render(db, cache_key: str, render_flags, video):
+    if not RENDER_CACHE_ENABLED:
+        return
+    try:
+        db.add(RenderCacheEntry(
+            cache_key=cache_key,
+            render_flags=" ".join(render_flags),
+            video_id=video.id
+        ))
+        db.commit()
+        _count("stores")
+    except IntegrityError:
+        # Another job rendered the same code concurrently and stored it first
+        db.rollback()
+
+
+def evict_expired(db, force: bool = False):
+    # Throttled so a stream of misses doesn't turn into a stream of deletes
+    global _last_eviction
+    now = datetime.utcnow()
+    with _lock:
+        if not force and _last_eviction and (now - _last_eviction).total_seconds() < RENDER_CACHE_EVICT_INTERVAL:
+            return 0
+        _last_eviction = now
+
+    deleted = db.query(RenderCacheEntry) \
+        .filter(RenderCacheEntry.created_at < _expiry_cutoff()) \
+        .delete(synchronize_session=False)
+    db.commit()
+    _count("evicted", deleted)
+    return deleted
+
+
+def render_cache_stats():
+    with _lock:
+        stats = dict(_counters)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    stats["enabled"] = RENDER_CACHE_ENABLED
+    return stats
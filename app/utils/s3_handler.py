@@ -1,6 +1,11 @@
 import boto3
 import os
-from botocore.exceptions import BotoCoreError, NoCredentialsError
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError, NoCredentialsError
 from uuid import uuid4
 
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
@@ -9,70 +14,230 @@ AWS_BUCKET_NAME = os.getenv("AWS_BUCKET_NAME")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # Optional for MinIO
 
+# Connection pool shared by every thread of the process
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "5"))
+# Multipart settings; S3 requires every part but the last to be at least 5 MiB
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+S3_MULTIPART_CHUNKSIZE = max(5 * 1024 * 1024, int(os.getenv("S3_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024))))
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "8"))
+S3_PRESIGN_EXPIRES = int(os.getenv("S3_PRESIGN_EXPIRES", "3600"))
 
-# Validation
-missing_vars = []
-if not AWS_ACCESS_KEY_ID:
-    missing_vars.append("AWS_ACCESS_KEY_ID")
-if not AWS_SECRET_ACCESS_KEY:
-    missing_vars.append("AWS_SECRET_ACCESS_KEY")
-if not AWS_BUCKET_NAME:
-    missing_vars.append("AWS_BUCKET_NAME")
-if not AWS_REGION:
-    missing_vars.append("AWS_REGION")
 
-if missing_vars:
-    raise EnvironmentError(f"Missing required AWS environment variables: {', '.join(missing_vars)}")
+def missing_settings():
+    required = {
+        "AWS_ACCESS_KEY_ID": AWS_ACCESS_KEY_ID,
+        "AWS_SECRET_ACCESS_KEY": AWS_SECRET_ACCESS_KEY,
+        "AWS_BUCKET_NAME": AWS_BUCKET_NAME,
+        "AWS_REGION": AWS_REGION,
+    }
+    return [name for name, value in required.items() if not value]
+
+
+# Checked on first use rather than at import, so the app (and the benchmarks,
+# which swap S3 for a stand-in) can start without credentials
+if missing_settings():
+    print(f"S3 uploads will fail until these are set: {', '.join(missing_settings())}")
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=S3_MULTIPART_THRESHOLD,
+    multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+    max_concurrency=S3_MAX_CONCURRENCY,
+    use_threads=True
+)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    # boto3 clients are thread safe; building one resolves credentials and the
+    # endpoint, so do it once per process and share its connection pool
+    global _client
+    if _client is None:
+        missing = missing_settings()
+        if missing:
+            raise EnvironmentError(f"Missing required AWS environment variables: {', '.join(missing)}")
+        with _client_lock:
+            if _client is None:
+                s3_config = {
+                    "region_name": AWS_REGION,
+                    "aws_access_key_id": AWS_ACCESS_KEY_ID,
+                    "aws_secret_access_key": AWS_SECRET_ACCESS_KEY,
+                    "config": Config(
+                        max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                        retries={"max_attempts": S3_MAX_ATTEMPTS, "mode": "standard"},
+                        tcp_keepalive=True
+                    )
+                }
+                if S3_ENDPOINT_URL:
+                    s3_config["endpoint_url"] = S3_ENDPOINT_URL
+                _client = boto3.client("s3", **s3_config)
+    return _client
+
+
+def s3_url_for(object_name: str):
+    if S3_ENDPOINT_URL:
+        return f"{S3_ENDPOINT_URL}/{AWS_BUCKET_NAME}/{object_name}"
+    return f"https://{AWS_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{object_name}"
+
 
 def upload_file_to_s3(file_path, object_name=None):
     if not object_name:
         object_name = f"videos/{uuid4()}.mp4"
 
-    s3_config = {
-        "region_name": AWS_REGION,
-        "aws_access_key_id": AWS_ACCESS_KEY_ID,
-        "aws_secret_access_key": AWS_SECRET_ACCESS_KEY
-    }
+    try:
+        # Files above S3_MULTIPART_THRESHOLD go up as parallel multipart uploads
+        get_s3_client().upload_file(
+            file_path, AWS_BUCKET_NAME, object_name,
+            ExtraArgs={"ContentType": "video/mp4"},
+            Config=TRANSFER_CONFIG
+        )
+        return {"status": "success", "url": s3_url_for(object_name)}
+    except (BotoCoreError, ClientError, NoCredentialsError, S3UploadFailedError, EnvironmentError) as e:
+        return {"status": "error", "message": str(e)}
 
-    if S3_ENDPOINT_URL:
-        s3_config["endpoint_url"] = S3_ENDPOINT_URL
 
-    s3 = boto3.client("s3", **s3_config)
+def upload_fileobj_to_s3(fileobj, object_name=None):
+    """Upload from any readable binary file object (pipe, socket, open file)."""
+    if not object_name:
+        object_name = f"videos/{uuid4()}.mp4"
 
     try:
-        s3.upload_file(file_path, AWS_BUCKET_NAME, object_name, ExtraArgs={"ContentType": "video/mp4"})
-        if S3_ENDPOINT_URL:
-            s3_url = f"{S3_ENDPOINT_URL}/{AWS_BUCKET_NAME}/{object_name}"
-        else:
-            s3_url = f"https://{AWS_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{object_name}"
+        get_s3_client().upload_fileobj(
+            fileobj, AWS_BUCKET_NAME, object_name,
+            ExtraArgs={"ContentType": "video/mp4"},
+            Config=TRANSFER_CONFIG
+        )
+        return {"status": "success", "url": s3_url_for(object_name)}
+    except (BotoCoreError, ClientError, NoCredentialsError, S3UploadFailedError, EnvironmentError) as e:
+        return {"status": "error", "message": str(e)}
+
+
+class StreamingUpload:
+    """Push bytes to S3 as they are produced.
+
+    Data is cut into S3_MULTIPART_CHUNKSIZE parts that are uploaded in the
+    background, at most S3_MAX_CONCURRENCY at a time, so memory stays bounded
+    at roughly (concurrency + 1) * chunk size. Uploads that never fill a
+    single part are sent with one put_object on close().
+    """
+
+    def __init__(self, object_name=None, content_type="video/mp4"):
+        self.object_name = object_name or f"videos/{uuid4()}.mp4"
+        self.content_type = content_type
+        self._client = get_s3_client()
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._futures = []
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(S3_MAX_CONCURRENCY)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.abort()
+            return False
+        self.close()
+        return False
+
+    def write(self, data: bytes):
+        self._buffer.extend(data)
+        while len(self._buffer) >= S3_MULTIPART_CHUNKSIZE:
+            part = bytes(self._buffer[:S3_MULTIPART_CHUNKSIZE])
+            del self._buffer[:S3_MULTIPART_CHUNKSIZE]
+            self._submit_part(part)
+        return len(data)
+
+    def _submit_part(self, data: bytes):
+        if self._upload_id is None:
+            response = self._client.create_multipart_upload(
+                Bucket=AWS_BUCKET_NAME, Key=self.object_name, ContentType=self.content_type
+            )
+            self._upload_id = response["UploadId"]
+            self._pool = ThreadPoolExecutor(max_workers=S3_MAX_CONCURRENCY)
 
-        return {"status": "success", "url": s3_url}
-    except (BotoCoreError, NoCredentialsError) as e:
+        part_number = len(self._futures) + 1
+        # Blocks the producer when all part slots are busy (backpressure)
+        self._slots.acquire()
+        future = self._pool.submit(self._upload_part, part_number, data)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upload_part(self, part_number, data):
+        response = self._client.upload_part(
+            Bucket=AWS_BUCKET_NAME, Key=self.object_name,
+            UploadId=self._upload_id, PartNumber=part_number, Body=data
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def close(self):
+        if self._upload_id is None:
+            self._client.put_object(
+                Bucket=AWS_BUCKET_NAME, Key=self.object_name,
+                Body=bytes(self._buffer), ContentType=self.content_type
+            )
+            return s3_url_for(self.object_name)
+
+        if self._buffer:
+            self._submit_part(bytes(self._buffer))
+            self._buffer.clear()
+        try:
+            parts = [future.result() for future in self._futures]
+            self._client.complete_multipart_upload(
+                Bucket=AWS_BUCKET_NAME, Key=self.object_name,
+                UploadId=self._upload_id, MultipartUpload={"Parts": parts}
+            )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._pool.shutdown(wait=False)
+        return s3_url_for(self.object_name)
+
+    def abort(self):
+        if self._upload_id is None:
+            return
+        for future in self._futures:
+            future.cancel()
+        try:
+            self._client.abort_multipart_upload(
+                Bucket=AWS_BUCKET_NAME, Key=self.object_name, UploadId=self._upload_id
+            )
+        except (BotoCoreError, ClientError) as e:
+            print(f"S3 abort failed for {self.object_name}: {e}")
+        self._pool.shutdown(wait=False)
+        self._upload_id = None
+
+
+def upload_stream_to_s3(chunks, object_name=None):
+    """Upload an iterable of byte chunks without staging it on disk."""
+    upload = StreamingUpload(object_name)
+    try:
+        for chunk in chunks:
+            upload.write(chunk)
+        return {"status": "success", "url": upload.close()}
+    except (BotoCoreError, ClientError, NoCredentialsError, S3UploadFailedError) as e:
+        upload.abort()
         return {"status": "error", "message": str(e)}
 
 
 
 def generate_presigned_url(video_url: str):
     try:
-        s3_config = {
-        "region_name": AWS_REGION,
-        "aws_access_key_id": AWS_ACCESS_KEY_ID,
-        "aws_secret_access_key": AWS_SECRET_ACCESS_KEY
-        }
         if S3_ENDPOINT_URL:
-            s3_config["endpoint_url"] = S3_ENDPOINT_URL
             s3_key = video_url.split(f"{AWS_BUCKET_NAME}/")[1]
         else:
             s3_key = "/".join(video_url.split("/")[3:])
 
-        s3 = boto3.client("s3", **s3_config)
-
-        url = s3.generate_presigned_url(
+        url = get_s3_client().generate_presigned_url(
             'get_object',
             Params={'Bucket': AWS_BUCKET_NAME, 'Key': s3_key},
-            ExpiresIn=3600  # URL expires in 1 hour
+            ExpiresIn=S3_PRESIGN_EXPIRES  # URL expires in 1 hour by default
         )
         return {'url': url}
     except Exception as e:
         print(e)
-        return {'error': str(e)}, 500
\ No newline at end of file
+        return {'error': str(e)}, 500
@@ -0,0 +1,85 @@
+import os
+import threading
+
+# Candidate programs generated per job; the first to render wins. 1 turns
+# speculation off
+SPECULATIVE_K = int(os.getenv("SPECULATIVE_K", "1"))
+# Candidates of one job rendering at once; the rest wait for one to fail
+SPECULATIVE_RACE = int(os.getenv("SPECULATIVE_RACE", "2"))
+# Extra candidates (beyond each job's first) in flight across the process;
+# a job takes what is left and runs with fewer candidates, or just one
+SPECULATIVE_BUDGET = int(os.getenv("SPECULATIVE_BUDGET", "4"))
+# Kill the losing renders once one candidate has won; 0 lets them finish
+SPECULATIVE_CANCEL = os.getenv("SPECULATIVE_CANCEL", "1") == "1"
+
+
+class SpeculationBudget:
+    """Extra candidates in flight, capped at SPECULATIVE_BUDGET.
+
+    take() never waits: hedging only uses spare capacity, so under load jobs
+    fall back to a single candidate instead of queueing for extras.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "jobs": 0,  # jobs that ran with extra candidates
+            "budget_limited": 0,  # jobs that got fewer extras than they asked for
+            "candidates": 0,  # LLM answers requested
+            "accepted": 0,
+            "rejected": 0,  # candidates that refused the prompt; the job is rejected only if all do
+            "duplicates": 0,  # same code as an earlier candidate of the job
+            "failed_checks": 0,  # dropped by the sanitizer or the symbol check
+            "renders": 0,
+            "renders_failed": 0,
+            "renders_cancelled": 0,
+            "renders_lost": 0,  # losers that rendered fine after the winner; their video is dropped
+            "won_by_first": 0,  # the first render started won
+            "won_by_hedge": 0,  # a later render won
+            "rescued": 0,  # won by a hedge after the first render failed
+            "winner_render_seconds": 0.0,
+            "wasted_render_seconds": 0.0,  # sandbox time of renders that didn't win
+        }
+
+    def take(self, wanted: int):
+        """Grant up to wanted extra candidates; give() them back when done."""
+        if wanted <= 0:
+            return 0
+        with self._lock:
+            granted = max(0, min(wanted, self.limit - self.in_use))
+            self.in_use += granted
+            if granted:
+                self._counters["jobs"] += 1
+                if granted < wanted:
+                    self._counters["budget_limited"] += 1
+        return granted
+
+    def give(self, extra: int):
+        with self._lock:
+            self.in_use -= extra
+
+    def count(self, name: str, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, budget=self.limit, in_flight=self.in_use)
+        spent = stats["winner_render_seconds"] + stats["wasted_render_seconds"]
+        stats["winner_render_seconds"] = round(stats["winner_render_seconds"], 3)
+        stats["wasted_render_seconds"] = round(stats["wasted_render_seconds"], 3)
+        # Share of render time spent on candidates that lost
+        stats["wasted_render_share"] = round(stats["wasted_render_seconds"] / spent, 4) if spent else 0.0
+        return stats
+
+
+speculation = SpeculationBudget(SPECULATIVE_BUDGET)
+
+
+def extra_candidates():
+    """Extra candidates a new job may generate, taken from the budget."""
+    if SPECULATIVE_K <= 1:
+        return 0
+    return speculation.take(SPECULATIVE_K - 1)
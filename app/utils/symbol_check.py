@@ -0,0 +1,310 @@
+import os
+import ast
+import json
+import difflib
+import builtins
+import threading
+
+# Index of the manim API the sandbox image runs, built by build_symbol_index.py
+SYMBOL_INDEX_PATH = (os.getenv("SYMBOL_INDEX_PATH")
+                     or os.path.join(os.path.dirname(os.path.abspath(__file__)), "manim_symbols.json"))
+# Set to 0 to skip the pre-flight check and let the sandbox find bad symbols
+SYMBOL_CHECK_ENABLED = os.getenv("SYMBOL_CHECK_ENABLED", "1") == "1"
+
+BUILTIN_NAMES = set(dir(builtins))
+
+
+class SymbolIndex:
+    """Exported names and class members of one manim version."""
+
+    def __init__(self, data: dict):
+        self.version = data.get("manim_version", "unknown")
+        self.names = data["names"]
+        self.classes = data["classes"]
+        self.submodules = set(data.get("submodules", ()))
+        self._members = {}
+
+    def class_key(self, name: str):
+        """Class key for an exported name, or None if it isn't a class."""
+        key = self.names.get(name)
+        return key if key in self.classes else None
+
+    def members(self, key: str):
+        """(member names, dynamic prefixes, open) over the class and its bases."""
+        if key not in self._members:
+            entry = self.classes[key]
+            members = set(entry["members"])
+            prefixes = set(entry.get("getattr", ()))
+            is_open = bool(entry.get("open"))
+            for base in entry["bases"]:
+                base_members, base_prefixes, base_open = self.members(base)
+                members |= base_members
+                prefixes |= set(base_prefixes)
+                is_open = is_open or base_open
+            self._members[key] = (frozenset(members), tuple(sorted(prefixes)), is_open)
+        return self._members[key]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def load_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                with open(SYMBOL_INDEX_PATH, encoding="utf-8") as f:
+                    _index = SymbolIndex(json.load(f))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Symbol check disabled: could not load {SYMBOL_INDEX_PATH}: {e}")
+                _index = False
+        return _index or None
+
+
+def suggestion(name: str, candidates):
+    close = difflib.get_close_matches(name, candidates, n=1, cutoff=0.75)
+    return f" (did you mean '{close[0]}'?)" if close else ""
+
+
+class ScriptClass:
+    """A class defined in the checked script."""
+
+    def __init__(self, node):
+        self.node = node
+        self.members = set()
+        for item in node.body:
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                self.members.add(item.name)
+            elif isinstance(item, (ast.Assign, ast.AnnAssign)):
+                for target in (item.targets if isinstance(item, ast.Assign) else [item.target]):
+                    if isinstance(target, ast.Name):
+                        self.members.add(target.id)
+        for sub in ast.walk(node):
+            if (isinstance(sub, ast.Attribute) and isinstance(sub.ctx, ast.Store)
+                    and isinstance(sub.value, ast.Name) and sub.value.id == "self"):
+                self.members.add(sub.attr)
+
+
+class SymbolChecker(ast.NodeVisitor):
+    """Resolves the names and attribute accesses of a script against the index.
+
+    Only flags what it can be sure of: names bound nowhere in the script,
+    builtins or manim, and attributes of values whose class is known (a
+    variable only ever assigned `SomeClass(...)`, `self` in a script class,
+    or `x.animate.<method>`). Anything it can't type is left to the sandbox.
+    """
+
+    def __init__(self, index: SymbolIndex, tree):
+        self.index = index
+        self.problems = []
+        self.script_classes = {n.name: ScriptClass(n) for n in ast.walk(tree) if isinstance(n, ast.ClassDef)}
+        self.bound = set()
+        self.bindings = {}        # name -> list of bound values (None when not a plain assignment)
+        self.stored_attrs = set()  # (name, attr) the script assigns itself
+        self.manim_star = False
+        self.other_star = False
+        self._class_stack = []
+        self._collect(tree)
+        self.types = self._infer_types()
+
+    # Pass 1: what the script binds
+
+    def _bind(self, name, value=None):
+        self.bound.add(name)
+        self.bindings.setdefault(name, []).append(value)
+
+    def _bind_target(self, target, value=None):
+        if isinstance(target, ast.Name):
+            self._bind(target.id, value)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for elt in target.elts:
+                self._bind_target(elt)
+        elif isinstance(target, ast.Starred):
+            self._bind_target(target.value)
+        elif isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name):
+            self.stored_attrs.add((target.value.id, target.attr))
+
+    def _collect(self, tree):
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign):
+                for target in node.targets:
+                    self._bind_target(target, node.value if isinstance(target, ast.Name) else None)
+            elif isinstance(node, (ast.AnnAssign, ast.AugAssign)):
+                self._bind_target(node.target)
+            elif isinstance(node, (ast.For, ast.AsyncFor, ast.comprehension)):
+                self._bind_target(node.target)
+            elif isinstance(node, ast.withitem) and node.optional_vars is not None:
+                self._bind_target(node.optional_vars)
+            elif isinstance(node, ast.NamedExpr):
+                self._bind_target(node.target)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                self._bind(node.name)
+            elif isinstance(node, ast.arg):
+                self._bind(node.arg)
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                self._bind(node.name)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                for name in node.names:
+                    self._bind(name)
+            elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+                self._bind(node.name)
+            elif isinstance(node, ast.MatchMapping) and node.rest:
+                self._bind(node.rest)
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    self._bind(alias.asname or alias.name.split(".")[0])
+            elif isinstance(node, ast.ImportFrom):
+                for alias in node.names:
+                    if alias.name != "*":
+                        self._bind(alias.asname or alias.name)
+                    elif node.module == "manim" and not node.level:
+                        self.manim_star = True
+                    else:
+                        self.other_star = True
+            elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                  and node.func.attr == "set" and isinstance(node.func.value, ast.Name)):
+                # Mobject.set(name=value) creates attributes
+                for keyword in node.keywords:
+                    if keyword.arg:
+                        self.stored_attrs.add((node.func.value.id, keyword.arg))
+
+    def _class_of_call(self, node):
+        """Class of SomeClass(...) when SomeClass is a manim or script class."""
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)):
+            return None
+        name = node.func.id
+        if name in self.script_classes:
+            return ("script", name)
+        if name not in self.bound and self.manim_star:
+            key = self.index.class_key(name)
+            if key:
+                return ("manim", key)
+        return None
+
+    def _infer_types(self):
+        types = {}
+        for name, values in self.bindings.items():
+            classes = {self._class_of_call(v) if v is not None else None for v in values}
+            if len(classes) == 1 and None not in classes:
+                types[name] = classes.pop()
+        return types
+
+    # Class members
+
+    def _members(self, cls):
+        """(members, prefixes, open) for a ("manim", key) or ("script", name) class."""
+        kind, key = cls
+        if kind == "manim":
+            return self.index.members(key)
+        script_class = self.script_classes[key]
+        members = set(script_class.members)
+        prefixes = set()
+        is_open = False
+        for base in script_class.node.bases:
+            base_cls = None
+            if isinstance(base, ast.Name):
+                if base.id in self.script_classes and base.id != key:
+                    base_cls = ("script", base.id)
+                elif base.id not in self.bound and self.manim_star and self.index.class_key(base.id):
+                    base_cls = ("manim", self.index.class_key(base.id))
+            if base_cls is None:
+                return members, (), True
+            base_members, base_prefixes, base_open = self._members(base_cls)
+            members |= base_members
+            prefixes |= set(base_prefixes)
+            is_open = is_open or base_open
+        return members, tuple(prefixes), is_open
+
+    def _class_name(self, cls):
+        return cls[1].split("@")[0]
+
+    # Pass 2: check loads
+
+    def _report(self, node, message):
+        self.problems.append({"line": getattr(node, "lineno", None), "col": getattr(node, "col_offset", None),
+                              "message": message})
+
+    def visit_ClassDef(self, node):
+        self._class_stack.append(node.name)
+        self.generic_visit(node)
+        self._class_stack.pop()
+
+    def visit_FunctionDef(self, node):
+        # A function nested in a class body's method still sees the same self
+        in_method = bool(self._class_stack) and node.args.args and node.args.args[0].arg == "self"
+        if not in_method and self._class_stack:
+            self._class_stack.append(None)
+            self.generic_visit(node)
+            self._class_stack.pop()
+        else:
+            self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Name(self, node):
+        if (isinstance(node.ctx, ast.Load) and self.manim_star and not self.other_star
+                and node.id not in self.bound and node.id not in BUILTIN_NAMES
+                and node.id not in self.index.names):
+            self._report(node, f"name '{node.id}' is not defined in manim {self.index.version}"
+                               f"{suggestion(node.id, self.index.names)}")
+
+    def visit_ImportFrom(self, node):
+        if node.module == "manim" and not node.level:
+            for alias in node.names:
+                if alias.name != "*" and alias.name not in self.index.names and alias.name not in self.index.submodules:
+                    self._report(node, f"cannot import name '{alias.name}' from manim {self.index.version}"
+                                       f"{suggestion(alias.name, self.index.names)}")
+
+    def _value_class(self, node):
+        if isinstance(node, ast.Name):
+            if node.id == "self" and self._class_stack and self._class_stack[-1]:
+                return ("script", self._class_stack[-1])
+            return self.types.get(node.id)
+        return self._class_of_call(node)
+
+    def visit_Attribute(self, node):
+        self.generic_visit(node)
+        if not isinstance(node.ctx, ast.Load) or node.attr.startswith("__"):
+            return
+        value = node.value
+        # x.animate.method(...) and x.animate(run_time=2).method(...) forward to x's class
+        if isinstance(value, ast.Call) and isinstance(value.func, ast.Attribute) and value.func.attr == "animate":
+            value = value.func.value
+        elif isinstance(value, ast.Attribute) and value.attr == "animate":
+            value = value.value
+        cls = self._value_class(value)
+        if cls is None:
+            return
+        if isinstance(value, ast.Name) and (value.id, node.attr) in self.stored_attrs:
+            return
+        members, prefixes, is_open = self._members(cls)
+        if is_open or node.attr in members or node.attr.startswith(prefixes or ("\0",)):
+            return
+        self._report(node, f"'{self._class_name(cls)}' object has no attribute '{node.attr}'"
+                           f"{suggestion(node.attr, members)}")
+
+
+def check_symbols(code: str):
+    """Unknown manim names and attributes in code, as {"line", "col", "message"}
+    dicts like analyze_code's. Empty when the code is clean or can't be checked."""
+    if not SYMBOL_CHECK_ENABLED:
+        return []
+    index = load_index()
+    if index is None:
+        return []
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        # The sanitizer reports syntax errors
+        return []
+    checker = SymbolChecker(index, tree)
+    try:
+        checker.visit(tree)
+    except RecursionError:
+        return []
+    return checker.problems
+
+
+def format_diagnostics(problems):
+    return "\n".join(f"line {p['line']}: {p['message']}" for p in problems)
@@ -0,0 +1,136 @@
+"""Per-user fair scheduling of the job executor under a heavy user.
+
+One heavy user submits a large batch at t=0 while light users submit a few
+jobs each at random times. Jobs are sleeps on a real JobExecutor, with the
+duration of the quality they render. The same arrivals run twice:
+
+- fifo: every job in one flow (arrival order, the old behaviour)
+- fair: one flow per user, deficit round-robin, optional per-user cap
+
+The report has p50/p95 wait per kind of user, and how close the queue
+position and start time estimates come to what actually happens.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.bench_fairness --heavy-jobs 60 --light-users 10
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+
+from app.utils.job_executor import JobExecutor
+from app.utils.fair_queue import quality_cost
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+    return {"count": len(values), "p50": round(values[len(values) // 2], 3),
+            "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3)}
+
+
+def arrivals(args):
+    rng = random.Random(args.seed)
+    jobs = [(0.0, "heavy", 1, rng.choice(["low", "low", "medium"])) for _ in range(args.heavy_jobs)]
+    for user in range(args.light_users):
+        for _ in range(args.light_jobs):
+            jobs.append((rng.uniform(0, args.spread), "light", 100 + user, "low"))
+    return sorted(jobs, key=lambda job: job[0])
+
+
+def run_mode(mode, jobs, args):
+    executor = JobExecutor(args.workers, len(jobs), user_max_running=args.user_cap if mode == "fair" else 0)
+    waits = defaultdict(list)
+    done = threading.Semaphore(0)
+    lock = threading.Lock()
+    durations = {"low": args.render_seconds, "medium": args.render_seconds * 2}
+
+    # Warm the run time averages the estimates use
+    for _ in range(args.workers):
+        executor.submit(time.sleep, args.render_seconds)
+    time.sleep(args.render_seconds * 1.5)
+
+    def task(kind, submitted, seconds):
+        with lock:
+            waits[kind].append(time.perf_counter() - submitted)
+        time.sleep(seconds)
+        done.release()
+
+    started = time.perf_counter()
+    for i, (at, kind, user, quality) in enumerate(jobs):
+        time.sleep(max(0.0, started + at - time.perf_counter()))
+        executor.submit(task, kind, time.perf_counter(), durations[quality], force=True,
+                        user=user if mode == "fair" else None, cost=quality_cost(quality))
+    for _ in jobs:
+        done.acquire()
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "seconds": round(elapsed, 2),
+        "heavy_wait": percentiles(waits["heavy"]),
+        "light_wait": percentiles(waits["light"]),
+    }
+
+
+def estimate_accuracy(jobs, args):
+    """Submit the whole mix to a paused fair executor and compare each job's
+    estimated start with when it actually started."""
+    executor = JobExecutor(args.workers, len(jobs) + args.workers, user_max_running=args.user_cap)
+    gate = threading.Event()
+    for _ in range(args.workers):
+        executor.submit(time.sleep, args.render_seconds)
+    time.sleep(args.render_seconds * 1.5)
+    for _ in range(args.workers):
+        executor.submit(gate.wait)
+    time.sleep(0.1)
+
+    starts = {}
+    durations = {"low": args.render_seconds, "medium": args.render_seconds * 2}
+
+    def task(key, seconds):
+        starts[key] = time.perf_counter()
+        time.sleep(seconds)
+
+    for i, (_, kind, user, quality) in enumerate(jobs):
+        executor.submit(task, f"job-{i}", durations[quality], user=user, cost=quality_cost(quality), key=f"job-{i}")
+    estimates = {f"job-{i}": executor.position(f"job-{i}") for i in range(len(jobs))}
+    released = time.perf_counter()
+    gate.set()
+    while len(starts) < len(jobs):
+        time.sleep(0.05)
+    order = sorted(starts, key=starts.get)
+    actual_position = {key: i for i, key in enumerate(order)}
+    # The gated tasks finish at release, not after an average run
+    offset = args.render_seconds
+    errors = [abs((starts[key] - released) - (est[1] - offset)) for key, est in estimates.items() if est]
+    return {
+        "position_exact": sum(1 for key, est in estimates.items() if est and est[0] == actual_position[key]),
+        "jobs": len(jobs),
+        "eta_error_seconds": percentiles(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--heavy-jobs", type=int, default=60)
+    parser.add_argument("--light-users", type=int, default=10)
+    parser.add_argument("--light-jobs", type=int, default=2, help="jobs per light user")
+    parser.add_argument("--spread", type=float, default=3.0, help="seconds over which light jobs arrive")
+    parser.add_argument("--render-seconds", type=float, default=0.2)
+    parser.add_argument("--user-cap", type=int, default=0, help="JOB_USER_MAX_RUNNING for the fair run")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    jobs = arrivals(args)
+    print(json.dumps({
+        "jobs": len(jobs),
+        "results": [run_mode(mode, jobs, args) for mode in ("fifo", "fair")],
+        "estimates": estimate_accuracy(jobs, args),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
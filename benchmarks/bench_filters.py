@@ -0,0 +1,67 @@
+"""Prompt filter cost on pathological 10-100 KB inputs.
+
+Compares the previous loop of re.search calls with the keyword-scan engine in
+app.utils.filters, and screens a batch of ordinary prompts:
+
+    python -m benchmarks.bench_filters --sizes-kb 10 50 100
+"""
+import re
+import json
+import time
+import argparse
+
+from app.utils.filters import dangerous_patterns, is_prompt_unsafe, screen_prompts
+
+
+def legacy_is_prompt_unsafe(prompt):
+    lowered = prompt.lower()
+    for pattern in dangerous_patterns:
+        if re.search(pattern, lowered):
+            return True, f"Prompt contains potentially dangerous pattern: {pattern}"
+    return False, None
+
+
+def pathological_inputs(size):
+    # Leading keywords repeated with the trailing keyword never showing up make
+    # every `.*` scan to the end of the line from every start position
+    return {
+        "delete_without_file": ("delete " * (size // 7 + 1))[:size],
+        "access_without_network": ("access " * (size // 7 + 1))[:size],
+        "get_without_http": ("get " * (size // 4 + 1))[:size],
+        "import_without_module": ("import " * (size // 7 + 1))[:size],
+        "plain_text": ("draw a circle and a square " * (size // 27 + 1))[:size],
+    }
+
+
+def per_call_ms(fn, text, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        fn(text)
+    return round((time.perf_counter() - started) / runs * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {}
+    for size_kb in args.sizes_kb:
+        for name, text in pathological_inputs(size_kb * 1024).items():
+            assert legacy_is_prompt_unsafe(text) == is_prompt_unsafe(text)
+            results[f"{name}_{size_kb}kb"] = {
+                "legacy_ms": per_call_ms(legacy_is_prompt_unsafe, text, args.runs),
+                "engine_ms": per_call_ms(is_prompt_unsafe, text, args.runs),
+            }
+
+    prompts = ["Animate the Pythagorean theorem with squares on each side"] * 1000
+    started = time.perf_counter()
+    screen_prompts(prompts)
+    results["batch_1000_prompts_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Job status read path: old two-query lookup vs the joined query.
+
+Runs against DATABASE_URL (a throwaway SQLite file works). Seeds completed jobs
+with videos, then measures lookups per second and statements per lookup:
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.bench_job_status --jobs 5000
+"""
+import json
+import time
+import uuid
+import random
+import argparse
+
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+
+from app.db.db import engine, init_db, SessionLocal
+from app.db.models.job import Job, JobStatus
+from app.db.models.video import Video
+
+statements = {"count": 0}
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    statements["count"] += 1
+
+
+def seed(count):
+    db = SessionLocal()
+    uuids = []
+    for _ in range(count):
+        job_uuid = str(uuid.uuid4())
+        job = Job(user_id=None, prompt="bench", job_uuid=job_uuid, status=JobStatus.completed)
+        db.add(job)
+        db.flush()
+        video = Video(job_id=job_uuid, title="bench", associated_code="pass", video_url="http://s3/bench.mp4")
+        db.add(video)
+        db.flush()
+        job.video_id = video.id
+        uuids.append(job_uuid)
+    db.commit()
+    SessionLocal.remove()
+    return uuids
+
+
+def two_queries(db, job_uuid):
+    # Status lookup as it used to be: the job, then its video by the string job_id
+    job = db.query(Job).filter(Job.job_uuid == job_uuid).first()
+    video = db.query(Video).filter(Video.job_id == job_uuid).first()
+    return job.status, video.id
+
+
+def joined_query(db, job_uuid):
+    job = db.query(Job).options(joinedload(Job.video)).filter(Job.job_uuid == job_uuid).first()
+    return job.status, job.video.id
+
+
+def measure(lookup, uuids, lookups):
+    statements["count"] = 0
+    started = time.perf_counter()
+    for _ in range(lookups):
+        db = SessionLocal()
+        lookup(db, random.choice(uuids))
+        SessionLocal.remove()
+    elapsed = time.perf_counter() - started
+    return {
+        "lookups_per_second": round(lookups / elapsed, 1),
+        "statements_per_lookup": round(statements["count"] / lookups, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    args = parser.parse_args()
+
+    init_db()
+    uuids = seed(args.jobs)
+    results = {
+        "before_two_queries": measure(two_queries, uuids, args.lookups),
+        "after_joined_query": measure(joined_query, uuids, args.lookups),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""LLM access layer under a healthy, a flaky, a failing and a hanging provider.
+
+Starts benchmarks/fake_openai_server.py in-process, points llm_client at it
+and runs concurrent request_manim_code calls through each scenario,
+reporting latency, outcomes and the client's retry/breaker counters. Only
+DATABASE_URL needs to be set (the LLM cache is not used):
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.bench_llm_client --calls 100 --concurrency 16
+"""
+import os
+import json
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_openai_server import start_fake_server
+
+SCENARIOS = [
+    ("healthy", {}),
+    ("flaky", {"rate_limit_rate": 0.2, "error_rate": 0.1}),
+    ("outage", {"error_rate": 1.0}),
+    ("hanging", {"hang_rate": 1.0}),
+]
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def run_scenario(server, name, options, calls, concurrency, latency):
+    from app.utils.openai_client import request_manim_code
+    from app.utils.llm_client import llm_client, CircuitBreaker, LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN
+
+    # Every scenario starts with a closed breaker and fresh counters
+    llm_client.breaker = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN)
+    before = llm_client.stats()
+    server.options.update({"latency": latency, "rate_limit_rate": 0.0, "error_rate": 0.0, "hang_rate": 0.0})
+    server.options.update(options)
+
+    def one(i):
+        started = time.perf_counter()
+        result = request_manim_code(f"Draw circle number {i}")
+        return time.perf_counter() - started, result.get("status")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(calls)))
+    wall = time.perf_counter() - started
+
+    after = llm_client.stats()
+    latencies = [r[0] for r in results]
+    outcomes = {}
+    for _, status in results:
+        outcomes[status] = outcomes.get(status, 0) + 1
+    return {
+        "scenario": name,
+        "wall_seconds": round(wall, 2),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        "outcomes": outcomes,
+        "client": {k: after[k] - before[k] for k in ("retries", "rate_limited", "short_circuited", "deadline_exceeded")},
+        "breaker_state": after["breaker_state"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake provider latency in seconds")
+    parser.add_argument("--deadline", type=float, default=10.0, help="LLM_DEADLINE for the run")
+    args = parser.parse_args()
+
+    server = start_fake_server(hang_seconds=args.deadline * 3)
+    # llm_client reads its settings at import time
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ.setdefault("LLM_DEADLINE", str(args.deadline))
+    os.environ.setdefault("LLM_ATTEMPT_TIMEOUT", str(args.deadline / 2))
+    os.environ.setdefault("LLM_BACKOFF_BASE", "0.2")
+    os.environ.setdefault("LLM_BREAKER_COOLDOWN", "60")
+
+    report = [run_scenario(server, name, options, args.calls, args.concurrency, args.latency)
+              for name, options in SCENARIOS]
+    report.append({"fake_server": server.counters})
+    print(json.dumps(report, indent=2))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""End-to-end load test of the API against the stand-ins in benchmarks/fakes.py.
+
+Boots create_app() on a local port with a fake LLM, S3 and sandbox, then
+drives open-loop load: jobs arrive as a Poisson process at --rate per
+second whether or not earlier ones have finished. Each one is a
+POST /api/generate followed by GET /api/job_status polls every
+--poll-interval until the job ends. Latencies are measured from the
+scheduled arrival time, so a stalled server can't hide its queueing
+(coordinated omission). The JSON report has jobs/sec, p50/p95/p99 per
+request type, per pipeline stage and end to end, and SQL statements per
+request and per job. Use a throwaway database:
+
+    DATABASE_URL=sqlite:////tmp/load.db python -m benchmarks.bench_load --rate 5 --duration 60 --output load.json
+"""
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from werkzeug.serving import make_server
+
+from app import create_app
+from app.db.db import engine
+from app.utils.speculation import speculation
+from benchmarks.fakes import FakeLLM, FakeS3, FakeSandbox, install
+
+TERMINAL = ("completed", "failed")
+
+
+class StatementCounter:
+    """SQL statements per route (request threads) and outside requests (pipeline)."""
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self.count)
+
+    def count(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and request.url_rule is not None:
+            key = request.url_rule.rule
+        else:
+            key = "background"
+        with self._lock:
+            self.counts[key] += 1
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def rank(p):
+        return round(values[min(len(values) - 1, int(p * len(values)))], 4)
+
+    return {"count": len(values), "p50": rank(0.5), "p95": rank(0.95), "p99": rank(0.99),
+            "max": round(values[-1], 4)}
+
+
+def parse_mix(text):
+    mix = {}
+    for item in filter(None, text.split(",")):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class LoadClient:
+    def __init__(self, base_url, args):
+        self.base_url = base_url
+        self.args = args
+        self.lock = threading.Lock()
+        self.requests = defaultdict(list)   # kind -> latencies
+        self.codes = defaultdict(lambda: defaultdict(int))
+        self.jobs = []
+
+    def call(self, kind, method, path, body=None, scheduled=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=self.args.request_timeout) as response:
+                status, payload = response.status, json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, json.loads(e.read() or b"{}")
+        except (urllib.error.URLError, OSError, ValueError):
+            status, payload = "error", {}
+        latency = time.perf_counter() - (scheduled or started)
+        with self.lock:
+            self.requests[kind].append(latency)
+            self.codes[kind][str(status)] += 1
+        return status, payload
+
+    def job(self, prompt, quality, scheduled):
+        status, payload = self.call("generate", "POST", "/api/generate",
+                                    {"prompt": prompt, "quality": quality}, scheduled)
+        record = {"submit_status": status, "status": None, "seconds": None, "stages": None}
+        if status == 202:
+            deadline = scheduled + self.args.job_timeout
+            while time.perf_counter() < deadline:
+                time.sleep(self.args.poll_interval)
+                _, job = self.call("job_status", "GET", f"/api/job_status/{payload['jobId']}")
+                if str(job.get("status")).split(".")[-1] in TERMINAL:
+                    record.update(status=str(job["status"]).split(".")[-1],
+                                  seconds=time.perf_counter() - scheduled, stages=job.get("stageTimings"))
+                    break
+            else:
+                record["status"] = "timed_out"
+        with self.lock:
+            self.jobs.append(record)
+
+
+def run_load(client, args):
+    rng = random.Random(args.seed)
+    qualities = parse_mix(args.qualities)
+    prompts = []
+    clients = ThreadPoolExecutor(max_workers=args.max_clients)
+    started = time.perf_counter()
+    at = 0.0
+    while True:
+        at += rng.expovariate(args.rate)
+        if at > args.duration:
+            break
+        if prompts and rng.random() < args.duplicate_rate:
+            prompt = rng.choice(prompts)
+        else:
+            prompt = f"Animate a circle moving right, variation {len(prompts)} of run {args.seed}"
+            prompts.append(prompt)
+        quality = rng.choices(list(qualities), weights=list(qualities.values()))[0]
+        scheduled = started + at
+        time.sleep(max(0.0, scheduled - time.perf_counter()))
+        clients.submit(client.job, prompt, quality, scheduled)
+    clients.shutdown(wait=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=2.0, help="job arrivals per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of arrivals")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--job-timeout", type=float, default=300.0)
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--max-clients", type=int, default=500, help="concurrent simulated clients")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1, help="share of prompts sent before")
+    parser.add_argument("--qualities", default="low=0.8,medium=0.2")
+    parser.add_argument("--llm-latency", type=float, default=2.0)
+    parser.add_argument("--llm-reject-rate", type=float, default=0.05)
+    parser.add_argument("--llm-broken-rate", type=float, default=0.05, help="answers the symbol check rejects")
+    parser.add_argument("--render-seconds", type=float, default=4.0)
+    parser.add_argument("--startup-seconds", type=float, default=1.0)
+    parser.add_argument("--render-failure-rate", type=float, default=0.02)
+    parser.add_argument("--video-bytes", type=int, default=512 * 1024)
+    parser.add_argument("--s3-latency", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.3, help="relative spread of fake latencies")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    llm = FakeLLM(args.llm_latency, args.jitter, args.llm_reject_rate, args.llm_broken_rate, args.seed)
+    s3 = FakeS3(args.s3_latency, seed=args.seed)
+    sandbox = FakeSandbox(args.startup_seconds, args.render_seconds, args.jitter, args.render_failure_rate,
+                          args.video_bytes, args.seed)
+    install(llm, s3, sandbox)
+
+    app = create_app()
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    statements = StatementCounter()
+    client = LoadClient(f"http://127.0.0.1:{server.server_port}", args)
+
+    elapsed = run_load(client, args)
+    server.shutdown()
+
+    jobs = client.jobs
+    finished = [j for j in jobs if j["status"] in TERMINAL]
+    stages = defaultdict(list)
+    for job in finished:
+        for stage, value in (job["stages"] or {}).items():
+            stages[stage].append(value)
+    routes = {"generate": "/api/generate", "job_status": "/api/job_status/<string:job_uuid>"}
+    report = {
+        "config": vars(args),
+        "elapsed_seconds": round(elapsed, 2),
+        "jobs": {
+            "submitted": len(jobs),
+            "accepted": sum(1 for j in jobs if j["submit_status"] == 202),
+            "completed": sum(1 for j in jobs if j["status"] == "completed"),
+            "failed": sum(1 for j in jobs if j["status"] == "failed"),
+            "timed_out": sum(1 for j in jobs if j["status"] == "timed_out"),
+            "completed_per_second": round(sum(1 for j in jobs if j["status"] == "completed") / elapsed, 3),
+            "end_to_end_seconds": percentiles([j["seconds"] for j in finished]),
+        },
+        "requests": {
+            kind: dict(percentiles(latencies), status_codes=dict(client.codes[kind]))
+            for kind, latencies in client.requests.items()
+        },
+        "stages": {stage: percentiles(values) for stage, values in sorted(stages.items())},
+        "db_statements": {
+            "total": sum(statements.counts.values()),
+            "per_request": {kind: round(statements.counts[route] / max(1, len(client.requests[kind])), 2)
+                            for kind, route in routes.items()},
+            "pipeline_per_job": round(statements.counts["background"] / max(1, len(finished)), 2),
+            "by_route": dict(statements.counts),
+        },
+        "fakes": {"llm": llm.stats(), "s3": s3.stats(), "sandbox": sandbox.stats()},
+        "speculation": speculation.stats(),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
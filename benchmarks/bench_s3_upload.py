@@ -0,0 +1,98 @@
+"""Upload throughput: per-call boto3 clients vs the shared, tuned S3 client.
+
+Point it at a local stand-in through S3_ENDPOINT_URL, e.g. MinIO or
+`moto_server -p 9000`, with the AWS_* variables set (the bucket is created
+if missing):
+
+    python -m benchmarks.bench_s3_upload --sizes-mb 1 16 64 --runs 3
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+from uuid import uuid4
+
+import boto3
+
+
+def legacy_upload(path, object_name):
+    # What upload_file_to_s3 used to do: a fresh client and default transfer settings
+    from app.utils.s3_handler import AWS_BUCKET_NAME, AWS_REGION, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, S3_ENDPOINT_URL
+    s3_config = {
+        "region_name": AWS_REGION,
+        "aws_access_key_id": AWS_ACCESS_KEY_ID,
+        "aws_secret_access_key": AWS_SECRET_ACCESS_KEY
+    }
+    if S3_ENDPOINT_URL:
+        s3_config["endpoint_url"] = S3_ENDPOINT_URL
+    s3 = boto3.client("s3", **s3_config)
+    s3.upload_file(path, AWS_BUCKET_NAME, object_name, ExtraArgs={"ContentType": "video/mp4"})
+    return {"status": "success"}
+
+
+def pooled_upload(path, object_name):
+    from app.utils.s3_handler import upload_file_to_s3
+    return upload_file_to_s3(path, object_name)
+
+
+def streamed_upload(path, object_name):
+    from app.utils.s3_handler import upload_stream_to_s3
+    def chunks():
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    return
+                yield chunk
+    return upload_stream_to_s3(chunks(), object_name)
+
+
+def measure(upload, path, size, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = upload(path, f"bench/{uuid4()}.mp4")
+        elapsed = time.perf_counter() - started
+        if result["status"] != "success":
+            raise RuntimeError(result)
+        samples.append(elapsed)
+    best = min(samples)
+    return {
+        "best_seconds": round(best, 4),
+        "mean_seconds": round(sum(samples) / len(samples), 4),
+        "mb_per_second": round(size / (1024 * 1024) / best, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    from app.utils.s3_handler import get_s3_client, AWS_BUCKET_NAME
+    client = get_s3_client()
+    if AWS_BUCKET_NAME not in [b["Name"] for b in client.list_buckets().get("Buckets", [])]:
+        client.create_bucket(Bucket=AWS_BUCKET_NAME)
+
+    results = {}
+    for size_mb in args.sizes_mb:
+        size = size_mb * 1024 * 1024
+        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
+            f.write(os.urandom(size))
+            path = f.name
+        try:
+            results[f"{size_mb}MB"] = {
+                "legacy": measure(legacy_upload, path, size, args.runs),
+                "pooled": measure(pooled_upload, path, size, args.runs),
+                "streamed": measure(streamed_upload, path, size, args.runs),
+            }
+        finally:
+            os.remove(path)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
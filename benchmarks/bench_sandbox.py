@@ -0,0 +1,76 @@
+"""Scene-to-MP4 latency: cold `docker run` per job vs the warm sandbox pool.
+
+Needs a Docker daemon and the manim image. Run from the repository root:
+
+    python -m benchmarks.bench_sandbox --runs 10 --pool-size 2
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+SCENE = """from manim import *
+
+class BenchScene(Scene):
+    def construct(self):
+        circle = Circle()
+        self.play(Create(circle))
+        self.play(circle.animate.shift(RIGHT))
+"""
+
+
+def summarize(samples):
+    if not samples:
+        return {"runs": 0}
+    ordered = sorted(samples)
+    return {
+        "runs": len(samples),
+        "mean": round(statistics.mean(samples), 3),
+        "p50": round(ordered[len(ordered) // 2], 3),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "min": round(ordered[0], 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def time_runs(run, runs):
+    from app.sandbox.workspace import workspaces
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = run(SCENE)
+        elapsed = time.perf_counter() - started
+        workspaces.release(result.get("workspace"))
+        if result["status"] != "success":
+            print(f"render failed: {result.get('error', '')[-500:]}", file=sys.stderr)
+            continue
+        samples.append(elapsed)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--pool-size", type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ["SANDBOX_POOL_SIZE"] = str(args.pool_size)
+    from app.sandbox.docker_runner import run_code_in_cold_container
+    from app.sandbox.container_pool import sandbox_pool
+
+    results = {"cold": summarize(time_runs(run_code_in_cold_container, args.runs))}
+
+    # Pool start-up is paid once per container and is not part of the job latency
+    sandbox_pool.warm()
+    while sandbox_pool.stats()["idle"] < args.pool_size and sandbox_pool.stats()["live"]:
+        time.sleep(0.5)
+    results["pool"] = summarize(time_runs(sandbox_pool.run, args.runs))
+    results["pool_stats"] = sandbox_pool.stats()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
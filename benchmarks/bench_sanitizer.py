@@ -0,0 +1,122 @@
+"""Sanitizer cost over the LLM output corpus and synthetic large files.
+
+Compares the previous ast.walk implementation with the rule-table visitor,
+uncached and cached, and shows that registering more rules only adds cost on
+the node types they target:
+
+    python -m benchmarks.bench_sanitizer --extra-rules 0 20 50
+"""
+import os
+import ast
+import json
+import time
+import argparse
+
+from app.utils import ast_sanitizer
+from app.utils.ast_sanitizer import (
+    PROHIBITED_IMPORTS, PROHIBITED_FUNCTIONS, ALLOWED_BASE_CLASSES, RULES, _run_rules, analyze_code,
+)
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def legacy_sanitize_ast(code):
+    # The ast.walk + isinstance chain this module replaced, kept as the baseline
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return False, f"Syntax error in code: {str(e)}"
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name.split('.')[0] in PROHIBITED_IMPORTS:
+                    return False, f"Use of prohibited import: {alias.name}"
+        if isinstance(node, ast.ImportFrom):
+            if node.module and node.module.split('.')[0] in PROHIBITED_IMPORTS:
+                return False, f"Use of prohibited import: {node.module}"
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name) and node.func.id in PROHIBITED_FUNCTIONS:
+                return False, f"Use of prohibited function: {node.func.id}"
+            if isinstance(node.func, ast.Attribute) and node.func.attr in PROHIBITED_FUNCTIONS:
+                return False, f"Use of prohibited attribute: {node.func.attr}"
+        if isinstance(node, ast.Name) and node.id in PROHIBITED_FUNCTIONS:
+            return False, f"Use of prohibited identifier: {node.id}"
+        if isinstance(node, ast.ClassDef):
+            for base in node.bases:
+                if isinstance(base, ast.Name) and base.id not in ALLOWED_BASE_CLASSES:
+                    return False, f"Unauthorized base class: {base.id}"
+    return True, "Code passed AST analysis"
+
+
+def load_corpus():
+    corpus = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith(".py"):
+            with open(os.path.join(CORPUS_DIR, name), encoding="utf-8") as f:
+                corpus[name] = f.read()
+    return corpus
+
+
+def synthetic_file(size_kb):
+    # Many scenes with long construct bodies, about size_kb kilobytes of code
+    lines = ["from manim import *", ""]
+    i = 0
+    while sum(len(line) + 1 for line in lines) < size_kb * 1024:
+        lines += [
+            f"class Generated{i}(Scene):",
+            "    def construct(self):",
+        ]
+        for j in range(20):
+            lines.append(f"        m{j} = Circle(radius={j % 5 + 1}).shift({j % 3} * RIGHT).set_color(BLUE)")
+            lines.append(f"        self.play(Create(m{j}), run_time=0.1)")
+        i += 1
+    return "\n".join(lines) + "\n"
+
+
+def per_call_us(fn, code, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        fn(code)
+    return round((time.perf_counter() - started) / runs * 1e6, 1)
+
+
+def add_noop_rules(count):
+    # Rules on node types that real code rarely contains, like a growing policy would add
+    targets = [ast.Global, ast.Nonlocal, ast.Lambda, ast.Await, ast.Yield, ast.Starred, ast.Try, ast.With]
+    for i in range(count):
+        RULES.setdefault(targets[i % len(targets)], []).append(lambda node: iter(()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--extra-rules", type=int, nargs="+", default=[0, 20])
+    args = parser.parse_args()
+
+    inputs = load_corpus()
+    for size_kb in args.sizes_kb:
+        inputs[f"synthetic_{size_kb}kb"] = synthetic_file(size_kb)
+
+    results = {}
+    baseline_rules = {k: list(v) for k, v in RULES.items()}
+    for extra in args.extra_rules:
+        RULES.clear()
+        RULES.update({k: list(v) for k, v in baseline_rules.items()})
+        add_noop_rules(extra)
+        for name, code in inputs.items():
+            runs = args.runs if len(code) < 32 * 1024 else max(5, args.runs // 20)
+            ast_sanitizer._cache.clear()
+            analyze_code(code)  # warm the cache for the cached measurement
+            results.setdefault(name, {"bytes": len(code)})
+            if extra == args.extra_rules[0]:
+                results[name]["legacy_us"] = per_call_us(legacy_sanitize_ast, code, runs)
+                results[name]["collect_all_violations"] = len(_run_rules(code, True))
+                results[name]["cached_us"] = per_call_us(analyze_code, code, runs)
+            results[name][f"visitor_{extra}_extra_rules_us"] = per_call_us(lambda c: _run_rules(c, False), code, runs)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Render scheduler under a simulated workload; no Docker needed.
+
+A fake runner stands in for the sandbox. Every job has a true CPU demand and
+peak memory drawn for its quality. While it "renders", the fake stats reader
+reports its usage, CPU time is shared out when the node is oversubscribed,
+and a job whose memory outgrows its lease is killed the way the kernel would
+kill the container. The same job mix runs three ways:
+
+- unscheduled: as many concurrent renders as workers, no limits (the old behaviour)
+- fixed: admission with the configured quotas, no usage sampling
+- adaptive: admission with quotas following the sampled usage
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.bench_scheduler --jobs 300 --cpus 32 --memory 64g
+"""
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from app.sandbox.docker_runner import render_with_resources
+from app.sandbox.scheduler import ResourceScheduler, parse_size, SANDBOX_QUOTAS
+
+MIB = 1024 ** 2
+# quality -> (share of jobs, CPU cores used, peak memory, CPU seconds of work)
+PROFILES = {
+    "low": (0.6, 1.0, 350 * MIB, 4),
+    "medium": (0.25, 1.6, 700 * MIB, 10),
+    "high": (0.1, 1.9, 1200 * MIB, 20),
+    "production": (0.05, 3.5, 2500 * MIB, 40),
+}
+STEPS = 20
+
+
+class FakeJob:
+    def __init__(self, rng):
+        self.quality = rng.choices(list(PROFILES), weights=[p[0] for p in PROFILES.values()])[0]
+        _, cpus, memory, work = PROFILES[self.quality]
+        jitter = lambda: max(0.3, rng.gauss(1, 0.15))
+        self.cpus = cpus * jitter()
+        self.memory = int(memory * jitter())
+        self.work = work * jitter()
+
+
+class FakeRunner:
+    """Simulated containers sharing one node."""
+
+    def __init__(self, cpus: float, memory: int, scale: float):
+        self.cpus = cpus
+        self.memory = memory
+        self.scale = scale
+        self.running = {}  # name -> (cpu demand, memory in use)
+        self.lock = threading.Lock()
+        self.peak_memory = 0
+        self.peak_running = 0
+        self.overcommitted_steps = 0
+        self.ooms = 0
+
+    def stats(self, name):
+        with self.lock:
+            return self.running.get(name)
+
+    def render(self, job: FakeJob, lease):
+        name = f"fake-{uuid.uuid4().hex[:8]}"
+        demand = min(job.cpus, lease.cpus) if lease else job.cpus
+        limit = lease.memory if lease else None
+        done = 0.0
+        with lease.track(name) if lease else nullcontext():
+            try:
+                while done < job.work:
+                    # Memory ramps up to its peak over the first half of the render
+                    memory = int(job.memory * min(1.0, 0.3 + 1.4 * done / job.work))
+                    with self.lock:
+                        self.running[name] = (demand, memory)
+                        total_cpus = sum(c for c, _ in self.running.values())
+                        used = sum(m for _, m in self.running.values())
+                        self.peak_memory = max(self.peak_memory, used)
+                        self.peak_running = max(self.peak_running, len(self.running))
+                        if used > self.memory:
+                            self.overcommitted_steps += 1
+                    if limit is not None and memory > limit:
+                        with self.lock:
+                            self.ooms += 1
+                        return {"status": "error", "error": "Out of memory", "job_id": name, "oom": True}
+                    speed = demand * min(1.0, self.cpus / total_cpus)
+                    chunk = job.work / STEPS
+                    time.sleep(chunk / speed * self.scale)
+                    done += chunk
+            finally:
+                with self.lock:
+                    self.running.pop(name, None)
+        return {"status": "success", "job_id": name}
+
+
+def run_mode(mode, jobs, args):
+    cpus, memory = args.cpus, parse_size(args.memory)
+    runner = FakeRunner(cpus, memory, args.scale)
+    scheduler = None
+    if mode != "unscheduled":
+        scheduler = ResourceScheduler(cpus, memory, SANDBOX_QUOTAS, stats_reader=runner.stats,
+                                      interval=args.scale * 0.5 if mode == "adaptive" else 0)
+
+    def one(job):
+        started = time.perf_counter()
+        if scheduler is None:
+            result = runner.render(job, None)
+        else:
+            result = render_with_resources(lambda lease: runner.render(job, lease), job.quality, None, scheduler)
+        return result["status"], time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(one, jobs))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds for _, seconds in results)
+    report = {
+        "mode": mode,
+        "seconds": round(elapsed, 2),
+        "jobs_per_second": round(len(jobs) / elapsed, 2),
+        "failed": sum(1 for status, _ in results if status != "success"),
+        "latency_p50": round(latencies[len(latencies) // 2], 3),
+        "latency_p95": round(latencies[int(len(latencies) * 0.95)], 3),
+        "peak_running": runner.peak_running,
+        "peak_memory_used": round(runner.peak_memory / memory, 3),
+        "steps_over_node_memory": runner.overcommitted_steps,
+        "oom_kills": runner.ooms,
+    }
+    if scheduler:
+        stats = scheduler.stats()
+        report["quotas"] = {q: [stats[f"{q}_cpus"], stats[f"{q}_memory"] // MIB] for q in SANDBOX_QUOTAS}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=64, help="renders submitted concurrently")
+    parser.add_argument("--cpus", type=float, default=32)
+    parser.add_argument("--memory", default="32g")
+    parser.add_argument("--scale", type=float, default=0.01, help="wall seconds per simulated CPU second")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    jobs = [FakeJob(rng) for _ in range(args.jobs)]
+    print(json.dumps({
+        "node": {"cpus": args.cpus, "memory": args.memory},
+        "jobs": {q: sum(1 for j in jobs if j.quality == q) for q in PROFILES},
+        "quota_ceilings": {q: [c, m // MIB] for q, (c, m) in SANDBOX_QUOTAS.items()},
+        "results": [run_mode(mode, jobs, args) for mode in ("unscheduled", "fixed", "adaptive")],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Symbol pre-flight check over the LLM output corpus: cost, catches, false
+positives and the container time it saves.
+
+Replays benchmarks/corpus plus broken variants of each valid scene (one manim
+name or attribute replaced by a near miss, the way LLMs invent them). Scripts
+the check rejects never reach a container; each one saves the time a sandbox
+takes to fail on it. That is --fail-seconds by default, or measured with
+--measure (needs Docker and the sandbox image):
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.bench_symbol_check --fail-seconds 12
+"""
+import os
+import ast
+import json
+import time
+import random
+import argparse
+import statistics
+
+from app.utils.symbol_check import check_symbols, load_index
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+# Made-up spellings: what a model does when it half-remembers an API
+MUTATIONS = [
+    lambda name: name + "s",
+    lambda name: name[:-1] if len(name) > 3 else name + "x",
+    lambda name: "Show" + name if name[:1].isupper() else "get_" + name + "_value",
+    lambda name: name.replace("_", "") if "_" in name else name + "_obj",
+]
+
+
+def load_corpus():
+    corpus = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith(".py") and not name.startswith("rejected_"):
+            with open(os.path.join(CORPUS_DIR, name), encoding="utf-8") as f:
+                corpus[name] = f.read()
+    return corpus
+
+
+def mutate(code, index, rng):
+    """One broken variant of code: a manim name or a method call renamed."""
+    tree = ast.parse(code)
+    targets = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id in index.names:
+            targets.append((node.lineno, node.col_offset, node.id))
+        elif (isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Load)
+              and not node.attr.startswith(("get_", "set_", "__"))):
+            targets.append((node.end_lineno, node.end_col_offset - len(node.attr), node.attr))
+    if not targets:
+        return None
+    line, col, name = rng.choice(targets)
+    new_name = rng.choice(MUTATIONS)(name)
+    if new_name in index.names or new_name == name:
+        return None
+    lines = code.split("\n")
+    text = lines[line - 1]
+    lines[line - 1] = text[:col] + new_name + text[col + len(name):]
+    return "\n".join(lines)
+
+
+def time_check(code, repeats):
+    samples = []
+    problems = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        problems = check_symbols(code)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), problems
+
+
+def measure_failure(code):
+    from app.sandbox.docker_runner import run_code_in_docker
+    from app.sandbox.workspace import workspaces
+    started = time.perf_counter()
+    result = run_code_in_docker(code)
+    elapsed = time.perf_counter() - started
+    workspaces.release(result.get("workspace"))
+    return elapsed, result["status"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variants", type=int, default=5, help="broken variants per valid corpus file")
+    parser.add_argument("--repeats", type=int, default=20, help="timed checks per script")
+    parser.add_argument("--fail-seconds", type=float, default=10.0,
+                        help="container seconds a broken script costs when not measured")
+    parser.add_argument("--measure", action="store_true", help="render every rejected script to time its failure")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    index = load_index()
+    rng = random.Random(args.seed)
+    corpus = load_corpus()
+    valid = {name: code for name, code in corpus.items() if not name.startswith("broken_")}
+
+    scripts = []  # (name, code, expected_broken)
+    for name, code in corpus.items():
+        scripts.append((name, code, name.startswith("broken_")))
+    for name, code in valid.items():
+        for i in range(args.variants):
+            variant = mutate(code, index, rng)
+            if variant:
+                scripts.append((f"{name}#mutant{i}", variant, True))
+
+    results = []
+    for name, code, expected_broken in scripts:
+        seconds, problems = time_check(code, args.repeats)
+        results.append({"script": name, "broken": expected_broken, "check_ms": round(seconds * 1000, 3),
+                        "problems": [p["message"] for p in problems]})
+
+    rejected = [r for r in results if r["problems"]]
+    false_positives = [r["script"] for r in rejected if not r["broken"]]
+    missed = [r["script"] for r in results if r["broken"] and not r["problems"]]
+    if args.measure:
+        code_by_name = {name: code for name, code, _ in scripts}
+        failures = [measure_failure(code_by_name[r["script"]]) for r in rejected]
+        saved = sum(seconds for seconds, status in failures if status != "success")
+    else:
+        saved = len(rejected) * args.fail_seconds
+    check_ms = [r["check_ms"] for r in results]
+
+    print(json.dumps({
+        "manim_version": index.version,
+        "scripts": len(results),
+        "broken": sum(1 for r in results if r["broken"]),
+        "rejected_before_container": len(rejected),
+        "false_positives": false_positives,
+        "missed": missed,
+        "check_ms_p50": round(statistics.median(check_ms), 3),
+        "check_ms_max": round(max(check_ms), 3),
+        "container_seconds_saved": round(saved, 1),
+        "container_seconds_assumed_per_failure": None if args.measure else args.fail_seconds,
+        "rejections": {r["script"]: r["problems"] for r in rejected},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
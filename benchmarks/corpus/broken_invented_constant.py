@@ -0,0 +1,10 @@
+from manim import *
+
+class RotatingTriangle(Scene):
+    def construct(self):
+        triangle = Triangle(color=ORANGE).scale(2)
+        dot = Dot(CENTER, color=WHITE)
+        self.play(DrawBorderThenFill(triangle), FadeIn(dot))
+        self.play(Rotate(triangle, angle=TAU / 3, about_point=ORIGIN), run_time=2)
+        self.play(triangle.animate.set_color(PURPLE_LIGHT))
+        self.wait()
@@ -0,0 +1,11 @@
+from manim import *
+
+class ParabolaArea(Scene):
+    def construct(self):
+        axes = Axes(x_range=[0, 3, 1], y_range=[0, 9, 3], x_length=6, y_length=5)
+        graph = axes.plot_function(lambda x: x ** 2, color=BLUE)
+        area = axes.get_area(graph, x_range=[0, 2], color=GREEN, opacity=0.4)
+        label = MathTex(r"\int_0^2 x^2\,dx = \frac{8}{3}").to_corner(UR)
+        self.play(Create(axes), Create(graph))
+        self.play(FadeIn(area), Write(label))
+        self.wait()
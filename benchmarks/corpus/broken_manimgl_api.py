@@ -0,0 +1,12 @@
+from manim import *
+
+class SquareToCircle(Scene):
+    def construct(self):
+        title = TextMobject("Square to circle")
+        square = Square(color=BLUE)
+        circle = Circle(color=RED)
+        self.play(Write(title))
+        self.play(title.animate.to_edge(UP))
+        self.play(ShowCreation(square))
+        self.play(Transform(square, circle))
+        self.wait()
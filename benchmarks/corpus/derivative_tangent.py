@@ -0,0 +1,24 @@
+from manim import *
+
+class DerivativeTangent(Scene):
+    def construct(self):
+        axes = Axes(x_range=[-3, 3], y_range=[-1, 9], x_length=8, y_length=5)
+        func = lambda x: x ** 2
+        graph = axes.plot(func, color=BLUE)
+        label = axes.get_graph_label(graph, label="f(x)=x^2")
+
+        x = ValueTracker(-2)
+        tangent = always_redraw(
+            lambda: axes.get_secant_slope_group(
+                x=x.get_value(), graph=graph, dx=0.01, secant_line_length=4, secant_line_color=YELLOW
+            )
+        )
+        dot = always_redraw(lambda: Dot(axes.i2gp(x.get_value(), graph), color=RED))
+        slope = always_redraw(
+            lambda: DecimalNumber(2 * x.get_value(), num_decimal_places=2).to_corner(UR)
+        )
+
+        self.play(Create(axes), Create(graph), Write(label))
+        self.add(tangent, dot, slope)
+        self.play(x.animate.set_value(2), run_time=5)
+        self.wait()
@@ -0,0 +1,17 @@
+from manim import *
+
+class MatrixTransformation(LinearTransformationScene):
+    def __init__(self, **kwargs):
+        LinearTransformationScene.__init__(
+            self,
+            show_coordinates=True,
+            leave_ghost_vectors=True,
+            **kwargs
+        )
+
+    def construct(self):
+        matrix = [[1, 1], [0, 1]]
+        matrix_tex = MathTex(r"A = \begin{bmatrix} 1 & 1 \\ 0 & 1 \end{bmatrix}").to_edge(UL).add_background_rectangle()
+        self.add_foreground_mobject(matrix_tex)
+        self.apply_matrix(matrix)
+        self.wait()
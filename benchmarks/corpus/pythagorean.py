@@ -0,0 +1,18 @@
+from manim import *
+
+class PythagoreanTheorem(Scene):
+    def construct(self):
+        title = Text("Pythagorean Theorem").to_edge(UP)
+        triangle = Polygon(ORIGIN, 3 * RIGHT, 3 * RIGHT + 4 * UP, color=WHITE)
+        a_square = Square(side_length=3, color=RED, fill_opacity=0.5).next_to(triangle, DOWN, buff=0)
+        b_square = Square(side_length=4, color=GREEN, fill_opacity=0.5).next_to(triangle, RIGHT, buff=0)
+        formula = MathTex("a^2", "+", "b^2", "=", "c^2").to_edge(DOWN)
+        formula[0].set_color(RED)
+        formula[2].set_color(GREEN)
+        formula[4].set_color(BLUE)
+
+        self.play(Write(title))
+        self.play(Create(triangle))
+        self.play(FadeIn(a_square), FadeIn(b_square))
+        self.play(Write(formula))
+        self.wait(2)
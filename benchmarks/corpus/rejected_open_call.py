@@ -0,0 +1,9 @@
+from manim import *
+
+class ReadSecrets(Scene):
+    def construct(self):
+        with open("/etc/passwd") as f:
+            content = f.read()
+        self.play(Write(Text(content[:40])))
+        loader = eval
+        self.wait()
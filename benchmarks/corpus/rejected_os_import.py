@@ -0,0 +1,8 @@
+from manim import *
+import os
+
+class ListFiles(Scene):
+    def construct(self):
+        files = os.listdir("/")
+        text = Text("\n".join(files[:5]))
+        self.play(Write(text))
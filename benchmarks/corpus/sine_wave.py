@@ -0,0 +1,14 @@
+from manim import *
+
+class OscillatingSineWave(Scene):
+    def construct(self):
+        axes = Axes(x_range=[-7, 7, 1], y_range=[-2, 2, 1], axis_config={"include_tip": False})
+        labels = axes.get_axis_labels(x_label="x", y_label="y")
+        phase = ValueTracker(0)
+        graph = always_redraw(
+            lambda: axes.plot(lambda x: np.sin(x + phase.get_value()), color=BLUE)
+        )
+        self.play(Create(axes), Write(labels))
+        self.play(Create(graph))
+        self.play(phase.animate.set_value(2 * PI), run_time=4, rate_func=linear)
+        self.wait()
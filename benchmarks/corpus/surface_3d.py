@@ -0,0 +1,18 @@
+from manim import *
+
+class ParaboloidSurface(ThreeDScene):
+    def construct(self):
+        axes = ThreeDAxes()
+        surface = Surface(
+            lambda u, v: axes.c2p(u, v, 0.3 * (u ** 2 + v ** 2)),
+            u_range=[-2, 2],
+            v_range=[-2, 2],
+            resolution=(24, 24),
+        )
+        surface.set_fill_by_checkerboard(BLUE_D, BLUE_E, opacity=0.7)
+        self.set_camera_orientation(phi=70 * DEGREES, theta=-45 * DEGREES)
+        self.play(Create(axes))
+        self.play(Create(surface))
+        self.begin_ambient_camera_rotation(rate=0.2)
+        self.wait(4)
+        self.stop_ambient_camera_rotation()
@@ -0,0 +1,20 @@
+from manim import *
+
+class UnitCircleTrig(Scene):
+    def construct(self):
+        plane = NumberPlane(x_range=[-2, 2], y_range=[-2, 2], x_length=6, y_length=6)
+        circle = Circle(radius=plane.get_x_unit_size(), color=YELLOW)
+        theta = ValueTracker(0.01)
+
+        dot = always_redraw(lambda: Dot(plane.c2p(np.cos(theta.get_value()), np.sin(theta.get_value())), color=RED))
+        radius = always_redraw(lambda: Line(plane.c2p(0, 0), dot.get_center(), color=WHITE))
+        sine = always_redraw(lambda: Line(plane.c2p(np.cos(theta.get_value()), 0), dot.get_center(), color=BLUE))
+        cosine = always_redraw(lambda: Line(plane.c2p(0, 0), plane.c2p(np.cos(theta.get_value()), 0), color=GREEN))
+        angle_label = always_redraw(
+            lambda: MathTex(r"\theta = " + f"{theta.get_value():.2f}").to_corner(UR)
+        )
+
+        self.play(Create(plane), Create(circle))
+        self.add(dot, radius, sine, cosine, angle_label)
+        self.play(theta.animate.set_value(2 * PI), run_time=6, rate_func=linear)
+        self.wait()
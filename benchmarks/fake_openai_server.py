@@ -0,0 +1,165 @@
+"""Minimal OpenAI-compatible server implementing POST /v1/responses.
+
+Returns a canned Manim scene (or a rejection when the prompt says "reject")
+after a configurable latency, and injects 429s with Retry-After, 500s and
+hung requests at configurable rates. Point the app at it with
+OPENAI_BASE_URL=http://127.0.0.1:8089/v1:
+
+    python -m benchmarks.fake_openai_server --port 8089 --latency 0.5 --error-rate 0.1
+
+The failure mix can be changed while running with
+POST /_control {"error_rate": 1.0} (same names as the command line options).
+"""
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ACCEPTED_CODE = (
+    "from manim import *\n"
+    "class FakeScene(Scene):\n"
+    "    def construct(self):\n"
+    "        self.play(Create(Circle()))\n"
+)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        options = self.server.options
+        body = self._read_json()
+        if self.path == "/_control":
+            options.update(body)
+            return self._send_json(200, options)
+        if self.path.rstrip("/") != "/v1/responses":
+            return self._send_json(404, {"error": {"message": "Not found"}})
+
+        self.server.count("requests")
+        roll = random.random()
+        if roll < options["rate_limit_rate"]:
+            self.server.count("rate_limited")
+            return self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                   {"Retry-After": str(options["retry_after"])})
+        roll -= options["rate_limit_rate"]
+        if roll < options["error_rate"]:
+            self.server.count("errors")
+            return self._send_json(500, {"error": {"message": "Internal server error", "type": "server_error"}})
+        roll -= options["error_rate"]
+        if roll < options["hang_rate"]:
+            self.server.count("hung")
+            time.sleep(options["hang_seconds"])
+
+        time.sleep(options["latency"])
+        prompt = str(body.get("input", ""))
+        if "reject" in prompt.lower():
+            result = {"status": "rejected", "reason": "Fake server rejected the prompt."}
+        else:
+            result = {"status": "accepted", "code": ACCEPTED_CODE}
+        self.server.count("ok")
+        self._send_json(200, response_body(body.get("model", "fake"), json.dumps(result), prompt))
+
+
+def response_body(model, text, prompt):
+    input_tokens = len(prompt) // 4 + 1
+    output_tokens = len(text) // 4 + 1
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": model,
+        "output": [{
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex}",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, options):
+        super().__init__(address, FakeOpenAIHandler)
+        self.options = options
+        self.counters = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0, "hung": 0}
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_fake_server(port=0, latency=0.2, rate_limit_rate=0.0, error_rate=0.0,
+                      hang_rate=0.0, hang_seconds=120.0, retry_after=1):
+    """Run the server on a background thread; port 0 picks a free port."""
+    options = {
+        "latency": latency, "rate_limit_rate": rate_limit_rate, "error_rate": error_rate,
+        "hang_rate": hang_rate, "hang_seconds": hang_seconds, "retry_after": retry_after,
+    }
+    server = FakeOpenAIServer(("127.0.0.1", port), options)
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per successful call")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 500")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="fraction of calls that hang")
+    parser.add_argument("--hang-seconds", type=float, default=120.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    server = start_fake_server(args.port, args.latency, args.rate_limit_rate, args.error_rate,
+                               args.hang_rate, args.hang_seconds, args.retry_after)
+    print(f"Fake OpenAI server on {server.base_url}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
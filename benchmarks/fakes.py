@@ -0,0 +1,259 @@
+"""In-process stand-ins for the LLM, S3 and the Docker sandbox.
+
+install() swaps them in where the pipeline calls the real ones, so the app
+runs end to end with no API key, bucket or Docker daemon. Everything in
+between (routes, DB, caches, sanitizer, symbol check, executor, render
+scheduler) is the real code.
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from types import SimpleNamespace
+
+from app.utils.metrics import record_stage, stage_timer
+
+SCENE_TEMPLATE = (
+    "from manim import *\n"
+    "class LoadScene(Scene):\n"
+    "    def construct(self):\n"
+    "        shape = Circle(radius={radius})\n"
+    "        self.play(Create(shape))\n"
+    "        self.play(shape.animate.shift(RIGHT * {shift}))\n"
+    "        self.wait()\n"
+)
+# Uses a manimgl name, so the symbol check rejects it
+BROKEN_TEMPLATE = (
+    "from manim import *\n"
+    "class LoadScene(Scene):\n"
+    "    def construct(self):\n"
+    "        self.play(ShowCreation(Circle(radius={radius})))\n"
+)
+
+
+def seconds(rng, mean, jitter):
+    """Lognormal-ish duration around mean; jitter is the relative spread."""
+    if mean <= 0:
+        return 0.0
+    return mean * rng.lognormvariate(0, jitter) if jitter > 0 else mean
+
+
+class FakeLLM:
+    """Replaces llm_client: answers create_response() or stream_response().
+
+    latency is the time to a full scene answer: first_token of it passes
+    before the first token, the rest is spread over the text, so shorter
+    answers (rejections) finish sooner. Like a sampled model, two calls for
+    the same prompt rarely give the same code.
+    """
+
+    def __init__(self, latency=1.0, jitter=0.3, reject_rate=0.0, broken_rate=0.0, seed=None,
+                 first_token=0.15, chunk_chars=16):
+        self.latency = latency
+        self.jitter = jitter
+        self.reject_rate = reject_rate
+        self.broken_rate = broken_rate
+        self.first_token = first_token
+        self.chunk_chars = chunk_chars
+        self.calls = 0
+        self.streamed = 0
+        self.stopped_early = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._reference_chars = len(json.dumps({"status": "accepted",
+                                                "code": SCENE_TEMPLATE.format(radius=1.0, shift=1)}))
+
+    def _answer(self, kwargs):
+        """(seconds to the first token, seconds per character, answer text)"""
+        prompt = str(kwargs.get("input") or "")
+        with self._lock:
+            self.calls += 1
+            delay = seconds(self._rng, self.latency, self.jitter)
+            roll = self._rng.random()
+            shift = round(self._rng.uniform(1, 3), 2)
+        digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        radius = 0.5 + digest % 100 / 50
+        if roll < self.reject_rate:
+            answer = {"status": "rejected", "reason": "Fake LLM rejected the prompt."}
+        elif roll < self.reject_rate + self.broken_rate:
+            answer = {"status": "accepted", "code": BROKEN_TEMPLATE.format(radius=radius)}
+        else:
+            answer = {"status": "accepted", "code": SCENE_TEMPLATE.format(radius=radius, shift=shift)}
+        return delay * self.first_token, delay * (1 - self.first_token) / self._reference_chars, json.dumps(answer)
+
+    def create_response(self, timeout=None, **kwargs):
+        first, per_char, text = self._answer(kwargs)
+        time.sleep(first + per_char * len(text))
+        return SimpleNamespace(output=[SimpleNamespace(content=[SimpleNamespace(text=text)])])
+
+    def stream_response(self, on_text, timeout=None, **kwargs):
+        first, per_char, text = self._answer(kwargs)
+        with self._lock:
+            self.streamed += 1
+        time.sleep(first)
+        for start in range(0, len(text), self.chunk_chars):
+            chunk = text[start:start + self.chunk_chars]
+            time.sleep(per_char * len(chunk))
+            if on_text(chunk):
+                with self._lock:
+                    self.stopped_early += 1
+                return text[:start + len(chunk)]
+        return text
+
+    def stats(self):
+        return {"calls": self.calls, "streamed": self.streamed, "stopped_early": self.stopped_early}
+
+
+class FakeS3:
+    """Replaces the S3 upload and presign calls with an in-memory bucket."""
+
+    def __init__(self, latency=0.05, seconds_per_mb=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.seconds_per_mb = seconds_per_mb
+        self.failure_rate = failure_rate
+        self.objects = {}  # key -> size
+        self.uploads = 0
+        self.failures = 0
+        self.presigned = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def upload_file_to_s3(self, file_path, object_name=None):
+        size = os.path.getsize(file_path)
+        with self._lock:
+            self.uploads += 1
+            key = object_name or f"videos/fake-{self.uploads}.mp4"
+            failed = self._rng.random() < self.failure_rate
+        time.sleep(self.latency + size / 1024 ** 2 * self.seconds_per_mb)
+        if failed:
+            with self._lock:
+                self.failures += 1
+            return {"status": "error", "message": "Fake S3 upload failed"}
+        with self._lock:
+            self.objects[key] = size
+        return {"status": "success", "url": f"http://fake-s3/bucket/{key}"}
+
+    def generate_presigned_url(self, video_url: str):
+        with self._lock:
+            self.presigned += 1
+        return {"url": f"{video_url}?X-Amz-Signature=fake"}
+
+    def stats(self):
+        return {"uploads": self.uploads, "failures": self.failures, "objects": len(self.objects),
+                "bytes": sum(self.objects.values()), "presigned": self.presigned}
+
+
+class FakeSandbox:
+    """Replaces run_code_in_docker: waits for the render scheduler like a real
+    render, then "renders" for a configurable time and writes a dummy video
+    into a real workspace. With a reservation, container start-up counts from
+    when the slot was reserved, as it does for a reserved pool container.
+
+    Whether a render fails depends on the code, as with a real program that
+    raises, so failure_rate is the share of generated programs that fail.
+    Setting cancel stops the render within a few milliseconds.
+    """
+
+    def __init__(self, startup=0.5, render=3.0, jitter=0.3, failure_rate=0.0, video_bytes=256 * 1024,
+                 seed=None):
+        self.startup = startup
+        self.render = render
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.video_bytes = video_bytes
+        self.renders = 0
+        self.failures = 0
+        self.cancelled = 0
+        self.busy_seconds = 0.0  # sandbox time, the compute speculation spends
+        self._seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def run_code_in_docker(self, code: str, timings: dict = None, quality: str = "low", scene: str = None,
+                           on_progress=None, reservation=None, cancel=None):
+        from app.sandbox.docker_runner import render_with_resources
+        lease = None
+        warmed = 0.0
+        if reservation is not None:
+            with stage_timer("resource_wait", timings):
+                lease, _ = reservation.take()
+            # Like a pooled container reserved on "accepted", start-up began then
+            if reservation.started_at:
+                warmed = time.monotonic() - reservation.started_at
+        return render_with_resources(
+            lambda lease: self._render(code, timings, on_progress, warmed, cancel), quality, timings, lease=lease)
+
+    def _fails(self, code):
+        digest = hashlib.sha256(f"{self._seed}:{code}".encode("utf-8")).hexdigest()[:8]
+        return int(digest, 16) / 16 ** 8 < self.failure_rate
+
+    def _sleep(self, seconds, cancel):
+        # True if cancelled meanwhile
+        if cancel is None:
+            time.sleep(seconds)
+            return False
+        return cancel.wait(seconds)
+
+    def _render(self, code, timings, on_progress, warmed=0.0, cancel=None):
+        from app.sandbox.workspace import workspaces, WorkspaceFull
+        with self._lock:
+            self.renders += 1
+            startup = max(0.0, seconds(self._rng, self.startup, self.jitter) - warmed)
+            duration = seconds(self._rng, self.render, self.jitter)
+        failed = self._fails(code)
+        began = time.perf_counter()
+        try:
+            if self._sleep(startup, cancel):
+                return self._cancelled(began, timings)
+            record_stage("container_start", startup, timings)
+            started = time.perf_counter()
+            steps = 4
+            for step in range(steps):
+                if self._sleep(duration / steps, cancel):
+                    return self._cancelled(started, timings)
+                if on_progress and step < steps - 1:
+                    on_progress(round((step + 1) / steps, 3), step)
+        finally:
+            with self._lock:
+                self.busy_seconds += time.perf_counter() - began
+        if failed:
+            with self._lock:
+                self.failures += 1
+            record_stage("render", time.perf_counter() - started, timings, failed=True)
+            return {"status": "error", "error": "Fake render failed", "job_id": None}
+        try:
+            workspace = workspaces.create("job")
+        except WorkspaceFull as e:
+            return {"status": "error", "error": str(e), "job_id": None}
+        video_path = os.path.join(workspace, "video.mp4")
+        with open(video_path, "wb") as f:
+            f.write(b"\0" * self.video_bytes)
+        record_stage("render", time.perf_counter() - started, timings)
+        return {"status": "success", "video_path": video_path, "job_id": os.path.basename(workspace),
+                "workspace": workspace}
+
+    def _cancelled(self, started, timings):
+        with self._lock:
+            self.cancelled += 1
+        record_stage("render", time.perf_counter() - started, timings, failed=True)
+        return {"status": "error", "error": "Render cancelled", "job_id": None}
+
+    def stats(self):
+        return {"renders": self.renders, "failures": self.failures, "cancelled": self.cancelled,
+                "busy_seconds": round(self.busy_seconds, 2)}
+
+
+def install(llm: FakeLLM = None, s3: FakeS3 = None, sandbox: FakeSandbox = None):
+    """Point the pipeline at the given fakes; None keeps the real dependency."""
+    import app.pipeline
+    import app.utils.openai_client
+    import app.utils.presign_cache
+    if llm:
+        app.utils.openai_client.llm_client = llm
+    if s3:
+        app.pipeline.upload_file_to_s3 = s3.upload_file_to_s3
+        app.utils.presign_cache.generate_presigned_url = s3.generate_presigned_url
+    if sandbox:
+        app.pipeline.run_code_in_docker = sandbox.run_code_in_docker
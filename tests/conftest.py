@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# The app reads these at import time; tests never reach a real database or API
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("SANDBOX_WORKSPACE_ROOT", tempfile.mkdtemp())
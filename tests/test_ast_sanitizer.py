@@ -0,0 +1,67 @@
+import pytest
+
+from app.utils import ast_sanitizer
+from app.utils.ast_sanitizer import analyze_code, sanitize_ast
+
+CLEAN = """
+from manim import *
+
+class Demo(Scene):
+    def construct(self):
+        self.play(Create(Circle()))
+"""
+
+
+@pytest.mark.parametrize("code, message", [
+    ("import os", "Use of prohibited import: os"),
+    ("import os.path", "Use of prohibited import: os.path"),
+    ("from subprocess import run", "Use of prohibited import: subprocess"),
+    ("open('x')", "Use of prohibited function: open"),
+    ("builtins.eval('1')", "Use of prohibited attribute: eval"),
+    ("f = exec", "Use of prohibited identifier: exec"),
+    ("class Evil(Thread):\n    pass", "Unauthorized base class: Thread"),
+])
+def test_each_rule_rejects(code, message):
+    assert sanitize_ast(code) == (False, message)
+
+
+def test_clean_scene_passes():
+    assert sanitize_ast(CLEAN) == (True, "Code passed AST analysis")
+    assert analyze_code(CLEAN, collect_all=True) == []
+
+
+def test_syntax_error_has_a_position():
+    violation, = analyze_code("def (:")
+    assert violation["line"] == 1 and violation["message"].startswith("Syntax error in code")
+
+
+@pytest.mark.parametrize("terms", [1000, 50000])
+def test_deep_nesting_is_rejected(terms):
+    # A long chain of + is one BinOp nested per term: past the visitor's
+    # recursion limit at 1000, past the parser's at 50000
+    code = "x = " + "+".join(["1"] * terms)
+    assert sanitize_ast(code) == (False, "Code is nested too deeply to analyze")
+
+
+def test_collect_all_reports_every_violation():
+    code = "import os\nimport sys\n\nclass A(Thread):\n    def f(self):\n        eval('1')\n"
+    assert [v["message"] for v in analyze_code(code)] == ["Use of prohibited import: os"]
+    violations = analyze_code(code, collect_all=True)
+    assert [(v["line"], v["message"]) for v in violations] == [
+        (1, "Use of prohibited import: os"),
+        (2, "Use of prohibited import: sys"),
+        (4, "Unauthorized base class: Thread"),
+        (6, "Use of prohibited function: eval"),
+        (6, "Use of prohibited identifier: eval"),
+    ]
+
+
+def test_cache_hit_returns_the_same_verdict(monkeypatch):
+    code = "import socket  # cache test"
+    first = analyze_code(code)
+    calls = []
+    monkeypatch.setattr(ast_sanitizer, "_run_rules", lambda *args: calls.append(args))
+    # Callers may change what they get back without touching the cache
+    first[0]["message"] = "changed"
+    assert analyze_code(code) == [{"line": 1, "col": 0, "message": "Use of prohibited import: socket"}]
+    assert calls == []
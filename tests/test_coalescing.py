@@ -0,0 +1,38 @@
+import threading
+
+from app.routes import coalescing, coalesce_locks
+from app.utils.llm_cache import hash_text
+
+
+def fingerprints_on_different_stripes():
+    first = hash_text("a circle")
+    stripe = int(first[:8], 16) % len(coalesce_locks)
+    other = next(fp for fp in (hash_text(f"a square {i}") for i in range(100))
+                 if int(fp[:8], 16) % len(coalesce_locks) != stripe)
+    return first, other
+
+
+def entering(fingerprint, entered):
+    def enter():
+        with coalescing([fingerprint]):
+            entered.set()
+    thread = threading.Thread(target=enter, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_other_prompts_do_not_wait():
+    first, other = fingerprints_on_different_stripes()
+    entered = threading.Event()
+    with coalescing([first]):
+        entering(other, entered)
+        assert entered.wait(1)
+
+
+def test_same_prompt_waits():
+    first, _ = fingerprints_on_different_stripes()
+    entered = threading.Event()
+    with coalescing([first]):
+        entering(first, entered)
+        assert not entered.wait(0.1)
+    assert entered.wait(1)
@@ -0,0 +1,19 @@
+from app.sandbox import docker_runner
+from app.sandbox.output_monitor import OutputMonitor
+
+
+def test_cold_renders_are_locked_down(tmp_path, monkeypatch):
+    commands = []
+
+    def popen(command, **kwargs):
+        commands.append(command)
+        raise OSError("no docker here")
+
+    monkeypatch.setattr(docker_runner.subprocess, "Popen", popen)
+    result = docker_runner.render_in_cold_container(str(tmp_path), "job", "print(1)", "low", None, OutputMonitor())
+    assert result["status"] == "error"
+    command = commands[0]
+    image = command.index(docker_runner.SANDBOX_IMAGE)
+    for flag in docker_runner.lockdown_flags():
+        assert flag in command[:image]
+    assert command[command.index("--network") + 1] == docker_runner.SANDBOX_NETWORK
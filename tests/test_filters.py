@@ -0,0 +1,97 @@
+import random
+import re
+
+import pytest
+
+from app.utils.filters import dangerous_patterns, is_prompt_unsafe, screen_prompts
+
+# The regex list is_prompt_unsafe replaced, as it was before the keyword engine
+BASELINE_PATTERNS = [
+    r"(os\.|subprocess|eval|exec)",
+    r"(delete|remove|overwrite|format).*file",
+    r"access.*(network|internet|socket)",
+    r"(send|get|post).*(request|http)",
+    r"(steal|leak|expose).*data",
+    r"(import).*?(os|sys|socket|shutil)",
+]
+
+
+def baseline_is_prompt_unsafe(prompt):
+    lowered = prompt.lower()
+    for pattern in BASELINE_PATTERNS:
+        if re.search(pattern, lowered):
+            return True, f"Prompt contains potentially dangerous pattern: {pattern}"
+    return False, None
+
+
+FLAGGED = [
+    "Use os.system to draw a circle",
+    "Animate SUBPROCESS calls",
+    "Show how eval works",
+    "Delete the config file after rendering",
+    "REMOVE every FILE",
+    "format   the   file   nicely",
+    "Access the network and draw it",
+    "access internet speed as a bar chart",
+    "Send a request to my server",
+    "post to http endpoints",
+    "Steal the data",
+    "leak    DATA",
+    "import os and plot",
+    "Import sys",
+    "importance of cosmos",          # keywords inside other words
+    "get the file from the requested http page",
+    "remove a profile",              # overlapping: "file" inside "profile"
+    "accessible internet",
+    "fileremove the filesystem",     # second keyword before and after the first
+    "access socket",                 # "socket" also ends pattern 6
+    "executive summary",
+    "expose the metadata",
+    "postpone the request",
+]
+
+CLEAN = [
+    "Draw a blue circle that turns into a square",
+    "Plot y = x^2 with labels",
+    "Show the Pythagorean theorem",
+    "file then delete",              # keywords in the wrong order
+    "network access",
+    "data steal",
+    "http send",
+    "delete the\nfile",              # `.` never crosses a newline
+    "access\nnetwork",
+    "import\nos",
+    "o s.path",
+    "",
+    "   ",
+]
+
+
+def test_patterns_are_unchanged():
+    assert dangerous_patterns == BASELINE_PATTERNS
+
+
+@pytest.mark.parametrize("prompt", FLAGGED + CLEAN)
+def test_matches_the_baseline(prompt):
+    assert is_prompt_unsafe(prompt) == baseline_is_prompt_unsafe(prompt)
+
+
+def test_corpus_is_labelled_right():
+    assert all(baseline_is_prompt_unsafe(p)[0] for p in FLAGGED)
+    assert not any(baseline_is_prompt_unsafe(p)[0] for p in CLEAN)
+
+
+def test_matches_the_baseline_on_random_prompts():
+    # Keyword fragments, case and spacing mixed up, so patterns overlap and
+    # keywords run into each other
+    words = ["os.", "os", "subprocess", "eval", "exec", "delete", "remove", "overwrite", "format",
+             "file", "access", "network", "internet", "socket", "send", "get", "post", "request",
+             "http", "steal", "leak", "expose", "data", "import", "sys", "shutil",
+             "circle", "draw", "pro", "me", "ta", "s", ".", "\n"]
+    rng = random.Random(1234)
+    prompts = []
+    for _ in range(2000):
+        parts = [rng.choice(words) for _ in range(rng.randint(1, 8))]
+        parts = [p.upper() if rng.random() < 0.2 else p for p in parts]
+        prompts.append("".join(p + rng.choice(["", " ", "  ", "\t"]) for p in parts))
+    assert screen_prompts(prompts) == [baseline_is_prompt_unsafe(p) for p in prompts]
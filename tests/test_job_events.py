@@ -0,0 +1,24 @@
+import json
+
+from app.utils.job_events import JobEventBus, NOTIFY_MAX_PAYLOAD
+
+
+def test_seq_keeps_increasing_in_another_process():
+    first = JobEventBus()
+    first.publish("job", {"type": "status", "status": "running"})
+    first.publish("job", {"type": "stage", "stage": "rendering"})
+    last_seen = first.wait("job", 0, 0)[-1]["seq"]
+
+    # The job was requeued and picked up elsewhere, with no history of it
+    second = JobEventBus()
+    second.publish("job", {"type": "status", "status": "running"})
+    assert [e["status"] for e in second.wait("job", last_seen, 0)] == ["running"]
+
+
+def test_status_notice_leaves_details_to_the_db():
+    bus = JobEventBus()
+    bus.publish("job", {"type": "status", "status": "failed", "error_message": "x" * 20000})
+    event = bus.wait("job", 0, 0)[-1]
+    payload = bus._notice(event)
+    assert len(payload.encode()) < NOTIFY_MAX_PAYLOAD
+    assert json.loads(payload)["event"] == {k: event[k] for k in ("jobId", "seq", "time", "type", "status")}
@@ -0,0 +1,41 @@
+import threading
+
+from app.utils.job_executor import JobExecutor
+
+
+def blocked_executor(**kwargs):
+    # One worker held busy, so everything submitted stays queued
+    executor = JobExecutor(1, 2, **kwargs)
+    release = threading.Event()
+    started = threading.Event()
+    executor.submit(lambda: (started.set(), release.wait(5)))
+    started.wait(5)
+    return executor, release
+
+
+def test_batches_have_their_own_bound():
+    executor, release = blocked_executor(batch_queue_size=100)
+    try:
+        # Larger than the job queue, and admitted one after another
+        assert executor.reserve_batch(40)
+        assert executor.reserve_batch(60)
+        assert not executor.reserve_batch(1)
+        for _ in range(100):
+            assert executor.submit(print, batch=True)
+        # Single jobs still get their own queue slots
+        assert executor.has_capacity(2)
+    finally:
+        release.set()
+
+
+def test_batch_submit_needs_a_reserved_slot():
+    executor, release = blocked_executor(batch_queue_size=10)
+    try:
+        assert not executor.submit(print, batch=True)
+        assert executor.reserve_batch(2)
+        executor.release_batch()
+        assert executor.submit(print, batch=True)
+        assert not executor.submit(print, batch=True)
+        assert executor.stats()["batch_slots"] == 1
+    finally:
+        release.set()
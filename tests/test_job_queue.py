@@ -0,0 +1,75 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db.db import SessionFactory, init_db
+from app.db.models.job import Job, JobStatus
+from app.utils import job_queue
+from app.utils.job_queue import JobQueue
+
+
+@pytest.fixture
+def db():
+    init_db()
+    session = SessionFactory()
+    session.query(Job).delete()
+    session.commit()
+    yield session
+    session.query(Job).delete()
+    session.commit()
+    session.close()
+
+
+def add_jobs(db, user, count, status=JobStatus.pending, start=None, **values):
+    # Recent enough that nothing has aged past JOB_AGING_SECONDS
+    start = start or datetime.utcnow() - timedelta(seconds=30)
+    jobs = [Job(user_id=user, prompt="p", job_uuid=str(uuid.uuid4()), status=status, quality="low",
+                created_at=start + timedelta(seconds=i), **values) for i in range(count)]
+    db.add_all(jobs)
+    db.commit()
+    return [job.job_uuid for job in jobs]
+
+
+def claimed_users(db, queue, count):
+    users = []
+    for _ in range(count):
+        (job_uuid, _, _), = queue.claim(1)
+        users.append(db.query(Job.user_id).filter(Job.job_uuid == job_uuid).scalar())
+    return users
+
+
+def test_claims_take_turns_between_users(db):
+    add_jobs(db, user=1, count=5)
+    # Queued after all of user 1's jobs
+    add_jobs(db, user=2, count=2, start=datetime.utcnow() - timedelta(seconds=5))
+    assert claimed_users(db, JobQueue(), 4) == [1, 2, 1, 2]
+
+
+def test_claims_respect_the_per_user_cap(db, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_USER_MAX_RUNNING", 1)
+    add_jobs(db, user=1, count=3)
+    add_jobs(db, user=2, count=1, start=datetime.utcnow())
+    claimed = JobQueue().claim(3)
+    assert len(claimed) == 2
+
+
+def test_queue_position_has_an_eta(db, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_QUEUE_BACKEND", "db")
+    add_jobs(db, user=1, count=3, status=JobStatus.completed, stage_timings={"total": 12.0, "queue_wait": 2.0})
+    first = add_jobs(db, user=1, count=job_queue.JOB_WORKERS + 1)
+    later = db.query(Job).filter(Job.job_uuid == add_jobs(db, user=2, count=1, start=datetime.utcnow())[0]).one()
+    ahead, eta = job_queue.queue_position(db, later)
+    # Second in line, behind user 1's first job
+    assert (ahead, eta) == (1, 0.0)
+    ahead, eta = job_queue.queue_position(db, db.query(Job).filter(Job.job_uuid == first[-1]).one())
+    assert ahead == job_queue.JOB_WORKERS + 1
+    assert eta == pytest.approx(10.0)
+
+
+def test_reaper_requeues_running_jobs_without_a_lease(db):
+    orphan, = add_jobs(db, user=1, count=1, status=JobStatus.running)
+    requeued, failed = JobQueue().reap()
+    assert (requeued, failed) == ([orphan], [])
+    db.expire_all()
+    assert db.query(Job.status).filter(Job.job_uuid == orphan).scalar() == JobStatus.pending
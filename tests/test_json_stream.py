@@ -0,0 +1,48 @@
+import json
+import random
+
+import pytest
+
+from app.utils.json_stream import JsonObjectStream
+
+ANSWER = {
+    "meta": {"status": "nested", "notes": ["{", "}", "\"status\": \"x\""]},
+    "status": "accepted",
+    "reason": "Braces { } [ ] and \"quotes\" \\ inside strings",
+    "code": "class Demo(Scene):\n    def construct(self):\n        t = Text(\"{\\\"a\\\": 1}\")\n",
+}
+FENCED = "Here you go:\n```json\n" + json.dumps(ANSWER, indent=2) + "\n```\nAnything else?"
+
+
+def split(text, rng):
+    cuts = sorted(rng.sample(range(1, len(text)), rng.randint(1, min(40, len(text) - 1))))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_random_chunks(seed):
+    stream = JsonObjectStream()
+    completed = []
+    for chunk in split(FENCED, random.Random(seed)):
+        completed += stream.feed(chunk)
+    # The nested "status" key and the one quoted inside a string don't count
+    assert completed.count("status") == 1
+    assert stream.fields["status"] == "accepted"
+    assert stream.closed
+    assert stream.result() == json.loads(json.dumps(ANSWER))
+    assert stream.text() == FENCED
+
+
+def test_one_char_at_a_time():
+    stream = JsonObjectStream()
+    completed = [name for char in FENCED for name in stream.feed(char)]
+    assert completed == ["status", "reason", "code"]
+    assert stream.result() == ANSWER
+
+
+def test_status_fires_before_the_object_closes():
+    text = json.dumps({"status": "rejected", "reason": "no"})
+    stream = JsonObjectStream()
+    assert stream.feed(text[:text.index(",")]) == ["status"]
+    assert not stream.closed
+    assert stream.result() == {"status": "rejected"}
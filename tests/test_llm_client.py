@@ -0,0 +1,77 @@
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.utils import llm_client as llm
+from app.utils.llm_client import LLMClient, CircuitBreaker, LLMUnavailable
+
+
+def rate_limit_error():
+    request = httpx.Request("POST", "http://llm.test/v1/responses")
+    response = httpx.Response(429, request=request, headers={"retry-after-ms": "1"})
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+class FakeResponses:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else SimpleNamespace(usage=None)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def client_with(outcomes):
+    client = LLMClient()
+    client.breaker = CircuitBreaker(threshold=1, cooldown=0.01)
+    fake = SimpleNamespace(responses=FakeResponses(outcomes))
+    fake.with_options = lambda **kwargs: fake
+    client._client = fake
+    return client, fake.responses
+
+
+def open_breaker(client):
+    client.breaker.record_failure()
+    assert client.breaker.state == "open"
+    time.sleep(0.02)
+
+
+def test_probe_out_of_429_retries_does_not_wedge_the_breaker(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 1)
+    client, responses = client_with([rate_limit_error(), rate_limit_error()])
+    open_breaker(client)
+
+    with pytest.raises(openai.RateLimitError):
+        client.create_response(model="m", input="probe")
+    assert client.breaker.state == "open"
+
+    # After the cooldown another probe goes through and closes the breaker
+    time.sleep(0.02)
+    client.create_response(model="m", input="next")
+    assert client.breaker.state == "closed"
+    assert responses.calls == 3
+
+
+def test_probe_with_unexpected_error_reopens_the_breaker():
+    client, _ = client_with([ValueError("bad payload")])
+    open_breaker(client)
+
+    with pytest.raises(ValueError):
+        client.create_response(model="m", input="probe")
+    assert client.breaker.state == "open"
+    with pytest.raises(LLMUnavailable):
+        client.create_response(model="m", input="during cooldown")
+
+
+def test_probe_success_closes_the_breaker():
+    client, _ = client_with([])
+    open_breaker(client)
+    client.create_response(model="m", input="probe")
+    assert client.breaker.state == "closed"
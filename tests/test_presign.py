@@ -0,0 +1,40 @@
+import time
+import uuid
+
+from app.db.db import SessionFactory, init_db
+from app.db.models.job import Job, JobStatus
+from app.db.models.video import Video
+from app.db.models.rendition import VideoRendition
+from app.routes import upgrades_pending
+from app.utils import presign_cache as presign
+from app.utils.presign_cache import PresignedUrlCache
+
+
+def test_best_url_awaiting_an_upgrade_is_reused_briefly(monkeypatch):
+    monkeypatch.setattr(presign, "generate_presigned_url", lambda url: {"url": f"{url}?signed"})
+    monkeypatch.setattr(presign, "PRESIGN_PENDING_TTL", 0)
+    cache = PresignedUrlCache(10)
+    cache.sign(1, "s3://low.mp4", final=False)
+    cache.sign(2, "s3://high.mp4")
+    time.sleep(0.01)
+    assert cache.get(1) is None
+    assert cache.get(2) == "s3://high.mp4?signed"
+
+
+def test_upgrades_pending_until_the_final_rendition_exists():
+    init_db()
+    db = SessionFactory()
+    try:
+        videos = []
+        for renditions in (["low"], ["low", "high"]):
+            job = Job(user_id=1, prompt="p", job_uuid=str(uuid.uuid4()), status=JobStatus.completed, quality="high")
+            video = Video(user_id=1, job_id=job.job_uuid, video_url="s3://v")
+            db.add_all([job, video])
+            db.flush()
+            db.add_all(VideoRendition(video_id=video.id, quality=q, video_url="s3://v") for q in renditions)
+            videos.append(video.id)
+        db.commit()
+        assert upgrades_pending(db, videos) == {videos[0]}
+    finally:
+        db.rollback()
+        db.close()
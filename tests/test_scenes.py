@@ -0,0 +1,22 @@
+import os
+
+from app.sandbox.scenes import SceneClipCache
+
+
+def write_clip(directory, name, size):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return path
+
+
+def test_pinned_clips_are_not_evicted(tmp_path):
+    cache = SceneClipCache(str(tmp_path / "cache"), max_bytes=150)
+    cache.put("old", write_clip(tmp_path, "a.mp4", 100))
+    with cache.pinned(["old"]):
+        # Over the limit: the least recently used clip that isn't pinned goes
+        cache.put("new", write_clip(tmp_path, "b.mp4", 100))
+        assert cache.get("old")
+        assert cache.get("new") is None
+    cache.put("newer", write_clip(tmp_path, "c.mp4", 100))
+    assert cache.get("old") is None
@@ -0,0 +1,78 @@
+import pytest
+
+from app.sandbox import docker_runner
+from app.sandbox.docker_runner import render_with_resources
+from app.sandbox.scheduler import ResourceScheduler
+
+GIB = 1024 ** 3
+
+
+def make_scheduler(cpus=2, memory=2 * GIB):
+    return ResourceScheduler(cpus, memory, {"low": (1.0, GIB)}, stats_reader=None,
+                             min_cpus=0.25, min_memory=GIB // 8)
+
+
+def adapt(scheduler, cpus=0.5, memory=GIB // 4):
+    # One finished render with light usage, so the next quota is adapted
+    lease = scheduler.acquire("low", 0)
+    lease.observe(cpus, memory)
+    scheduler.release(lease)
+
+
+def assert_all_free(scheduler):
+    stats = scheduler.stats()
+    assert (stats["free_cpus"], stats["free_memory"], stats["running"]) == (scheduler.cpus, scheduler.memory, 0)
+
+
+@pytest.mark.parametrize("cpus, memory", [(1, 4 * GIB), (4, GIB)])
+def test_render_is_refused_without_free_cpu_or_memory(monkeypatch, cpus, memory):
+    monkeypatch.setattr(docker_runner, "SANDBOX_TIMEOUT", 0.05)
+    scheduler = make_scheduler(cpus, memory)
+    held = scheduler.acquire("low", 0)
+    calls = []
+    result = render_with_resources(calls.append, "low", scheduler=scheduler)
+    assert result["status"] == "error" and "resources" in result["error"]
+    assert calls == []
+    assert scheduler.stats()["timeouts"] == 1
+    scheduler.release(held)
+    assert_all_free(scheduler)
+
+
+def test_lease_is_released_when_the_render_raises():
+    scheduler = make_scheduler()
+
+    def render(lease):
+        assert scheduler.stats()["running"] == 1
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        render_with_resources(render, "low", scheduler=scheduler)
+    assert_all_free(scheduler)
+
+
+def test_oom_is_retried_once_with_the_full_quota():
+    scheduler = make_scheduler()
+    adapt(scheduler)
+    leases = []
+
+    def render(lease):
+        leases.append((lease.memory, lease.ceiling))
+        return {"status": "error", "oom": True}
+
+    result = render_with_resources(render, "low", scheduler=scheduler)
+    assert result["oom"]
+    # Adapted quota first, then one retry at the ceiling, and no more
+    assert leases == [(GIB // 4 * 3 // 2, False), (GIB, True)]
+    assert scheduler.stats()["oom_kills"] == 2
+    # The estimate now covers what the killed render was given
+    assert scheduler.quota("low")[1] == GIB
+    assert_all_free(scheduler)
+
+
+def test_oom_retry_returns_the_successful_result():
+    scheduler = make_scheduler()
+    adapt(scheduler)
+    results = [{"status": "error", "oom": True}, {"status": "success"}]
+    assert render_with_resources(lambda lease: results.pop(0), "low", scheduler=scheduler) == {"status": "success"}
+    assert scheduler.stats()["oom_kills"] == 1
+    assert_all_free(scheduler)
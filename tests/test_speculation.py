@@ -0,0 +1,56 @@
+import queue
+from types import SimpleNamespace
+
+import pytest
+
+from app import pipeline
+from app.utils.speculation import SpeculationBudget
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    budget = SpeculationBudget(4)
+    monkeypatch.setattr(pipeline, "speculation", budget)
+    return budget
+
+
+class FakeDB:
+    def commit(self):
+        pass
+
+
+def run_stage(monkeypatch, answers, problem=None):
+    """speculative_stage with scripted LLM answers, one per candidate."""
+    remembered = []
+    answers = list(answers)
+    monkeypatch.setattr(pipeline, "request_manim_code", lambda prompt, **kwargs: answers.pop(0))
+    monkeypatch.setattr(pipeline, "check_candidate", lambda code, timings: problem)
+    monkeypatch.setattr(pipeline, "remember_manim_code", lambda prompt, answer: remembered.append(answer))
+    job = SimpleNamespace(job_uuid="job", quality="low", status=None, error_message=None)
+    pipeline.speculative_stage(FakeDB(), job, "a prompt", {}, extra=len(answers) - 1)
+    return job, remembered
+
+
+def test_losing_renders_that_succeed_are_not_failures(monkeypatch, budget):
+    monkeypatch.setattr(pipeline, "SPECULATIVE_CANCEL", False)
+    events = queue.Queue()
+    events.put(("render", 1, ({"status": "success"}, {})))
+    events.put(("render", 2, ({"status": "error"}, {})))
+    pipeline.drain_candidates(events, 0, 2, 0)
+    stats = budget.stats()
+    assert (stats["renders_lost"], stats["renders_failed"], stats["renders_cancelled"]) == (1, 1, 0)
+
+
+def test_one_rejection_does_not_reject_the_job(monkeypatch, budget):
+    rejected = {"status": "rejected", "reason": "No."}
+    job, remembered = run_stage(monkeypatch, [rejected, {"status": "accepted", "code": "x"}],
+                                problem="AST Sanitizer: bad")
+    assert job.error_message == "AST Sanitizer: bad"
+    assert remembered == []
+
+
+def test_unanimous_rejection_rejects_the_job(monkeypatch, budget):
+    rejected = {"status": "rejected", "reason": "No."}
+    job, remembered = run_stage(monkeypatch, [rejected, dict(rejected)])
+    assert job.error_message == "No."
+    assert remembered == [rejected]
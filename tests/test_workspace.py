@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+from app.sandbox.workspace import WorkspaceManager, WorkspaceFull
+
+
+def fill(path, size):
+    with open(os.path.join(path, "video.mp4"), "wb") as f:
+        f.write(b"\0" * size)
+
+
+def test_quota_holds_between_sweeps(tmp_path):
+    manager = WorkspaceManager(str(tmp_path), max_bytes=100, max_age=3600, measure_interval=0)
+    manager.start(interval=0)
+    fill(manager.create(), 150)
+    with pytest.raises(WorkspaceFull):
+        manager.create()
+
+
+def test_released_space_is_usable_again(tmp_path):
+    manager = WorkspaceManager(str(tmp_path), max_bytes=100, max_age=3600, measure_interval=0)
+    workspace = manager.create()
+    fill(workspace, 150)
+    manager.release(workspace)
+    assert manager.create()
@@ -0,0 +1,51 @@
+"""Render worker for the DB-backed job queue (JOB_QUEUE_BACKEND=db).
+
+Run any number of these, on any number of nodes, next to the API:
+
+    python worker.py
+"""
+import os
+import signal
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from flask import Flask
+from werkzeug.serving import make_server
+
+from app.db.db import init_db
+from app.utils.openai_client import invalidate_stale_llm_cache
+from app.utils.metrics import metrics_view
+from app.utils.job_queue import JobWorker
+from app.sandbox.workspace import workspaces
+
+# Serve this worker's /metrics on this port; 0 to disable
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+
+def serve_metrics(port: int):
+    app = Flask(__name__)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+    server = make_server("0.0.0.0", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="worker-metrics", daemon=True).start()
+    print(f"Worker metrics on :{port}/metrics")
+
+
+def main():
+    init_db()
+    invalidate_stale_llm_cache()
+    workspaces.start()
+    if WORKER_METRICS_PORT:
+        serve_metrics(WORKER_METRICS_PORT)
+
+    worker = JobWorker()
+    # Finish (or hand back) running jobs on docker stop / Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()